@@ -0,0 +1,454 @@
+"""
+Performans karşılaştırma betikleri.
+
+Kullanım:
+    python benchmark.py batching input_videos/input_video.mp4 --frames 200
+    python benchmark.py bounces --frames 100000
+    python benchmark.py ball-roi input_videos/input_video.mp4 --frames 300
+    python benchmark.py player-keyframes input_videos/input_video.mp4 --frames 300 --interval 5
+    python benchmark.py court-keypoints input_videos/input_video.mp4 --frames 200
+    python benchmark.py court-backends input_videos/input_video.mp4 --frames 100 --tolerance 5
+    python benchmark.py yolo-backends input_videos/input_video.mp4 --frames 200 --backends pt onnx openvino --int8
+    python benchmark.py corner-dedup --lines 50 100 200 400
+"""
+import argparse
+import itertools
+import time
+
+import numpy as np
+
+from utils import VideoFrameSource
+from trackers import OnlineBounceDetector, find_bounce_frames
+from trackers.yolo_backend import BACKENDS as YOLO_BACKENDS, INT8_BACKENDS, DEFAULT_IMGSZ
+
+# torch/ultralytics gerektiren modüller (tracker'lar, kort anahtar noktası modeli) sadece
+# onları kullanan alt komutlarda içe aktarılır; böylece ör. 'bounces' sadece numpy ile çalışır
+
+
+def _load_frames(video_path, max_frames):
+    # Ölçümü decode süresinden bağımsız tutmak için kareleri önceden belleğe alıyoruz
+    return list(itertools.islice(VideoFrameSource(video_path), max_frames))
+
+
+def benchmark_batching(video_path, max_frames=200, batch_sizes=(1, 4, 8, 16)):
+    """Kare kare (batch_size=1) ve gruplu tespitin throughput değerlerini karşılaştırır."""
+    from trackers import PlayerTracker, BallTracker
+
+    frames = _load_frames(video_path, max_frames)
+    print(f"{len(frames)} kare üzerinde ölçüm yapılıyor...")
+
+    trackers = [
+        ('PlayerTracker', lambda bs: PlayerTracker(model_path='yolov8x', batch_size=bs)),
+        ('BallTracker', lambda bs: BallTracker(model_path='models/updated_new_best.pt', batch_size=bs)),
+    ]
+
+    for name, make_tracker in trackers:
+        baseline_fps = None
+        for batch_size in batch_sizes:
+            # Her ölçümde yeni tracker: oyuncu ID'leri sıfırdan başlasın
+            tracker = make_tracker(batch_size)
+            tracker.detect_frames(frames[:batch_size]) # Isınma (model yükleme, ilk çağrı)
+            tracker = make_tracker(batch_size)
+
+            start = time.perf_counter()
+            detections = tracker.detect_frames(frames)
+            elapsed = time.perf_counter() - start
+
+            fps = len(frames) / elapsed
+            if baseline_fps is None:
+                baseline_fps = fps
+            print(f"{name:<14} batch={batch_size:<3} {fps:7.2f} fps  "
+                  f"(x{fps / baseline_fps:.2f})  kare={len(detections)}")
+
+
+def benchmark_ball_roi(video_path, max_frames=300, search_window=320, search_imgsz=320):
+    """Top tespitini tüm karede ve tahmini konum etrafındaki arama penceresinde karşılaştırır."""
+    from trackers import BallTracker
+
+    frames = _load_frames(video_path, max_frames)
+    print(f"{len(frames)} kare üzerinde ölçüm yapılıyor...")
+
+    results = {}
+    for name, kwargs in (('tüm kare', {}),
+                         ('pencere', {'search_window': search_window, 'search_imgsz': search_imgsz})):
+        tracker = BallTracker(model_path='models/updated_new_best.pt', **kwargs)
+        tracker.detect_frames(frames[:2]) # Isınma (model yükleme, ilk çağrı)
+
+        start = time.perf_counter()
+        detections = tracker.detect_frames(frames)
+        elapsed = time.perf_counter() - start
+        results[name] = detections.track_boxes(1)
+        print(f"{name:<10} {len(frames) / elapsed:7.2f} fps  tespit={detections.num_detections}")
+
+    # İki modun da topu bulduğu karelerde merkezler arasındaki mesafe
+    full, roi = results['tüm kare'], results['pencere']
+    both = ~np.isnan(full[:, 0]) & ~np.isnan(roi[:, 0])
+    if both.any():
+        full_centers = (full[both, :2] + full[both, 2:]) / 2
+        roi_centers = (roi[both, :2] + roi[both, 2:]) / 2
+        distances = np.linalg.norm(full_centers - roi_centers, axis=1)
+        print(f"Ortak tespit: {both.sum()} kare, merkez farkı medyan {np.median(distances):.1f} px")
+
+
+def _box_iou(boxes_a, boxes_b):
+    top_left = np.maximum(boxes_a[:, :2], boxes_b[:, :2])
+    bottom_right = np.minimum(boxes_a[:, 2:], boxes_b[:, 2:])
+    intersection = np.prod(np.clip(bottom_right - top_left, 0, None), axis=1)
+    area_a = np.prod(boxes_a[:, 2:] - boxes_a[:, :2], axis=1)
+    area_b = np.prod(boxes_b[:, 2:] - boxes_b[:, :2], axis=1)
+    return intersection / (area_a + area_b - intersection)
+
+
+def _detection_agreement(reference, candidate, iou_threshold=0.5):
+    """Referanstaki kutulardan adayda IoU >= iou_threshold ile karşılığı olanların oranı."""
+    matched = total = 0
+    for frame_idx in range(min(len(reference), len(candidate))):
+        _, ref_boxes, _ = reference.frame(frame_idx)
+        _, cand_boxes, _ = candidate.frame(frame_idx)
+        total += len(ref_boxes)
+        if len(ref_boxes) == 0 or len(cand_boxes) == 0:
+            continue
+        # Her referans kutusunun adaylarla en iyi IoU'su (tüm çiftler tek seferde)
+        pairs_ref = np.repeat(ref_boxes, len(cand_boxes), axis=0)
+        pairs_cand = np.tile(cand_boxes, (len(ref_boxes), 1))
+        iou = _box_iou(pairs_ref, pairs_cand).reshape(len(ref_boxes), len(cand_boxes))
+        matched += int((iou.max(axis=1) >= iou_threshold).sum())
+    return matched / total if total else 1.0
+
+
+def benchmark_yolo_backends(video_path, max_frames=200, backends=YOLO_BACKENDS, int8=False,
+                            imgsz=DEFAULT_IMGSZ, batch_size=8):
+    """
+    Oyuncu ve top tracker'larını YOLO backend'leriyle çalıştırıp fps ve .pt'ye göre
+    tespit uyumunu (IoU >= 0.5 ile eşleşen .pt kutularının oranı) karşılaştırır.
+    """
+    from trackers import PlayerTracker, BallTracker
+
+    frames = _load_frames(video_path, max_frames)
+    print(f"{len(frames)} kare üzerinde ölçüm yapılıyor...")
+
+    variants = [(backend, False) for backend in backends]
+    if int8:
+        variants += [(backend, True) for backend in backends if backend in INT8_BACKENDS]
+
+    trackers = [
+        ('PlayerTracker', lambda **kwargs: PlayerTracker(model_path='yolov8x', batch_size=batch_size, **kwargs)),
+        ('BallTracker', lambda **kwargs: BallTracker(model_path='models/updated_new_best.pt',
+                                                     batch_size=batch_size, **kwargs)),
+    ]
+    for name, make_tracker in trackers:
+        reference = None
+        for backend, use_int8 in variants:
+            tracker = make_tracker(backend=backend, imgsz=imgsz, int8=use_int8)
+            tracker.detect_frames(frames[:batch_size]) # Isınma (ilk çağrı)
+            # Oyuncu ID'leri sıfırdan başlasın; dışa aktarılan model bu kez diskten yüklenir
+            tracker = make_tracker(backend=backend, imgsz=imgsz, int8=use_int8)
+
+            start = time.perf_counter()
+            detections = tracker.detect_frames(frames)
+            fps = len(frames) / (time.perf_counter() - start)
+
+            if reference is None:
+                # İlk varyant (varsayılan olarak pt) referans alınır
+                reference = detections
+            print(f"{name:<14} {tracker.backend:<14} {fps:7.2f} fps  tespit={detections.num_detections:<6} "
+                  f"uyum={_detection_agreement(reference, detections):.1%}")
+
+
+def benchmark_player_keyframes(video_path, max_frames=300, keyframe_interval=5):
+    """Her karede oyuncu tespitini anahtar kare + optik akış moduyla karşılaştırır."""
+    from trackers import PlayerTracker
+
+    frames = _load_frames(video_path, max_frames)
+    print(f"{len(frames)} kare üzerinde ölçüm yapılıyor...")
+
+    results = {}
+    for name, interval in (('her kare', 1), ('anahtar kare', keyframe_interval)):
+        tracker = PlayerTracker(model_path='yolov8x', keyframe_interval=interval)
+        tracker.detect_frames(frames[:2]) # Isınma (model yükleme, ilk çağrı)
+        tracker = PlayerTracker(model_path='yolov8x', keyframe_interval=interval)
+
+        start = time.perf_counter()
+        results[name] = tracker.detect_frames(frames)
+        elapsed = time.perf_counter() - start
+        calls = tracker.keyframes if interval > 1 else len(frames)
+        print(f"{name:<13} {len(frames) / elapsed:7.2f} fps  YOLO çağrısı={calls}")
+
+    # Anahtar kare modundaki her ID'yi her karede modunda en çok örtüşen ID ile eşleyip IoU ölç
+    dense, sparse = results['her kare'], results['anahtar kare']
+    for track_id in np.unique(sparse.track_ids):
+        sparse_boxes = sparse.track_boxes(track_id)
+        best = None
+        for dense_id in np.unique(dense.track_ids):
+            dense_boxes = dense.track_boxes(dense_id)
+            both = ~np.isnan(sparse_boxes[:, 0]) & ~np.isnan(dense_boxes[:, 0])
+            if both.any():
+                iou = _box_iou(sparse_boxes[both], dense_boxes[both])
+                if best is None or iou.mean() > best[1].mean():
+                    best = (dense_id, iou)
+        if best is not None:
+            print(f"ID {track_id} -> {best[0]}: {len(best[1])} kare, ortalama IoU {best[1].mean():.2f}, "
+                  f"en düşük {best[1].min():.2f}")
+
+
+def benchmark_court_keypoints(video_path, max_frames=200, batch_sizes=(1, 8), interval=250,
+                               model_path='models/keypoints_model.pth'):
+    """Kort anahtar noktalarını kare kare, gruplu ve zamansal önbellekle tahmin etmeyi karşılaştırır."""
+    from court_line_detector import CourtLineDetector, CourtKeypointCache
+
+    frames = _load_frames(video_path, max_frames)
+    print(f"{len(frames)} kare üzerinde ölçüm yapılıyor...")
+
+    detector = CourtLineDetector(model_path)
+    detector.predict_batch(frames[:2]) # Isınma (ilk çağrı)
+
+    reference = None
+    for batch_size in batch_sizes:
+        detector.batch_size = batch_size
+        start = time.perf_counter()
+        keypoints = detector.predict_batch(frames)
+        elapsed = time.perf_counter() - start
+        if reference is None:
+            reference = keypoints
+        print(f"batch={batch_size:<3} {len(frames) / elapsed:7.2f} fps  "
+              f"en büyük fark={np.abs(keypoints - reference).max():.2f} px")
+
+    cache = CourtKeypointCache(detector, interval=interval)
+    start = time.perf_counter()
+    cached = np.array([cache.update(frame) for frame in frames])
+    elapsed = time.perf_counter() - start
+    print(f"önbellek  {len(frames) / elapsed:7.2f} fps  {cache.summary()}  "
+          f"ortalama fark={np.abs(cached - reference).mean():.2f} px")
+
+
+def benchmark_court_backends(video_path, max_frames=100, backends=None, batch_size=8,
+                              calibration=32, tolerance=None, model_path='models/keypoints_model.pth'):
+    """
+    Kort anahtar noktası modelinin CPU backend'lerini eager PyTorch ile karşılaştırır.
+
+    Her backend için tek kare gecikmesi, gruplu throughput ve eager modele göre
+    anahtar nokta hatası (piksel) ölçülür. tolerance verilirse en büyük hatası
+    bunu aşan backend olduğunda betik hata koduyla çıkar (parite testi).
+    backends verilmezse tüm backend'ler ölçülür.
+    """
+    from court_line_detector import CourtLineDetector
+    from court_line_detector.court_line_detector import BACKENDS
+
+    backends = backends or BACKENDS
+    frames = _load_frames(video_path, max_frames)
+    print(f"{len(frames)} kare üzerinde ölçüm yapılıyor...")
+
+    reference = None
+    failed = []
+    for backend in backends:
+        try:
+            detector = CourtLineDetector(model_path, batch_size=batch_size, backend=backend,
+                                         calibration_frames=frames[:calibration])
+        except ImportError as error:
+            print(f"{backend:<12} atlandı ({error})")
+            continue
+        detector.predict_batch(frames[:2]) # Isınma (ilk çağrı)
+
+        start = time.perf_counter()
+        for frame in frames[:10]:
+            detector.predict(frame)
+        latency = (time.perf_counter() - start) / min(len(frames), 10)
+
+        start = time.perf_counter()
+        keypoints = detector.predict_batch(frames)
+        fps = len(frames) / (time.perf_counter() - start)
+
+        if reference is None:
+            # İlk backend (varsayılan olarak eager) referans alınır
+            reference = keypoints
+        errors = np.abs(keypoints - reference)
+        print(f"{backend:<12} gecikme={latency * 1000:7.1f} ms  batch={batch_size} {fps:7.2f} fps  "
+              f"hata ortalama={errors.mean():.2f} px  en büyük={errors.max():.2f} px")
+        if tolerance is not None and errors.max() > tolerance:
+            failed.append(backend)
+
+    if failed:
+        raise SystemExit(f"Tolerans ({tolerance} px) aşıldı: {', '.join(failed)}")
+
+
+def _synthetic_ball_boxes(num_frames, seed=0):
+    """Seken bir topa benzeyen, gürültülü ve arada tespit boşlukları olan (NaN) kutular üretir."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(num_frames)
+    mid_y = 300 + 200 * np.abs(np.sin(t / 25.0)) + rng.normal(0, 3, num_frames)
+    boxes = np.column_stack((np.full(num_frames, 640.0), mid_y - 5,
+                             np.full(num_frames, 650.0), mid_y + 5)).astype(np.float32)
+    boxes[rng.random(num_frames) < 0.2] = np.nan
+    return boxes
+
+
+def _legacy_bounce_frames(boxes):
+    # Eski get_ball_shot_frames: pandas + boş .iloc döngüsü + find_peaks
+    import pandas as pd
+    from scipy.signal import find_peaks
+
+    df = pd.DataFrame(boxes, columns=['x1', 'y1', 'x2', 'y2'])
+    df['mid_y'] = (df['y1'] + df['y2']) / 2
+    df['mid_y_rolling_mean'] = df['mid_y'].rolling(window=5, min_periods=1, center=False).mean()
+    for i in range(1, len(df) - 30):
+        current_y = df.iloc[i]['mid_y']
+        prev_y = df.iloc[i - 1]['mid_y']
+        next_y = df.iloc[i + 1]['mid_y']
+    peaks, _ = find_peaks(df['mid_y_rolling_mean'].fillna(0).to_numpy(), distance=30)
+    return peaks.tolist()
+
+
+def benchmark_bounces(num_frames=100000):
+    """Sekme tespitinin eski (pandas), vektörel ve akış sürümlerini hız ve sonuç olarak karşılaştırır."""
+    boxes = _synthetic_ball_boxes(num_frames)
+    print(f"{num_frames} karelik sentetik top yörüngesi üzerinde ölçüm yapılıyor...")
+
+    start = time.perf_counter()
+    vectorized = find_bounce_frames((boxes[:, 1] + boxes[:, 3]) / 2).tolist()
+    print(f"{'NumPy':<8} {time.perf_counter() - start:8.3f} s  sekme={len(vectorized)}")
+
+    detector = OnlineBounceDetector()
+    online = []
+    start = time.perf_counter()
+    for box in boxes:
+        online.extend(detector.update(None if np.isnan(box[0]) else box))
+    online.extend(detector.flush())
+    print(f"{'Online':<8} {time.perf_counter() - start:8.3f} s  sekme={len(online)}  "
+          f"aynı={online == vectorized}")
+
+    try:
+        start = time.perf_counter()
+        legacy = _legacy_bounce_frames(boxes)
+    except ImportError:
+        print("pandas/scipy yüklü değil, eski sürümle karşılaştırma atlandı")
+        return
+    print(f"{'pandas':<8} {time.perf_counter() - start:8.3f} s  sekme={len(legacy)}  "
+          f"aynı={legacy == vectorized}")
+
+
+def _synthetic_court_lines(num_lines, seed=0, width=1000, height=560):
+    """Kort çizgilerinin etrafında gürültülü tekrarlarla (Hough benzeri) (num_lines, 1, 4) segmentler üretir."""
+    rng = np.random.default_rng(seed)
+    base = np.array([
+        [300, 120, 700, 120], [150, 480, 850, 480], [250, 300, 750, 300], # Yatay
+        [300, 120, 150, 480], [700, 120, 850, 480], [500, 120, 500, 480], # Dikey
+    ], dtype=np.float64)
+    lines = base[rng.integers(0, len(base), num_lines)] + rng.normal(0, 3, (num_lines, 4))
+    return np.clip(lines, [0, 0, 0, 0], [width, height, width, height]).astype(np.int32)[:, None, :]
+
+
+def _legacy_dedup(corners):
+    # Eski sort_corners: her çift için np.linalg.norm çağıran iç içe döngü
+    unique_corners = []
+    for c in corners:
+        if not any(np.linalg.norm(c - u) < 20 for u in unique_corners):
+            unique_corners.append(c)
+    return np.array(unique_corners)
+
+
+def benchmark_corner_dedup(line_counts=(50, 100, 200, 400), legacy_limit=20000):
+    """Köşe adaylarının tekilleştirilmesini eski iç içe döngü ile ızgara karmasında karşılaştırır."""
+    from utils.action_detector import TennisCourtDetector, merge_close_points
+
+    detector = TennisCourtDetector()
+    for num_lines in line_counts:
+        horizontal, vertical = detector.split_lines(_synthetic_court_lines(num_lines))
+        candidates = detector.line_intersections(horizontal, vertical).reshape(-1, 2)
+        candidates = np.trunc(candidates[~np.isnan(candidates[:, 0])]).astype(int)
+
+        start = time.perf_counter()
+        centers, support = merge_close_points(candidates)
+        grid_time = time.perf_counter() - start
+        line = (f"çizgi={num_lines:<5} aday={len(candidates):<7} ızgara={grid_time * 1000:8.2f} ms  "
+                f"küme={len(centers)} (en büyük destek {support.max()})")
+
+        if len(candidates) <= legacy_limit:
+            start = time.perf_counter()
+            legacy = _legacy_dedup(candidates)
+            legacy_time = time.perf_counter() - start
+            # Eski temsilcilerin en yakın küme merkezine uzaklığı
+            distances = np.hypot(*(legacy[:, None, :] - centers[None]).transpose(2, 0, 1)).min(axis=1)
+            line += (f"  eski={legacy_time * 1000:9.2f} ms (x{legacy_time / grid_time:.0f}) "
+                     f"nokta={len(legacy)} en büyük sapma={distances.max():.1f} px")
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tenis analiz pipeline'ı için performans ölçümleri")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    batching = subparsers.add_parser('batching', help="Kare kare ve gruplu YOLO tespitini karşılaştırır")
+    batching.add_argument('video_path')
+    batching.add_argument('--frames', type=int, default=200)
+    batching.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 4, 8, 16])
+
+    bounces = subparsers.add_parser('bounces', help="Sekme tespitinin eski, vektörel ve akış sürümlerini karşılaştırır")
+    bounces.add_argument('--frames', type=int, default=100000)
+
+    ball_roi = subparsers.add_parser('ball-roi', help="Top tespitini tüm karede ve arama penceresinde karşılaştırır")
+    ball_roi.add_argument('video_path')
+    ball_roi.add_argument('--frames', type=int, default=300)
+    ball_roi.add_argument('--window', type=int, default=320)
+    ball_roi.add_argument('--imgsz', type=int, default=320)
+
+    player_keyframes = subparsers.add_parser('player-keyframes',
+                                             help="Oyuncu tespitini her karede ve anahtar kare modunda karşılaştırır")
+    player_keyframes.add_argument('video_path')
+    player_keyframes.add_argument('--frames', type=int, default=300)
+    player_keyframes.add_argument('--interval', type=int, default=5)
+
+    court_keypoints = subparsers.add_parser('court-keypoints',
+                                            help="Kort anahtar noktası tahmininde gruplamayı ve önbelleği ölçer")
+    court_keypoints.add_argument('video_path')
+    court_keypoints.add_argument('--frames', type=int, default=200)
+    court_keypoints.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 8])
+    court_keypoints.add_argument('--interval', type=int, default=250)
+
+    court_backends = subparsers.add_parser('court-backends',
+                                           help="Kort anahtar noktası modelinin CPU backend'lerini karşılaştırır")
+    court_backends.add_argument('video_path')
+    court_backends.add_argument('--frames', type=int, default=100)
+    # Geçerli backend'ler torch gerektiren modülde tanımlı; bilinmeyen isim CourtLineDetector'da hata verir
+    court_backends.add_argument('--backends', nargs='+', default=None,
+                                help="Ölçülecek backend'ler (varsayılan: hepsi)")
+    court_backends.add_argument('--batch-size', type=int, default=8)
+    court_backends.add_argument('--calibration', type=int, default=32)
+    court_backends.add_argument('--tolerance', type=float, default=None)
+
+    yolo_backends = subparsers.add_parser('yolo-backends',
+                                          help="Oyuncu ve top tracker'larını YOLO backend'leriyle karşılaştırır")
+    yolo_backends.add_argument('video_path')
+    yolo_backends.add_argument('--frames', type=int, default=200)
+    yolo_backends.add_argument('--backends', nargs='+', choices=YOLO_BACKENDS, default=list(YOLO_BACKENDS))
+    yolo_backends.add_argument('--int8', action='store_true', help="int8 destekleyen backend'lerin int8 sürümlerini de ölç")
+    yolo_backends.add_argument('--imgsz', type=int, default=DEFAULT_IMGSZ)
+    yolo_backends.add_argument('--batch-size', type=int, default=8)
+
+    corner_dedup = subparsers.add_parser('corner-dedup',
+                                         help="Köşe adaylarının tekilleştirilmesini sentetik çizgilerle ölçer")
+    corner_dedup.add_argument('--lines', type=int, nargs='+', default=[50, 100, 200, 400])
+    corner_dedup.add_argument('--legacy-limit', type=int, default=20000,
+                              help="Eski (karesel) yöntemin çalıştırılacağı en fazla aday sayısı")
+
+    args = parser.parse_args()
+    if args.command == 'batching':
+        benchmark_batching(args.video_path, args.frames, args.batch_sizes)
+    elif args.command == 'bounces':
+        benchmark_bounces(args.frames)
+    elif args.command == 'ball-roi':
+        benchmark_ball_roi(args.video_path, args.frames, args.window, args.imgsz)
+    elif args.command == 'player-keyframes':
+        benchmark_player_keyframes(args.video_path, args.frames, args.interval)
+    elif args.command == 'court-keypoints':
+        benchmark_court_keypoints(args.video_path, args.frames, args.batch_sizes, args.interval)
+    elif args.command == 'corner-dedup':
+        benchmark_corner_dedup(args.lines, args.legacy_limit)
+    elif args.command == 'yolo-backends':
+        benchmark_yolo_backends(args.video_path, args.frames, args.backends, args.int8, args.imgsz, args.batch_size)
+    elif args.command == 'court-backends':
+        benchmark_court_backends(args.video_path, args.frames, args.backends, args.batch_size,
+                                 args.calibration, args.tolerance)
+
+
+if __name__ == "__main__":
+    main()
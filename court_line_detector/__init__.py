@@ -0,0 +1 @@
+from .court_line_detector import CourtLineDetector, CourtKeypointCache
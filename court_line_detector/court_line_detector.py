@@ -1,33 +1,232 @@
+import os
+import numpy as np
 import torch
-import torchvision.transforms as transforms
+import torch.nn.functional as F
 import torchvision.models as models
-import cv2
+import torchvision.models.quantization as quantization_models
+from utils.frame_similarity import HistogramSimilarity
+
+# Modelin eğitildiği giriş boyutu (kare INPUT_SIZE x INPUT_SIZE'a ölçeklenir)
+INPUT_SIZE = 224
+NUM_KEYPOINTS = 14
+
+# eager: PyTorch modeli olduğu gibi, torchscript: dondurulmuş TorchScript,
+# onnx: ONNX Runtime, int8: statik int8 quantize edilmiş TorchScript
+BACKENDS = ('eager', 'torchscript', 'onnx', 'int8')
+# Dışa aktarılan modeller .pth dosyasının yanına bu uzantılarla kaydedilir
+EXPORT_SUFFIXES = {'torchscript': '.torchscript.pt', 'onnx': '.onnx', 'int8': '.int8.pt'}
+
+
+def _build_resnet(model_path, quantizable=False):
+    """Eğitilmiş ağırlıkları ResNet50'ye yükler (quantizable=True: int8'e çevrilebilir sürüm)."""
+    if quantizable:
+        model = quantization_models.resnet50(quantize=False)
+    else:
+        model = models.resnet50(pretrained=False)
+    model.fc = torch.nn.Linear(model.fc.in_features, NUM_KEYPOINTS*2)
+    model.load_state_dict(torch.load(model_path, map_location=('cpu')))
+    # BatchNorm katmanları eğitim modunda kalırsa çıktı gruptaki diğer karelere bağlı olur
+    return model.eval()
+
+
+def _quantized_engine():
+    # x86'da fbgemm, ARM'da qnnpack
+    engines = torch.backends.quantized.supported_engines
+    return 'fbgemm' if 'fbgemm' in engines else 'qnnpack'
+
+
+def export_path(model_path, backend):
+    """Bir backend için dışa aktarılan modelin dosya yolu."""
+    return os.path.splitext(model_path)[0] + EXPORT_SUFFIXES[backend]
+
+
+def _is_stale(path, model_path):
+    # Dışa aktarılan dosya yoksa ya da ağırlıklar ondan sonra değiştiyse yeniden üretilir
+    return not os.path.exists(path) or os.path.getmtime(path) < os.path.getmtime(model_path)
+
 
 class CourtLineDetector:
-    def __init__(self,model_path):
-        self.model = models.resnet50(pretrained=False)
-        self.model.fc = torch.nn.Linear(self.model.fc.in_features, 14*2)
-        self.model.load_state_dict(torch.load(model_path, map_location=('cpu')))
-
-        self.transform = transforms.Compose([
-            transforms.ToPILImage(),
-            transforms.Resize((224,224)),
-            transforms.ToTensor(),
-            transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
-        ])
+    """
+    Kortun 14 anahtar noktasını ResNet50 ile tahmin eden dedektör.
 
-    def predict(self, image):
+    Ön işleme tamamen tensör üzerinde yapılır (PIL dönüşümü yok): BGR kareler
+    tek bir tensöre alınır, kanal sırası çevrilir, antialias'lı bilinear ile
+    INPUT_SIZE'a ölçeklenir ve ImageNet ortalama/std ile normalize edilir.
+    predict_batch en fazla `batch_size` kareyi tek bir ileri geçişte işler.
+
+    `backend` ile CPU için hızlandırılmış bir çalıştırma seçilebilir. Model ilk
+    kullanımda dinamik grup boyutlu olarak dışa aktarılır ve .pth dosyasının
+    yanına kaydedilir; sonraki çalıştırmalarda (ağırlıklar değişmedikçe) kayıtlı
+    dosya yüklenir. int8 için ilk dışa aktarımda gözlemci istatistiklerini
+    toplamak üzere birkaç temsili kare (`calibration_frames`) gerekir.
+
+    Args:
+        model_path (str): Eğitilmiş ağırlıkların (.pth) yolu.
+        batch_size (int): Tek ileri geçişte işlenecek en fazla kare sayısı.
+        backend (str): BACKENDS içinden biri.
+        calibration_frames (list, optional): int8 kalibrasyonu için BGR kareler.
+    """
+
+    MEAN = torch.tensor([0.485, 0.456, 0.406]).view(1, 3, 1, 1)
+    STD = torch.tensor([0.229, 0.224, 0.225]).view(1, 3, 1, 1)
+
+    def __init__(self, model_path, batch_size=8, backend='eager', calibration_frames=None):
+        if backend not in BACKENDS:
+            raise ValueError(f"Bilinmeyen backend: {backend} (seçenekler: {', '.join(BACKENDS)})")
+        self.batch_size = batch_size
+        self.backend = backend
+        self.session = None
+
+        if backend == 'eager':
+            self.model = _build_resnet(model_path)
+        elif backend == 'torchscript':
+            self.model = self._load_torchscript(model_path)
+        elif backend == 'onnx':
+            self.session = self._load_onnx(model_path)
+        else:
+            self.model = self._load_int8(model_path, calibration_frames)
+
+    def _example_input(self, batch_size=2):
+        return torch.zeros(batch_size, 3, INPUT_SIZE, INPUT_SIZE)
+
+    def _load_torchscript(self, model_path):
+        path = export_path(model_path, 'torchscript')
+        if _is_stale(path, model_path):
+            with torch.no_grad():
+                traced = torch.jit.trace(_build_resnet(model_path), self._example_input())
+            # Dondurma BatchNorm'u konvolüsyonlara katar ve sabitleri yerleştirir
+            torch.jit.save(torch.jit.freeze(traced), path)
+        return torch.jit.optimize_for_inference(torch.jit.load(path))
 
-        img_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        image_tensor = self.transform(img_rgb).unsqueeze(0)
+    def _load_onnx(self, model_path):
+        # onnxruntime sadece bu backend için gerekir
+        import onnxruntime
 
+        path = export_path(model_path, 'onnx')
+        if _is_stale(path, model_path):
+            torch.onnx.export(_build_resnet(model_path), self._example_input(), path,
+                              input_names=['input'], output_names=['keypoints'],
+                              dynamic_axes={'input': {0: 'batch'}, 'keypoints': {0: 'batch'}},
+                              opset_version=17)
+        return onnxruntime.InferenceSession(path, providers=['CPUExecutionProvider'])
+
+    def _load_int8(self, model_path, calibration_frames):
+        torch.backends.quantized.engine = _quantized_engine()
+        path = export_path(model_path, 'int8')
+        if _is_stale(path, model_path):
+            if not calibration_frames:
+                raise ValueError("int8 dışa aktarımı için calibration_frames gerekli")
+
+            model = _build_resnet(model_path, quantizable=True)
+            model.fuse_model()
+            model.qconfig = torch.ao.quantization.get_default_qconfig(torch.backends.quantized.engine)
+            torch.ao.quantization.prepare(model, inplace=True)
+            # Gözlemciler aktivasyon aralıklarını temsili kareler üzerinden toplar
+            with torch.no_grad():
+                for start in range(0, len(calibration_frames), self.batch_size):
+                    model(self._preprocess(calibration_frames[start:start + self.batch_size]))
+            torch.ao.quantization.convert(model, inplace=True)
+
+            with torch.no_grad():
+                torch.jit.save(torch.jit.trace(model, self._example_input()), path)
+        return torch.jit.load(path)
+
+    def _forward(self, batch):
+        """Normalize edilmiş (N, 3, INPUT_SIZE, INPUT_SIZE) tensörü (N, 28) diziye çevirir."""
+        if self.session is not None:
+            return self.session.run(None, {'input': batch.numpy()})[0]
         with torch.no_grad():
-            outputs = self.model(image_tensor)
-        
-        keypoints = outputs.squeeze().cpu().numpy()
-        original_height, original_width = img_rgb.shape[:2]
+            return self.model(batch).cpu().numpy()
+
+    def _preprocess(self, frames):
+        """BGR uint8 kareleri (N, 3, INPUT_SIZE, INPUT_SIZE) normalize tensöre çevirir."""
+        tensors = []
+        for frame in frames:
+            # (H, W, 3) BGR -> (1, 3, H, W) RGB
+            tensor = torch.from_numpy(np.ascontiguousarray(frame[..., ::-1])).permute(2, 0, 1)
+            tensor = tensor.unsqueeze(0).float()
+            # antialias=True, torchvision'ın PIL tabanlı Resize'ına denk küçültme yapar
+            tensors.append(F.interpolate(tensor, size=(INPUT_SIZE, INPUT_SIZE), mode='bilinear',
+                                         align_corners=False, antialias=True))
+        batch = torch.cat(tensors).div_(255.0)
+        return (batch - self.MEAN) / self.STD
+
+    def predict_batch(self, frames):
+        """
+        Karelerin anahtar noktalarını gruplar halinde tahmin eder.
+
+        Returns:
+            np.ndarray: (N, 28) dizi; her satır görüntü koordinatlarında x0, y0, x1, y1, ...
+        """
+        keypoints = []
+        for start in range(0, len(frames), self.batch_size):
+            chunk = frames[start:start + self.batch_size]
+            outputs = self._forward(self._preprocess(chunk))
+
+            # Model INPUT_SIZE x INPUT_SIZE girişe göre koordinat üretir; orijinal boyuta ölçekle
+            sizes = np.array([frame.shape[:2] for frame in chunk], dtype=np.float32)
+            outputs[:, ::2] *= sizes[:, 1:2] / INPUT_SIZE
+            outputs[:, 1::2] *= sizes[:, 0:1] / INPUT_SIZE
+            keypoints.append(outputs)
+
+        if not keypoints:
+            return np.empty((0, NUM_KEYPOINTS*2), dtype=np.float32)
+        return np.concatenate(keypoints)
+
+    def predict(self, image):
+        return self.predict_batch([image])[0]
+
+
+class CourtKeypointCache:
+    """
+    Sabit yayın kamerasında anahtar noktaları kareler arasında yeniden kullanan önbellek.
+
+    Ağ sadece sahne değiştiğinde (son çalıştırıldığı kareye HSV histogram
+    korelasyonu `scene_threshold` altına düştüğünde) ya da `interval` karede
+    bir yeniden çalıştırılır; diğer karelerde son anahtar noktalar döndürülür.
+    Histogram oyuncu ve top hareketinden neredeyse etkilenmez, kamera açısı
+    değişince ise belirgin düşer.
+
+    Args:
+        detector (CourtLineDetector): Anahtar nokta dedektörü.
+        interval (int, optional): En fazla kaç karede bir ağın yeniden çalıştırılacağı (None: sadece sahne değişiminde).
+        scene_threshold (float): Bunun altındaki benzerlik sahne değişimi sayılır.
+        subsample (int): Histogram için her eksende kaç pikselden birinin kullanılacağı.
+    """
+
+    def __init__(self, detector, interval=250, scene_threshold=0.85, subsample=4):
+        self.detector = detector
+        self.interval = interval
+        self.scene_threshold = scene_threshold
+        self.subsample = subsample
+        self.checked = 0
+        self.inferred = 0
+        self.reset()
+
+    def reset(self):
+        """Önbelleği boşaltır; sonraki karede ağ mutlaka çalışır."""
+        self.keypoints = None
+        self._similarity = None
+        self._age = 0
+
+    def _needs_inference(self, frame):
+        if self.keypoints is None:
+            return True
+        if self.interval is not None and self._age >= self.interval:
+            return True
+        return self._similarity.score(frame) < self.scene_threshold
 
-        keypoints[::2] *= original_width/244.0
-        keypoints[1::2] *= original_height/244.0
+    def update(self, frame):
+        """Sıradaki karenin anahtar noktalarını döndürür (gerekirse ağı çalıştırır)."""
+        self.checked += 1
+        if self._needs_inference(frame):
+            self.keypoints = self.detector.predict(frame)
+            self._similarity = HistogramSimilarity(frame, subsample=self.subsample)
+            self._age = 0
+            self.inferred += 1
+        self._age += 1
+        return self.keypoints
 
-        return keypoints
\ No newline at end of file
+    def summary(self):
+        ratio = self.inferred / self.checked if self.checked else 0.0
+        return f"{self.checked} karede ağ {self.inferred} kez çalıştı (%{ratio * 100:.1f})"
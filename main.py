@@ -1,80 +1,275 @@
-from utils import (read_video, save_video)
-from utils.match_processor import process_match
+from utils import (VideoFrameSource, VideoSaver, indices_to_segments, segments_to_indices, iter_batches)
+from utils.pipeline import FramePipeline
+from utils.match_processor import process_match, open_action_stream
 from utils.mini_court import MiniCourt
+from utils.match_renderer import MatchRenderer
+from utils.detection_cache import DetectionCache
+from utils.detection_store import DetectionStoreBuilder
+from utils.frame_gate import DuplicateFrameGate
+import itertools
 import os
-import pandas as pd
 import cv2
 
-from trackers import PlayerTracker, BallTracker
+# True: aksiyon filtresi, tespit ve çizim tek geçişte yapılır (ara video yazılmaz)
+FUSED_PIPELINE = True
+# Filtrelenmiş videoyu yine de kaydetmek istersek True yapılır (takip için gerekmez)
+WRITE_FILTERED_VIDEO = False
+# YOLO modellerine tek çağrıda gönderilecek kare sayısı (CPU'da çağrı başı maliyeti azaltır)
+BATCH_SIZE = 8
+# Aksiyon filtresi kaba-ince tarama ayarları: her ACTION_STRIDE karede bir sınıflandır,
+# karar değişen aralıkları kare kare incele; MIN_SEGMENT_LENGTH'ten kısa titremeleri yok say
+ACTION_STRIDE = 15
+ACTION_HYSTERESIS = 0.02
+MIN_SEGMENT_LENGTH = 50
+# Oyuncu modeli (yolov8x) her PLAYER_KEYFRAME_INTERVAL karede bir çalışır, aradaki karelerde
+# kutular optik akışla taşınır (1: her karede tespit)
+PLAYER_KEYFRAME_INTERVAL = 5
+# Top modeli tüm kare yerine tahmini top konumu etrafındaki bu boyuttaki pencerede çalışır
+# (None: her karede tüm kare); top BALL_MAX_MISSES kare bulunamazsa tüm kareye dönülür
+BALL_SEARCH_WINDOW = 320
+BALL_MAX_MISSES = 3
+# Küçültülmüş gri karede en büyük fark DUPLICATE_THRESHOLD'un altındaysa kare kopya sayılır
+# ve modeller çalıştırılmadan önceki tespitler kullanılır (None: her karede çıkarım);
+# aynı tespit en fazla MAX_DUPLICATE_REUSE kare üst üste kullanılır
+DUPLICATE_THRESHOLD = 3.0
+MAX_DUPLICATE_REUSE = 10
+# YOLO modellerinin çalıştırılacağı backend ('pt', 'onnx', 'openvino', 'torchscript');
+# dışa aktarılan modeller ağırlıkların yanına kaydedilir, başarısız olursa .pt kullanılır.
+# YOLO_INT8 sadece onnx ve openvino için geçerlidir
+YOLO_BACKEND = 'pt'
+YOLO_INT8 = False
+YOLO_IMGSZ = 640
+# Isı haritasında sekmelerin yoğunluğunun yarıya indiği kare sayısı (None: sönmez)
+HEATMAP_HALF_LIFE = None
+# decode / çıkarım / çizim / encode aşamaları arasındaki kuyrukların kapasitesi
+# (BATCH_SIZE'lık gruplar ya da tek kareler)
+PIPELINE_QUEUE_SIZE = 4
+# Kort köşeleri ilk karede arayüzsüz tespit edilir; güven MIN_CORNER_CONFIDENCE altındaysa
+# MANUAL_CORNER_FALLBACK açıksa seçim penceresi açılır (kapalıysa işlem iptal edilir)
+AUTO_CORNERS = True
+MIN_CORNER_CONFIDENCE = 0.5
+MANUAL_CORNER_FALLBACK = True
+# Aksiyon filtresi için süreç sayısı (video zaman aralıklarına bölünüp paralel taranır);
+# varsayılan tüm çekirdekler, parça sayısından fazla süreç açılmaz (1: sıralı tarama)
+ACTION_WORKERS = os.cpu_count() or 1
+
+
+def render_output(video_frames, player_tracker, ball_tracker,
+                  player_detections, ball_detections, corners, output_video_path):
+    # Top pozisyonlarını Kalman filtresiyle tahmin et: kısa boşluklar doldurulur,
+    # uzun boşluklar ve segmentler arası atlamalar köprülenmez
+    frame_indices = None if video_frames.segments is None else segments_to_indices(video_frames.segments)
+    ball_detections = ball_tracker.estimate_ball_positions(ball_detections, frame_indices)
+
+    # Sekme anlarını tespit et
+    bounce_frame_indices = ball_tracker.get_ball_shot_frames(ball_detections)
+
+    # Sekme karelerinde topun alt orta noktası (Nx2); ısı haritası her sekmeyi kendi karesinde ekler
+    bounce_frames, bounce_points = ball_tracker.get_bounce_events(ball_detections, bounce_frame_indices)
+
+    # Mini kort ve ısı haritası: statik kort ve sekmeler bir kez hazırlanır
+    mini_court = None
+    first_frame = video_frames.first_frame()
+    if first_frame is not None:
+        mini_court = MiniCourt(first_frame)
+        mini_court.set_heatmap(bounce_points, corners, bounce_frames, half_life=HEATMAP_HALF_LIFE)
+
+    # Oyuncu, top ve mini kort katmanları her kareye tek geçişte, yerinde çizilir
+    renderer = MatchRenderer(player_tracker, ball_tracker, player_detections, ball_detections, mini_court)
+
+    # decode -> çizim -> encode ayrı iş parçacıklarında, sınırlı kuyruklarla ve kare sırası korunarak
+    #fps değerini kaydediciye gönderiyoruz (kareler çizildikçe diske yazılır)
+    with VideoSaver(output_video_path, video_frames.fps) as saver:
+        pipeline = FramePipeline(itertools.islice(enumerate(video_frames), len(renderer)),
+                                 [('render', lambda item: renderer.render_frame(item[1], item[0])),
+                                  ('encode', saver.write)],
+                                 queue_size=PIPELINE_QUEUE_SIZE)
+        pipeline.run()
+
+    print(f"Video kaydedildi: {output_video_path} ({saver.frames_written} kare)")
+    pipeline.print_report()
+
+
+def make_frame_gate():
+    # Her takipçinin kendi referans karesi olmalı, bu yüzden kapılar paylaşılmaz
+    if DUPLICATE_THRESHOLD is None:
+        return None
+    return DuplicateFrameGate(threshold=DUPLICATE_THRESHOLD, max_reuse=MAX_DUPLICATE_REUSE)
+
+
+def tracker_cache_key(cache, tracker, video_path, segments):
+    # Takipçilerin detect_frames içinde kullandığı anahtarın aynısı
+    return cache.make_key(video_path, tracker.model_path, tracker.inference_params(), segments)
+
+
+def detect_fused(action_frames, player_tracker, ball_tracker):
+    """
+    Aksiyon karelerini oyuncu ve top modellerinden akış halinde geçirir.
+
+    Returns:
+        tuple: (oyuncu tespitleri, top tespitleri, işlenen kare numaraları)
+    """
+    def detect_players(batch):
+        frame_indices, frames = zip(*batch)
+        return frame_indices, frames, player_tracker.detect_batch(frames)
+
+    def detect_balls(item):
+        frame_indices, frames, player_results = item
+        return frame_indices, player_results, ball_tracker.detect_batch(frames)
+
+    # decode (aksiyon filtresi) -> oyuncu modeli -> top modeli ayrı iş parçacıklarında çalışır;
+    # iki takipçi de durum tuttuğu için her biri tek işçilidir ve gruplar sırayla işlenir
+    pipeline = FramePipeline(iter_batches(action_frames, BATCH_SIZE),
+                             [('players', detect_players), ('balls', detect_balls)],
+                             queue_size=PIPELINE_QUEUE_SIZE)
+
+    action_frame_indices = []
+    player_builder = DetectionStoreBuilder()
+    ball_builder = DetectionStoreBuilder()
+    for frame_indices, player_results, ball_results in pipeline:
+        action_frame_indices.extend(frame_indices)
+        for frame_detections in player_results:
+            player_builder.append_frame(*frame_detections)
+        for frame_detections in ball_results:
+            ball_builder.append_frame(*frame_detections)
+    pipeline.print_report()
+    for tracker in (player_tracker, ball_tracker):
+        if tracker.frame_gate is not None:
+            print(f"{tracker.__class__.__name__}: {tracker.frame_gate.summary()}")
+
+    return player_builder.build(), ball_builder.build(), action_frame_indices
+
+
+def main_fused(input_video_path, filtered_video_path, output_video_path):
+    # Aksiyon filtresinin kabul ettiği kareler doğrudan bellekte takipçilere gider
+    print("Video işleniyor, aksiyon kareleri doğrudan takip aşamasına aktarılıyor...")
+    stream = open_action_stream(input_video_path,
+                                filtered_output_path=filtered_video_path if WRITE_FILTERED_VIDEO else None,
+                                stride=ACTION_STRIDE,
+                                hysteresis=ACTION_HYSTERESIS,
+                                min_segment_length=MIN_SEGMENT_LENGTH,
+                                workers=ACTION_WORKERS,
+                                auto_corners=AUTO_CORNERS,
+                                min_corner_confidence=MIN_CORNER_CONFIDENCE,
+                                manual_fallback=MANUAL_CORNER_FALLBACK)
+
+    if stream is None:
+        print("Video işleme başarısız oldu veya iptal edildi.")
+        return
+
+    corners, _, action_frames, scanned_segments = stream
+
+    # oyuncu ve top takibi. trackers (torch/ultralytics) burada yüklenir: aksiyon taramasının
+    # spawn ile başlatılan süreçleri main.py'yi yeniden içe aktarır ve modellere ihtiyaçları yok
+    from trackers import PlayerTracker, BallTracker
+    player_tracker = PlayerTracker(model_path='yolov8x', batch_size=BATCH_SIZE,
+                                   keyframe_interval=PLAYER_KEYFRAME_INTERVAL,
+                                   frame_gate=make_frame_gate(),
+                                   backend=YOLO_BACKEND, imgsz=YOLO_IMGSZ, int8=YOLO_INT8)
+    ball_tracker = BallTracker(model_path='models/updated_new_best.pt', batch_size=BATCH_SIZE,
+                               search_window=BALL_SEARCH_WINDOW, max_misses=BALL_MAX_MISSES,
+                               frame_gate=make_frame_gate(),
+                               backend=YOLO_BACKEND, imgsz=YOLO_IMGSZ, int8=YOLO_INT8)
+    trackers = (player_tracker, ball_tracker)
+
+    # Aynı video, model, parametreler ve aksiyon aralıklarıyla tekrar çalıştırıldığında tespitler
+    # önbellekten gelir (anahtarlar iki aşamalı akışla aynıdır). Kaba-ince taramada aralıklar
+    # kareler okunmadan bilindiği için önbellek takipten önce denenebilir
+    detection_cache = DetectionCache("tracker_stubs")
+    action_segments = None
+    cached = [None, None]
+    if scanned_segments is not None:
+        action_segments = [(seg_start, seg_end) for seg_start, seg_end, _ in scanned_segments]
+        cached = [detection_cache.load(tracker_cache_key(detection_cache, tracker, input_video_path, action_segments))
+                  for tracker in trackers]
+
+    if all(detections is not None for detections in cached):
+        # Kareler hiç okunmaz (filtrelenmiş video da bu durumda yazılmaz)
+        action_frames.close()
+        print("Tespitler önbellekten yüklendi, takip aşaması atlandı")
+        player_detections, ball_detections = cached
+    else:
+        player_detections, ball_detections, action_frame_indices = detect_fused(
+            action_frames, player_tracker, ball_tracker)
+        if action_segments is None:
+            action_segments = indices_to_segments(action_frame_indices)
+        for tracker, detections in zip(trackers, (player_detections, ball_detections)):
+            detection_cache.save(tracker_cache_key(detection_cache, tracker, input_video_path, action_segments),
+                                 detections)
+
+    # Interpolasyon ve sekme tespiti tüm top yörüngesine ihtiyaç duyduğu için çizim
+    # ikinci bir geçişte yapılır. Ara video yerine orijinal videodan (kayıpsız)
+    # sadece aksiyon kareleri okunur.
+    video_frames = VideoFrameSource(input_video_path, segments=action_segments)
+
+    render_output(video_frames, player_tracker, ball_tracker,
+                  player_detections, ball_detections, corners, output_video_path)
 
 
 def main():
     input_video_path = "input_videos/input_video.mp4"
     filtered_video_path = "output_videos/filtered_action.mp4"
     output_video_path = "output_videos/output_video.mp4"
+    segment_index_path = "output_videos/action_segments.json"
 
     if not os.path.exists("output_videos"):
         os.makedirs("output_videos")
 
-    # Önce aksiyon sahnelerini filtrele
+    if FUSED_PIPELINE:
+        main_fused(input_video_path, filtered_video_path, output_video_path)
+        return
+
+    # Önce aksiyon sahnelerini bul; video yeniden kodlanmaz, sadece segment indeksi yazılır
     print("Video işleniyor, aksiyon sahneleri ayrıştırılıyor...")
-    result = process_match(input_video_path, filtered_video_path)
-    
+    result = process_match(input_video_path,
+                           filtered_video_path if WRITE_FILTERED_VIDEO else None,
+                           stride=ACTION_STRIDE,
+                           hysteresis=ACTION_HYSTERESIS,
+                           min_segment_length=MIN_SEGMENT_LENGTH,
+                           workers=ACTION_WORKERS,
+                           segment_index_path=segment_index_path,
+                           auto_corners=AUTO_CORNERS,
+                           min_corner_confidence=MIN_CORNER_CONFIDENCE,
+                           manual_fallback=MANUAL_CORNER_FALLBACK)
+
     if result is None:
         print("Video işleme başarısız oldu veya iptal edildi.")
         return
-        
-    processed_video_path, corners = result
 
-    # hem kareleri hem de fps'i alıyoruz (Artık filtrelenmiş videoyu okuyoruz)
-    video_frames, fps = read_video(processed_video_path)
+    _, corners, segments = result
+    action_segments = [(seg_start, seg_end) for seg_start, seg_end, _ in segments]
+
+    # Kareleri listeye doldurmak yerine akış halinde okuyoruz. Filtrelenmiş ara video
+    # yerine orijinal videoda indeksteki aralıklara atlanır (ek kodlama/kayıp yok).
+    # Her aşama kaynağı baştan dolaşır, böylece bellek kullanımı video uzunluğundan bağımsızdır
+    video_frames = VideoFrameSource(input_video_path, segments=action_segments)
 
-    # oyuncu ve top takibi
-    player_tracker = PlayerTracker(model_path='yolov8x')
-    ball_tracker = BallTracker(model_path='models/updated_new_best.pt')
+    # oyuncu ve top takibi (trackers, tarama süreçlerine yük olmasın diye burada yüklenir)
+    from trackers import PlayerTracker, BallTracker
+    player_tracker = PlayerTracker(model_path='yolov8x', batch_size=BATCH_SIZE,
+                                   keyframe_interval=PLAYER_KEYFRAME_INTERVAL,
+                                   frame_gate=make_frame_gate(),
+                                   backend=YOLO_BACKEND, imgsz=YOLO_IMGSZ, int8=YOLO_INT8)
+    ball_tracker = BallTracker(model_path='models/updated_new_best.pt', batch_size=BATCH_SIZE,
+                               search_window=BALL_SEARCH_WINDOW, max_misses=BALL_MAX_MISSES,
+                               frame_gate=make_frame_gate(),
+                               backend=YOLO_BACKEND, imgsz=YOLO_IMGSZ, int8=YOLO_INT8)
+
+    # Aynı video, model ve parametrelerle tekrar çalıştırıldığında tespitler önbellekten gelir
+    detection_cache = DetectionCache("tracker_stubs")
 
     player_detections = player_tracker.detect_frames(video_frames,
-                                                    read_from_stub=False,
-                                                    stub_path="tracker_stubs/player_detections.pkl")
-                                                    
+                                                    cache=detection_cache,
+                                                    video_path=input_video_path,
+                                                    segments=action_segments)
+
     ball_detections = ball_tracker.detect_frames(video_frames,
-                                                read_from_stub=False,
-                                                stub_path="tracker_stubs/ball_detections.pkl")
-    
-    # Top pozisyonlarını interpolate et (eksik verileri tamamla)
-    ball_detections = ball_tracker.interpolate_ball_positions(ball_detections)
-    
-    # Sekme anlarını tespit et
-    bounce_frame_indices = ball_tracker.get_ball_shot_frames(ball_detections)
-    
-    bounce_points = []
-    for frame_idx in bounce_frame_indices:
-        ball_dict = ball_detections[frame_idx]
-        if 1 in ball_dict:
-            bbox = ball_dict[1]
-            # Topun merkezi (veya alt noktası)
-            # x_center = (bbox[0] + bbox[2]) / 2
-            # y_center = (bbox[1] + bbox[3]) / 2
-            # Genellikle topun alt noktası yere temas eder
-            x_center = (bbox[0] + bbox[2])/2
-            y_bottom = bbox[3] 
-            bounce_points.append((x_center, y_bottom))
-
-
-    # kutuları çizme
-
-    # oyuncu ve top tespitlerine göre kutuları çiz
-    output_video_frames = player_tracker.draw_bboxes(video_frames, player_detections)
-    output_video_frames = ball_tracker.draw_bboxes(output_video_frames, ball_detections)
-    
-    # Mini kort ve ısı haritasını çiz
-    # İlk kareden mini kort için referans alabiliriz, ama draw_heatmap her kareye uygulayacak
-    if len(video_frames) > 0:
-        mini_court = MiniCourt(video_frames[0])
-        output_video_frames = mini_court.draw_heatmap(output_video_frames, bounce_points, corners)
-
-    #fps değerini kaydetme fonksiyonuna gönderiyoruz
-    save_video(output_video_frames, output_video_path, fps)
+                                                cache=detection_cache,
+                                                video_path=input_video_path,
+                                                segments=action_segments)
+
+    render_output(video_frames, player_tracker, ball_tracker,
+                  player_detections, ball_detections, corners, output_video_path)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -41,7 +41,8 @@ def process_match(video_path, output_path=None):
     print("Köşeler seçildi, video işleniyor...")
     
     # Referans görüntü oluştur (Aksiyon anı tespiti için)
-    _, ref_warped, _, _ = detector.process_video_frame(first_frame, corners=corners)
+    # Sabit kamera: önbellekli matris ve küçük analiz çözünürlüğü, çizim yok
+    ref_warped = detector.warp_for_analysis(first_frame, corners)
     
     # Video yazıcı ayarları
     fps = int(cap.get(cv2.CAP_PROP_FPS))
@@ -70,8 +71,8 @@ def process_match(video_path, output_path=None):
             
         frame_count += 1
         
-        # Sabit köşelerle işle (Sadece benzerlik kontrolü için warped alıyoruz)
-        processed, warped, _, _ = detector.process_video_frame(frame, corners=corners)
+        # Sabit köşelerle hızlı yol (Sadece benzerlik kontrolü için küçük warped alıyoruz)
+        warped = detector.warp_for_analysis(frame, corners)
         
         if warped is not None:
             # Benzerlik kontrolü
@@ -3,12 +3,17 @@ import numpy as np
 import matplotlib.pyplot as plt
 
 class TennisCourtDetector:
-    def __init__(self):
+    def __init__(self, analysis_size=(274, 594)):
         # Gerçek kort ölçüleri (metre cinsinden)
         self.court_length = 23.77  # Uzunluk
         self.court_width_doubles = 10.97  # Çiftler için genişlik
         self.court_width_singles = 8.23  # Tekler için genişlik
         self.net_height = 0.914  # File yüksekliği (metre)
+
+        # Aksiyon filtresi için kuş bakışı görüntünün boyutu (1097x2377'nin ~1/4'ü)
+        self.analysis_size = analysis_size
+        # Köşe seti -> perspektif matrisi önbelleği (sabit kamera için bir kez hesaplanır)
+        self._homography_cache = {}
         
     def preprocess_image(self, image):
         """Görüntüyü ön işleme tabi tutar"""
@@ -186,6 +191,34 @@ class TennisCourtDetector:
         
         return sorted_corners
 
+    def get_analysis_homography(self, corners, output_size=None):
+        """Köşe seti ve çıktı boyutu için perspektif matrisini önbellekten döndürür."""
+        output_size = tuple(output_size or self.analysis_size)
+        corners = np.float32(corners)
+        key = (corners.tobytes(), output_size)
+
+        matrix = self._homography_cache.get(key)
+        if matrix is None:
+            dst_corners = np.float32([
+                [0, 0],
+                [output_size[0], 0],
+                [output_size[0], output_size[1]],
+                [0, output_size[1]]
+            ])
+            matrix = cv2.getPerspectiveTransform(corners, dst_corners)
+            self._homography_cache[key] = matrix
+        return matrix
+
+    def warp_for_analysis(self, frame, corners, output_size=None):
+        """
+        Sabit kamera hızlı yolu: kareyi sadece aksiyon analizi için küçük çözünürlükte
+        kuş bakışına çevirir. Matris önbellekten gelir; köşe/ölçü çizimi ve UMat
+        gidiş-dönüşü yapılmaz.
+        """
+        output_size = tuple(output_size or self.analysis_size)
+        matrix = self.get_analysis_homography(corners, output_size)
+        return cv2.warpPerspective(frame, matrix, output_size)
+
     def apply_perspective_transform(self, image, src_corners, output_size=(1097, 2377)):
         """Perspektif dönüşümü uygular"""
         # Hedef köşeler (yukarıdan bakış)
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from utils.action_detector import CORNER_MERGE_RADIUS, merge_close_points
+
+
+def _brute_force_clusters(points, radius):
+    """Tüm nokta çiftlerini karşılaştıran tek bağlantılı kümeleme: (merkez x, merkez y, destek) listesi."""
+    labels = np.arange(len(points))
+    close = np.hypot(*(points[:, None] - points[None]).transpose(2, 0, 1)) < radius
+    for _ in range(len(points)):
+        labels = np.where(close, labels[None], len(points)).min(axis=1)
+    return sorted((*np.round(points[labels == label].mean(axis=0), 6), int((labels == label).sum()))
+                  for label in np.unique(labels))
+
+
+def _as_sorted(centers, support):
+    return sorted((*np.round(center, 6), int(count)) for center, count in zip(centers, support))
+
+
+@pytest.mark.parametrize('boundary', [CORNER_MERGE_RADIUS, 2 * CORNER_MERGE_RADIUS / np.sqrt(2)])
+def test_points_across_cell_boundary_merge(boundary):
+    # Ortadaki iki nokta bir ızgara hücresi sınırının iki yanında, aralarında 0.1 px var;
+    # dış noktalar iki yanın ortalamalarını birbirinden radius'tan fazla uzaklaştırır
+    offsets = np.array([-19.35, -19.35, -0.05, 0.05, 19.35, 19.35])
+    points = np.stack([boundary + offsets, np.full(len(offsets), 50.0)], axis=1)
+    centers, support = merge_close_points(points, CORNER_MERGE_RADIUS)
+    assert support.tolist() == [len(points)]
+    np.testing.assert_allclose(centers[0], points.mean(axis=0))
+
+
+def test_distant_points_in_one_cell_stay_apart():
+    # 26.9 px ayrı iki nokta hiçbir zaman birleşmemeli
+    points = np.array([[0.5, 0.5], [19.5, 19.5], [0.5, 0.5]])
+    centers, support = merge_close_points(points, CORNER_MERGE_RADIUS)
+    np.testing.assert_allclose(centers, [[0.5, 0.5], [19.5, 19.5]])
+    assert support.tolist() == [2, 1]
+
+
+def test_matches_brute_force():
+    rng = np.random.default_rng(0)
+    for size in (300, 1000):
+        points = np.round(rng.uniform(0, size, (400, 2)))
+        points = np.concatenate([points, points[:100]])
+        expected = _brute_force_clusters(points, CORNER_MERGE_RADIUS)
+        assert _as_sorted(*merge_close_points(points, CORNER_MERGE_RADIUS)) == expected
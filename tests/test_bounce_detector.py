@@ -0,0 +1,133 @@
+import numpy as np
+import pytest
+
+from trackers.ball_state_estimator import BallStateEstimator
+from trackers.bounce_detector import (OnlineBounceDetector, find_bounce_frames, find_rally_bounce_frames,
+                                      rolling_mean)
+
+BOUNCE_PERIOD = 40
+
+
+def _rally_mid_y(num_frames):
+    # Top her BOUNCE_PERIOD karede yere değer: görüntüde mid_y en büyük olur
+    phase = (np.arange(num_frames) % BOUNCE_PERIOD) - BOUNCE_PERIOD / 2
+    return 500 - 0.6 * phase ** 2
+
+
+def _estimated_track(mid_y, missing):
+    """Tespitleri BallStateEstimator'dan geçirip (mid_y, ölçüldü mü) dizilerini döndürür."""
+    estimator = BallStateEstimator()
+    estimated = np.full(len(mid_y), np.nan)
+    measured = np.zeros(len(mid_y), dtype=bool)
+    for i, y in enumerate(mid_y):
+        box = None if missing[i] else (100.0, y - 5, 110.0, y + 5)
+        state = estimator.update(box)
+        if state.box is not None:
+            estimated[i] = (state.box[1] + state.box[3]) / 2
+            measured[i] = state.status == 'detected'
+    return estimated, measured
+
+
+def test_no_bounce_at_gap_edge():
+    num_frames = 400
+    mid_y = _rally_mid_y(num_frames)
+    # Ralli ortasında max_gap'ten uzun boşluk; top inerken kayboluyor
+    gap_start, gap_end = 125, 185
+    missing = np.zeros(num_frames, dtype=bool)
+    missing[gap_start:gap_end] = True
+
+    estimated, measured = _estimated_track(mid_y, missing)
+    last_estimated = gap_start + np.flatnonzero(np.isnan(estimated[gap_start:]))[0] - 1
+    assert last_estimated > gap_start # Boşluk başı tahminle uzatılmış olmalı
+
+    def at_gap_edge(frames):
+        return [frame for frame in frames if gap_start - 3 <= frame <= gap_end + 3]
+
+    # Tüm dizi tek sinyal sayılınca (NaN -> 0) boşluk kenarında sahte sekme çıkar
+    assert at_gap_edge(find_bounce_frames(estimated))
+
+    bounces = find_rally_bounce_frames(estimated, measured)
+    assert not at_gap_edge(bounces)
+
+    # Boşluk dışındaki gerçek sekmelerin hepsi bulunur (yumuşatma gecikmesi kadar kayabilir)
+    true_bounces = [frame for frame in range(BOUNCE_PERIOD // 2, num_frames - 5, BOUNCE_PERIOD)
+                    if not gap_start - 5 <= frame <= gap_end + 5]
+    assert len(bounces) == len(true_bounces)
+    assert np.abs(np.asarray(bounces) - true_bounces).max() <= 3
+
+
+def test_bridged_predictions_are_kept():
+    # max_gap'ten kısa boşluk tahminle köprülenir; sekme tahmin edilen karede olsa da bulunur
+    mid_y = _rally_mid_y(200)
+    missing = np.zeros(200, dtype=bool)
+    missing[57:63] = True
+
+    estimated, measured = _estimated_track(mid_y, missing)
+    assert not np.isnan(estimated).any()
+    assert np.array_equal(find_rally_bounce_frames(estimated, measured), find_bounce_frames(estimated))
+
+
+def _scipy_bounce_frames(mid_y, distance=30):
+    """Eski akış: pandas rolling(5, min_periods=1) + fillna(0) + scipy find_peaks(distance)."""
+    find_peaks = pytest.importorskip('scipy.signal').find_peaks
+    pd = pytest.importorskip('pandas')
+    smoothed = pd.Series(mid_y, dtype=np.float64).rolling(window=5, min_periods=1).mean().fillna(0)
+    return find_peaks(smoothed.to_numpy(), distance=distance)[0]
+
+
+def _noisy_series(rng, num_frames, gap_ratio=0.1, quantize=False):
+    mid_y = _rally_mid_y(num_frames) + rng.normal(0, 5, num_frames)
+    if quantize:
+        # Tam sayıya yuvarlanan konumlar eşit değerli düzlükler üretir
+        mid_y = np.round(mid_y / 4) * 4
+    mid_y[rng.random(num_frames) < gap_ratio] = np.nan
+    return mid_y
+
+
+@pytest.mark.parametrize('mid_y', [
+    np.array([]),
+    np.array([400.0]),
+    np.array([400.0, 410.0]),
+    np.array([400.0, 410.0, 400.0]),
+    np.full(10, np.nan),
+    np.full(50, 300.0), # Tamamen düz: tepe yok
+    np.array([0, 1, 5, 5, 5, 5, 1, 0, 3, 3, 2] * 6, dtype=np.float64), # Düzlükler
+    np.array([0, 5, 0, 0, 5, 0, 0, 5, 0] * 8, dtype=np.float64), # Eşit yükseklikte tepeler
+    np.where(np.arange(200) % 30 == 0, 500.0, 300.0), # Tepeler tam `distance` aralıklı
+    np.where(np.arange(200) % 29 == 0, 500.0, 300.0), # Tepeler `distance`'tan bir kare yakın
+    _rally_mid_y(300) + np.where(np.arange(300) % 7 == 0, 1e-9, 0.0), # Çok küçük belirginlikli tepeler
+])
+def test_matches_find_peaks_edge_cases(mid_y):
+    assert find_bounce_frames(mid_y).tolist() == _scipy_bounce_frames(mid_y).tolist()
+
+
+@pytest.mark.parametrize('distance', [1, 2, 30, 100])
+@pytest.mark.parametrize('quantize', [False, True])
+def test_matches_find_peaks_on_noisy_tracks(distance, quantize):
+    rng = np.random.default_rng(distance)
+    for _ in range(20):
+        mid_y = _noisy_series(rng, int(rng.integers(50, 600)), quantize=quantize)
+        assert find_bounce_frames(mid_y, distance).tolist() == _scipy_bounce_frames(mid_y, distance).tolist()
+
+
+def test_rolling_mean_matches_pandas():
+    pd = pytest.importorskip('pandas')
+    mid_y = _noisy_series(np.random.default_rng(0), 300, gap_ratio=0.3)
+    expected = pd.Series(mid_y).rolling(window=5, min_periods=1).mean().to_numpy()
+    np.testing.assert_allclose(rolling_mean(mid_y), expected, equal_nan=True)
+
+
+@pytest.mark.parametrize('num_frames', [0, 1, 2, 3, 40, 500])
+def test_online_detector_matches_batch(num_frames):
+    rng = np.random.default_rng(num_frames)
+    mid_y = _noisy_series(rng, num_frames)
+    boxes = np.stack([np.full(num_frames, 100.0), mid_y - 5, np.full(num_frames, 110.0), mid_y + 5],
+                     axis=1).astype(np.float32)
+
+    detector = OnlineBounceDetector()
+    online = []
+    for box in boxes:
+        online.extend(detector.update(None if np.isnan(box[1]) else box))
+    online.extend(detector.flush())
+
+    assert online == find_bounce_frames((boxes[:, 1] + boxes[:, 3]) / 2).tolist()
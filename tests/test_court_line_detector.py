@@ -0,0 +1,72 @@
+import os
+import shutil
+
+import cv2
+import numpy as np
+import pytest
+
+pytest.importorskip('torch')
+pytest.importorskip('torchvision')
+
+from court_line_detector import CourtLineDetector
+
+MODEL_PATH = os.path.join(os.path.dirname(__file__), '..', 'models', 'keypoints_model.pth')
+# Eager modele göre izin verilen en büyük anahtar nokta farkı (piksel)
+TOLERANCES = {'torchscript': 1.0, 'onnx': 1.0, 'int8': 5.0}
+
+
+def _has_weights(path):
+    # git-lfs çekilmemişse dosya sadece küçük bir işaretçi metnidir
+    if not os.path.isfile(path):
+        return False
+    with open(path, 'rb') as f:
+        return not f.read(64).startswith(b'version https://git-lfs')
+
+
+pytestmark = pytest.mark.skipif(not _has_weights(MODEL_PATH), reason="kort anahtar noktası ağırlıkları yok")
+
+
+def _court_frames(num_frames=8, size=(720, 1280)):
+    """Yeşil zemin üzerinde farklı perspektiflerle çizilmiş beyaz kort çizgileri."""
+    rng = np.random.default_rng(0)
+    height, width = size
+    frames = []
+    for _ in range(num_frames):
+        frame = np.zeros((height, width, 3), dtype=np.uint8)
+        frame[:] = (60, 130, 70)
+        top, bottom = rng.uniform(0.15, 0.3) * height, rng.uniform(0.8, 0.95) * height
+        inset = rng.uniform(0.25, 0.35) * width
+        corners = np.int32([[inset, top], [width - inset, top],
+                            [width * 0.05, bottom], [width * 0.95, bottom]])
+        cv2.polylines(frame, [corners[[0, 1, 3, 2]]], True, (255, 255, 255), 4)
+        cv2.line(frame, (width // 2, int(top)), (width // 2, int(bottom)), (255, 255, 255), 3)
+        frames.append(frame)
+    return frames
+
+
+@pytest.fixture(scope='module')
+def model_path(tmp_path_factory):
+    # Dışa aktarılan modeller ağırlıkların yanına yazılır; depodaki models/ kirlenmesin
+    path = tmp_path_factory.mktemp('court_model') / 'keypoints_model.pth'
+    shutil.copy(MODEL_PATH, path)
+    return str(path)
+
+
+@pytest.fixture(scope='module')
+def eager_keypoints(model_path):
+    return CourtLineDetector(model_path).predict_batch(_court_frames())
+
+
+@pytest.mark.parametrize('backend', sorted(TOLERANCES))
+def test_backend_matches_eager(backend, model_path, eager_keypoints):
+    frames = _court_frames()
+    try:
+        detector = CourtLineDetector(model_path, backend=backend, calibration_frames=frames)
+    except ImportError as error:
+        pytest.skip(f"{backend} için bağımlılık yok ({error})")
+
+    keypoints = detector.predict_batch(frames)
+    assert keypoints.shape == eager_keypoints.shape
+    assert np.abs(keypoints - eager_keypoints).max() <= TOLERANCES[backend]
+    # Tek kare ve gruplu tahmin aynı sonucu verir
+    np.testing.assert_allclose(detector.predict(frames[0]), keypoints[0], atol=1e-3)
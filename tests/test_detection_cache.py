@@ -0,0 +1,20 @@
+from utils.detection_cache import DetectionCache
+
+
+def _make_key(tmp_path, params):
+    video_path = tmp_path / 'video.mp4'
+    if not video_path.exists():
+        video_path.write_bytes(b'video')
+    cache = DetectionCache(str(tmp_path / 'cache'))
+    return cache.make_key(str(video_path), 'yolov8x', params)
+
+
+def test_equal_numbers_share_a_key(tmp_path):
+    assert _make_key(tmp_path, {'conf': 1}) == _make_key(tmp_path, {'conf': 1.0})
+    assert (_make_key(tmp_path, {'gate': {'size': [64, 36], 'threshold': 3}}) ==
+            _make_key(tmp_path, {'gate': {'size': (64.0, 36.0), 'threshold': 3.0}}))
+
+
+def test_different_params_change_the_key(tmp_path):
+    assert _make_key(tmp_path, {'conf': 0.15}) != _make_key(tmp_path, {'conf': 0.2})
+    assert _make_key(tmp_path, {'persist': True}) != _make_key(tmp_path, {'persist': 1})
@@ -0,0 +1,59 @@
+import cv2
+import numpy as np
+import pytest
+
+from utils.action_detector import TennisCourtDetector
+from utils.frame_similarity import HistogramSimilarity
+from utils import match_processor
+
+CORNERS = np.float32([[20, 20], [300, 20], [300, 220], [20, 220]])
+
+
+@pytest.fixture
+def video_path(tmp_path):
+    # Aksiyon (yeşil kort) ve aksiyon dışı (farklı renk) bölümler dönüşümlü
+    rng = np.random.default_rng(0)
+    path = str(tmp_path / 'match.avi')
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), 30, (320, 240))
+    for i in range(200):
+        frame = np.empty((240, 320, 3), dtype=np.uint8)
+        frame[:] = (40, 140, 60) if (i // 23) % 3 else (200, 60, 30)
+        writer.write(cv2.add(frame, rng.integers(0, 30, frame.shape, dtype=np.uint8)))
+    writer.release()
+    return path
+
+
+def _open(video_path):
+    detector = TennisCourtDetector()
+    cap = cv2.VideoCapture(video_path)
+    _, first_frame = cap.read()
+    engine = HistogramSimilarity(detector.warp_for_analysis(first_frame, CORNERS))
+    return cap, detector, engine
+
+
+def _per_frame_actions(video_path):
+    """Her kareyi tek tek score() ile sınıflandıran referans."""
+    cap, detector, engine = _open(video_path)
+    actions = []
+    frame_idx = 0
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frame_idx += 1
+        if engine.score(detector.warp_for_analysis(frame, CORNERS)) > match_processor.ACTION_THRESHOLD:
+            actions.append(frame_idx)
+    return actions
+
+
+def test_batched_single_pass_matches_per_frame(video_path):
+    cap, detector, engine = _open(video_path)
+    actions = [frame_idx for frame_idx, _ in match_processor._iter_action_frames(cap, detector, CORNERS, engine)]
+    assert actions == _per_frame_actions(video_path)
+
+
+def test_batched_refine_matches_per_frame(video_path):
+    cap, detector, engine = _open(video_path)
+    segments = match_processor._find_action_segments(cap, video_path, detector, CORNERS, engine, stride=1)
+    frames = [idx for start, end, _ in segments for idx in range(start, end)]
+    assert frames == _per_frame_actions(video_path)
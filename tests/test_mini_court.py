@@ -0,0 +1,21 @@
+import numpy as np
+import pytest
+
+from utils.mini_court import MiniCourt
+
+CORNERS = np.float32([[100, 50], [380, 50], [460, 300], [20, 300]])
+
+
+@pytest.mark.parametrize('frame_size', [(320, 480), (720, 1280), (320, 200)])
+def test_heatmap_renders_on_any_frame_size(frame_size):
+    # Mini kort kutusu (550 px) kısa karelerde kareden taşar; ısı haritası kırpılan kutuya uymalı
+    frame = np.zeros(frame_size + (3,), dtype=np.uint8)
+    mini_court = MiniCourt(frame)
+    bounce_points = np.array([[240.0, 100.0], [240.0, 290.0]])
+    mini_court.set_heatmap(bounce_points, CORNERS, bounce_frames=[0, 1])
+
+    for frame_idx in range(3):
+        rendered = mini_court.draw_heatmap_frame(frame.copy(), frame_idx)
+        assert rendered.shape == frame.shape
+    # Kareye sığan ilk sekme ısı haritasında görünür
+    assert mini_court.heatmap.alpha.max() > 0
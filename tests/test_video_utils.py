@@ -0,0 +1,54 @@
+import threading
+
+import cv2
+import numpy as np
+import pytest
+
+from utils.video_utils import VideoFrameSource
+
+
+@pytest.fixture
+def video_path(tmp_path):
+    path = str(tmp_path / 'video.avi')
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), 30, (64, 48))
+    for i in range(20):
+        writer.write(np.full((48, 64, 3), i * 10, dtype=np.uint8))
+    writer.release()
+    return path
+
+
+def _consume(source, timeout=5.0):
+    """Kaynağı ayrı bir thread'de dolaşır; takılırsa test askıda kalmak yerine başarısız olur."""
+    result = {}
+
+    def run():
+        try:
+            result['frames'] = list(source)
+        except Exception as error:
+            result['error'] = error
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "tüketici kuyrukta takılı kaldı"
+    return result
+
+
+@pytest.mark.parametrize('prefetch', [0, 4])
+def test_reads_all_frames(video_path, prefetch):
+    assert len(_consume(VideoFrameSource(video_path, prefetch=prefetch))['frames']) == 20
+    segments = [(2, 5), (10, 12)]
+    source = VideoFrameSource(video_path, prefetch=prefetch, segments=segments)
+    assert len(_consume(source)['frames']) == 5
+
+
+def test_reader_error_is_raised_in_consumer(video_path):
+    source = VideoFrameSource(video_path, prefetch=4)
+
+    def broken_reader():
+        yield np.zeros((48, 64, 3), dtype=np.uint8)
+        raise IOError("bozuk kare")
+
+    source._read_frames = broken_reader
+    result = _consume(source)
+    assert isinstance(result.get('error'), IOError)
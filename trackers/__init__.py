@@ -1,2 +1,4 @@
 from .player_tracker import PlayerTracker
-from .ball_tracker import BallTracker
\ No newline at end of file
+from .ball_tracker import BallTracker
+from .bounce_detector import OnlineBounceDetector, find_bounce_frames, find_rally_bounce_frames
+from .ball_state_estimator import BallStateEstimator, BallState
@@ -0,0 +1,129 @@
+from collections import namedtuple
+import numpy as np
+
+# Tahminle köprülenecek en uzun tespit boşluğu (kare); daha uzunsa top kayıp sayılır
+MAX_GAP = 15
+
+# box: (x1, y1, x2, y2) veya None, velocity: (vx, vy) piksel/kare veya None,
+# status: 'detected', 'predicted' ya da 'lost'
+BallState = namedtuple('BallState', ['box', 'velocity', 'status'])
+
+
+class BallStateEstimator:
+    """
+    Topun merkezini sabit ivmeli Kalman filtresi ile kare kare izleyen tahminci.
+
+    Durum her eksen için (konum, hız, ivme)'dir. x ve y eksenleri aynı hareket
+    modelini ve ölçüm gürültüsünü paylaştığı için kovaryans (3x3) ve Kalman
+    kazancı ortaktır; böylece her kare birkaç küçük matris işlemiyle (O(1))
+    güncellenir. Tespit olmayan karelerde konum tahmin edilir; boşluk
+    `max_gap` kareyi geçerse köprülenmez, top 'lost' olarak işaretlenir ve
+    sonraki tespitte filtre yeniden başlatılır.
+
+    Args:
+        max_gap (int): Tahminle doldurulacak en fazla ardışık kayıp kare.
+        process_noise (float): İvme değişimi (jerk) gürültüsü; büyüdükçe vuruşlara hızlı uyar.
+        measurement_noise (float): Tespit merkezinin piksel cinsinden standart sapması.
+    """
+
+    # Sabit ivme modeli (dt = 1 kare)
+    F = np.array([[1.0, 1.0, 0.5],
+                  [0.0, 1.0, 1.0],
+                  [0.0, 0.0, 1.0]])
+    # Beyaz jerk gürültüsünün ayrık karşılığı (dt = 1)
+    Q_UNIT = np.array([[1 / 20, 1 / 8, 1 / 6],
+                       [1 / 8, 1 / 3, 1 / 2],
+                       [1 / 6, 1 / 2, 1.0]])
+
+    def __init__(self, max_gap=MAX_GAP, process_noise=50.0, measurement_noise=2.0):
+        self.max_gap = max_gap
+        self.Q = self.Q_UNIT * process_noise
+        self.R = measurement_noise ** 2
+        self.reset()
+
+    def reset(self):
+        """Filtreyi başlangıç durumuna döndürür (ör. yeni bir ralli başlarken)."""
+        self.state = None # (3, 2): satırlar konum/hız/ivme, sütunlar x/y
+        self.P = None
+        self.size = None # Son tespit edilen kutunun (genişlik, yükseklik) değeri
+        self.missed = 0
+        self.last_frame_idx = None
+
+    @property
+    def velocity(self):
+        """Topun piksel/kare cinsinden (vx, vy) hızı; top izlenmiyorsa None."""
+        return None if self.state is None else (float(self.state[1, 0]), float(self.state[1, 1]))
+
+    def predict_center(self, steps=1):
+        """Filtreyi değiştirmeden `steps` kare sonraki tahmini (cx, cy) merkezi; top izlenmiyorsa None."""
+        if self.state is None:
+            return None
+        position, velocity, acceleration = self.state
+        center = position + velocity * steps + 0.5 * acceleration * steps ** 2
+        return float(center[0]), float(center[1])
+
+    def _predict(self):
+        self.state = self.F @ self.state
+        self.P = self.F @ self.P @ self.F.T + self.Q
+
+    def _correct(self, center):
+        # H = [1, 0, 0]: sadece konum ölçülür, kazanç iki eksen için aynıdır
+        gain = self.P[:, 0] / (self.P[0, 0] + self.R)
+        self.state += np.outer(gain, center - self.state[0])
+        self.P -= np.outer(gain, self.P[0])
+
+    def _current_state(self, status):
+        if self.state is None:
+            return BallState(None, None, 'lost')
+        (cx, cy), (w, h) = self.state[0], self.size
+        return BallState((cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2), self.velocity, status)
+
+    def update(self, box=None, frame_idx=None):
+        """
+        Sıradaki karenin tespitini (x1, y1, x2, y2) ya da tespit yoksa None işler.
+
+        frame_idx verilirse kareler arasındaki atlamalar (ör. aksiyon segmentleri
+        arasındaki boşluk) kayıp kare olarak sayılır.
+
+        Returns:
+            BallState: Bu karedeki tahmini kutu, hız ve durum.
+        """
+        steps = 1
+        if frame_idx is not None:
+            if self.last_frame_idx is not None:
+                steps = frame_idx - self.last_frame_idx
+            self.last_frame_idx = frame_idx
+
+        if self.state is not None and self.missed + steps - 1 > self.max_gap:
+            # Aradaki boşluk köprülenemeyecek kadar uzun: eski yörüngeyi bırak
+            self.reset()
+            self.last_frame_idx = frame_idx
+
+        if box is None:
+            if self.state is None:
+                return BallState(None, None, 'lost')
+            for _ in range(steps):
+                self._predict()
+            self.missed += steps
+            if self.missed > self.max_gap:
+                self.reset()
+                self.last_frame_idx = frame_idx
+                return BallState(None, None, 'lost')
+            return self._current_state('predicted')
+
+        x1, y1, x2, y2 = box
+        center = np.array([(x1 + x2) / 2, (y1 + y2) / 2], dtype=np.float64)
+        self.size = (x2 - x1, y2 - y1)
+
+        if self.state is None:
+            self.state = np.zeros((3, 2))
+            self.state[0] = center
+            # Hız ve ivme bilinmiyor: geniş belirsizlikle başla
+            self.P = np.diag([self.R, 100.0, 10.0])
+        else:
+            for _ in range(steps):
+                self._predict()
+            self._correct(center)
+
+        self.missed = 0
+        return self._current_state('detected')
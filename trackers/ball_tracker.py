@@ -1,111 +1,249 @@
-from ultralytics import YOLO
 import cv2
-import pickle
-import pandas as pd
+import numpy as np
+from utils import iter_batches
+from utils.detection_store import DetectionStore, DetectionStoreBuilder
+from .yolo_backend import load_yolo, DEFAULT_IMGSZ, FIXED_SHAPE_BACKENDS
+from .bounce_detector import find_rally_bounce_frames
+from .ball_state_estimator import BallStateEstimator, MAX_GAP
 
 class BallTracker:
-    def __init__(self, model_path):
-        self.model = YOLO(model_path)
-
-
-    def detect_frames(self, frames, read_from_stub=False, stub_path=None):
-        ball_detections = []
-
-        if read_from_stub and stub_path is not None:
-            with open(stub_path, 'rb') as f:
-                ball_detections = pickle.load(f)
-            return ball_detections
-
-        for frame in frames:
-            players_dict = self.detect_frame(frame)
-            ball_detections.append(players_dict)
-        
-        if stub_path is not None:
-            with open(stub_path, 'wb') as f:
-                pickle.dump(ball_detections, f)
+    def __init__(self, model_path, batch_size=1, conf=0.15,
+                 search_window=None, search_imgsz=320, max_misses=3, frame_gate=None,
+                 backend='pt', imgsz=DEFAULT_IMGSZ, int8=False):
+        self.model_path = model_path
+        # backend: 'pt', 'onnx', 'openvino' ya da 'torchscript' (başarısız olursa .pt'ye dönülür)
+        self.model, self.backend = load_yolo(model_path, backend, imgsz, int8)
+        self.imgsz = imgsz
+        self.conf = conf
+        # batch_size > 1 ise kareler gruplar halinde tek bir predict çağrısıyla işlenir
+        self.batch_size = batch_size
+
+        # Arama penceresi modu: search_window verilirse model tüm kare yerine topun
+        # tahmini konumu etrafındaki search_window x search_window kırpıntıda, daha
+        # küçük giriş boyutuyla (search_imgsz) çalışır. Top max_misses kare üst üste
+        # bulunamazsa tekrar tüm kareye bakılır.
+        self.search_window = search_window
+        self.search_imgsz = search_imgsz
+        self.search_model = self.model
+        if search_window is not None and search_imgsz != imgsz and self.backend in FIXED_SHAPE_BACKENDS:
+            # Sabit giriş boyutlu modeller search_imgsz'i kabul etmez: bu boyut için ayrı model
+            self.search_model, search_backend = load_yolo(model_path, self.backend, search_imgsz, int8)
+            if search_backend == 'pt':
+                # Arama modeli .pt'ye döndüyse tüm kare de aynı modelle çalışsın
+                self.model, self.backend = self.search_model, search_backend
+        self.max_misses = max_misses
+        self._estimator = BallStateEstimator()
+        self._misses = 0
+
+        # frame_gate (DuplicateFrameGate) verilirse öncekinin neredeyse aynısı olan
+        # karelerde model çalıştırılmaz, son tespitler yeniden kullanılır
+        self.frame_gate = frame_gate
+        self._last_result = None
+
+
+    def detect_frames(self, frames, cache=None, video_path=None, segments=None):
+        """
+        Karelerdeki tespitleri DetectionStore olarak döndürür (top için track_id her zaman 1).
+
+        cache (DetectionCache) ve video_path verilirse sonuçlar video, model ve
+        çıkarım parametrelerine göre önbellekten okunur/önbelleğe yazılır. Kareler
+        videonun sadece bazı aralıklarından okunuyorsa bu aralıklar segments ile verilir.
+        """
+        cache_key = None
+        if cache is not None and video_path is not None:
+            cache_key = cache.make_key(video_path, self.model_path, self.inference_params(), segments)
+            cached = cache.load(cache_key)
+            if cached is not None:
+                print(f"{self.__class__.__name__}: tespitler önbellekten yüklendi")
+                return cached
+
+        builder = DetectionStoreBuilder()
+        # Yeni bir kare dizisi: arama penceresi önceki çağrının top konumuna bağlı kalmasın
+        self._estimator.reset()
+        self._misses = 0
+        self._last_result = None
+        if self.frame_gate is not None:
+            self.frame_gate.reset()
+
+        # frames bir liste ya da VideoFrameSource gibi bir akış olabilir
+        if self.batch_size > 1 and self.search_window is None:
+            for batch in iter_batches(frames, self.batch_size):
+                for frame_detections in self.detect_batch(batch):
+                    builder.append_frame(*frame_detections)
+        else:
+            for frame in frames:
+                builder.append_frame(*self.detect_frame(frame))
+
+        ball_detections = builder.build()
+        if self.frame_gate is not None:
+            print(f"{self.__class__.__name__}: {self.frame_gate.summary()}")
+
+        if cache_key is not None:
+            cache.save(cache_key, ball_detections)
 
         return ball_detections
 
 
 
+    def inference_params(self):
+        # Önbellek anahtarına giren ve tespit sonucunu etkileyen parametreler
+        params = {'method': 'predict', 'conf': self.conf}
+        if self.backend != 'pt':
+            params['backend'] = self.backend
+        if self.imgsz != DEFAULT_IMGSZ:
+            params['imgsz'] = self.imgsz
+        if self.search_window is not None:
+            params.update(search_window=self.search_window, search_imgsz=self.search_imgsz,
+                          max_misses=self.max_misses)
+        if self.frame_gate is not None:
+            params['duplicate_gate'] = self.frame_gate.params()
+        return params
+
     def detect_frame(self, frame):
-        results = self.model.predict(frame,conf=0.15)[0] # sadece tespit değil takip de yapıyoruz ve id lerin özel olmasını sağlıyoruz
-        
-        ball_dict = {}
-        for box in results.boxes:
-            result = box.xyxy.tolist()[0]
-            ball_dict[1] = result
-        
-        return ball_dict
+        if self.frame_gate is not None and self.frame_gate.is_duplicate(frame):
+            if self.search_window is not None:
+                # Model çalışmasa da zaman ilerliyor: arama penceresi geride kalmasın diye
+                # tahminciyi bir kare ilerlet (kaçırma sayılmaz, kareye bakılmadı)
+                self._estimator.update(None)
+            return self._last_result
+        self._last_result = self._detect_frame(frame)
+        return self._last_result
+
+    def _detect_frame(self, frame):
+        if self.search_window is not None:
+            return self._detect_in_search_window(frame)
+        results = self.model.predict(frame,conf=self.conf, imgsz=self.imgsz)[0] # sadece tespit değil takip de yapıyoruz ve id lerin özel olmasını sağlıyoruz
+        return self._results_to_arrays(results)
+
+    def detect_batch(self, frames):
+        """Bir kare grubunu tek bir predict çağrısıyla işler ve her kare için ayrı (track_ids, boxes, scores) döndürür."""
+        if self.search_window is not None:
+            # Her karenin arama penceresi bir önceki karenin sonucuna bağlı, sırayla işlenir
+            return [self.detect_frame(frame) for frame in frames]
+        if self.frame_gate is not None:
+            detections = self.frame_gate.run_batch(frames, lambda fresh: self.model.predict(fresh, conf=self.conf, imgsz=self.imgsz),
+                                                   self._results_to_arrays, self._last_result)
+            if detections:
+                self._last_result = detections[-1]
+            return detections
+        results = self.model.predict(list(frames), conf=self.conf, imgsz=self.imgsz)
+        return [self._results_to_arrays(result) for result in results]
+
+    def _search_window_origin(self, frame):
+        """Tahmini top konumu etrafındaki pencerenin sol üst köşesi; tüm kareye bakılacaksa None."""
+        center = self._estimator.predict_center()
+        if center is None or self._misses >= self.max_misses:
+            return None
+
+        height, width = frame.shape[:2]
+        size = self.search_window
+        if size >= width or size >= height:
+            return None
+        # Pencere kare dışına taşmasın
+        x0 = int(min(max(center[0] - size / 2, 0), width - size))
+        y0 = int(min(max(center[1] - size / 2, 0), height - size))
+        return x0, y0
+
+    def _detect_in_search_window(self, frame):
+        origin = self._search_window_origin(frame)
+        if origin is None:
+            detections = self._results_to_arrays(self.model.predict(frame, conf=self.conf, imgsz=self.imgsz)[0])
+        else:
+            x0, y0 = origin
+            crop = frame[y0:y0 + self.search_window, x0:x0 + self.search_window]
+            results = self.search_model.predict(crop, conf=self.conf, imgsz=self.search_imgsz)[0]
+            track_ids, boxes, scores = self._results_to_arrays(results)
+            # Kırpıntı koordinatlarını kare koordinatlarına taşı
+            detections = track_ids, boxes + np.array([x0, y0, x0, y0], dtype=np.float32), scores
+
+        track_ids, boxes, _ = detections
+        if len(track_ids) > 0:
+            self._misses = 0
+            self._estimator.update(boxes[-1])
+        else:
+            self._misses += 1
+            self._estimator.update(None)
+        return detections
+
+    def _results_to_arrays(self, results):
+        boxes = results.boxes
+        if len(boxes) == 0:
+            return np.empty(0, dtype=np.int32), np.empty((0, 4), dtype=np.float32), np.empty(0, dtype=np.float32)
+
+        # Karede tek top olduğunu varsayıyoruz; önceki davranışla aynı şekilde son kutu alınır
+        return (np.ones(1, dtype=np.int32),
+                boxes.xyxy.cpu().numpy().astype(np.float32)[-1:],
+                boxes.conf.cpu().numpy().astype(np.float32)[-1:])
     
     
-    def interpolate_ball_positions(self, ball_positions):
-        import pandas as pd
-        ball_positions = [x.get(1,[]) for x in ball_positions]
-        df_ball_positions = pd.DataFrame(ball_positions, columns=['x1','y1','x2','y2'])
-
-        # Interpolate missing values
-        df_ball_positions = df_ball_positions.interpolate()
-        df_ball_positions = df_ball_positions.bfill() # Fill first frames if missing
-
-        ball_positions = [{1:x} for x in df_ball_positions.to_numpy().tolist()]
-
-        return ball_positions
+    def estimate_ball_positions(self, ball_positions, frame_indices=None, max_gap=MAX_GAP):
+        """
+        Top kutularını BallStateEstimator (Kalman) ile kare kare yeniden üretir.
+
+        Kısa boşluklar tahminle doldurulur, `max_gap` kareden uzun boşluklar
+        (ör. ralliler arası) köprülenmez ve ilk tespitten öncesi geriye doğru
+        doldurulmaz.
+        frame_indices, store'daki karelerin orijinal videodaki numaralarıdır;
+        verilirse segmentler arasındaki atlamalar da boşluk sayılır.
+        Tahmin edilen karelerin güven skoru 0'dır.
+        """
+        estimator = BallStateEstimator(max_gap=max_gap)
+        boxes = np.full((len(ball_positions), 4), np.nan, dtype=np.float32)
+        scores = np.zeros(len(ball_positions), dtype=np.float32)
+
+        for i in range(len(ball_positions)):
+            track_ids, frame_boxes, frame_scores = ball_positions.frame(i)
+            has_ball = len(track_ids) > 0
+            state = estimator.update(frame_boxes[-1] if has_ball else None,
+                                     frame_indices[i] if frame_indices is not None else None)
+            if state.box is not None:
+                boxes[i] = state.box
+                scores[i] = frame_scores[-1] if has_ball else 0.0
+
+        return DetectionStore.from_track_boxes(boxes, track_id=1, scores=scores)
 
     def get_ball_shot_frames(self, ball_positions):
-        ball_positions = [x.get(1,[]) for x in ball_positions]
-        df_ball_positions = pd.DataFrame(ball_positions, columns=['x1','y1','x2','y2'])
-
-        df_ball_positions['ball_hit'] = 0
-        df_ball_positions['mid_y'] = (df_ball_positions['y1'] + df_ball_positions['y2'])/2
-        df_ball_positions['mid_y_rolling_mean'] = df_ball_positions['mid_y'].rolling(window=5, min_periods=1, center=False).mean()
-        df_ball_positions['delta_y'] = df_ball_positions['mid_y_rolling_mean'].diff() # Change in Y
-        
-        # Bounce logic: The ball hits the ground when Y is maximized (locally)
-        # However, physics: Y increases (goes down), hits ground, Y decreases (goes up).
-        # So we look for local MAXIMA in Y coordinate.
-        # Simple loop to find local max
-        
-        minimum_change_frames_for_hit = 25
-        for i in range(1, len(df_ball_positions)- int(minimum_change_frames_for_hit*1.2) ):
-            current_y = df_ball_positions.iloc[i]['mid_y']
-            prev_y = df_ball_positions.iloc[i-1]['mid_y']
-            next_y = df_ball_positions.iloc[i+1]['mid_y']
-
-            # Check if it's a peak (local max) -> This means lowest point on screen -> Bounce
-            if current_y > prev_y and current_y > next_y:
-                # Filter noise: verify it keeps going up (decreasing Y) after and came down (increasing Y) before
-                # Looking at rolling mean might be better?
-                pass
-                
-        # Let's try a simpler approach: finding peaks in the signal
-        # Since we want "bounces", let's assume they are the peaks of Y value.
-        
-        # Scipy signal finding
-        from scipy.signal import find_peaks
-        # mid_y is distance from top. So bigger y = lower on screen. Bounce is a PEAK in Y.
-        
-        # We need to handle potential NaNs if interpolation failed (shouldn't happen with bfill)
-        y_values = df_ball_positions['mid_y_rolling_mean'].fillna(0).to_numpy()
-        
-        # Find peaks (bounces)
-        # distance: minimum frames between bounces
-        peaks, _ = find_peaks(y_values, distance=30) 
-        
-        # Verify peaks: check if Y changes significantly around the peak
-        # Or just trust find_peaks for now.
-        
-        return peaks.tolist()
-
-    def draw_bboxes(self, video_frames, player_detections):
-        output_video_frames = []
-        for frame,ball_dict in zip(video_frames, player_detections):
-            # frame üzerine kutuları çiz
-            for track_id, bbox in ball_dict.items():
-                x1, y1, x2, y2 =  bbox
-                cv2.putText(frame, f"Top ID: {track_id}", (int(bbox[0]) , int(bbox[1] -10)), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0,255,255), 2)
-                frame = cv2.rectangle(frame, (int(x1), int(y1)), (int(x2), int(y2)), (0,255,255), 2)
-            output_video_frames.append(frame)
-        
-        return output_video_frames
+        """
+        Sekme karelerini döndürür. Top aşağı inip yere değdikten sonra tekrar
+        yükseldiği için sekmeler, görüntüde y koordinatının (mid_y) tepeleridir.
+
+        Top konumunun her kesintisiz bölümü ayrı işlenir; estimate_ball_positions
+        çıktısında skoru 0 olan (tahmin edilen) kareler bir boşluktan önce
+        geliyorsa atılır, böylece boşluk kenarında sahte sekme oluşmaz.
+        """
+        boxes = ball_positions.track_boxes(1)
+        mid_y = (boxes[:, 1] + boxes[:, 3]) / 2
+        measured = ball_positions.track_scores(1) > 0
+        return find_rally_bounce_frames(mid_y, measured).tolist()
+
+    def get_bounce_events(self, ball_positions, bounce_frame_indices):
+        """
+        Top kutusu olan sekme karelerini ve bu karelerdeki temas noktalarını döndürür.
+
+        Returns:
+            tuple: (kare indeksleri (N,), temas noktaları (N, 2))
+        """
+        bounce_frame_indices = np.asarray(bounce_frame_indices, dtype=int)
+        boxes = ball_positions.track_boxes(1)[bounce_frame_indices]
+        has_ball = ~np.isnan(boxes[:, 0])
+        boxes = boxes[has_ball]
+        # Genellikle topun alt noktası yere temas eder
+        return bounce_frame_indices[has_ball], np.column_stack(((boxes[:, 0] + boxes[:, 2]) / 2, boxes[:, 3]))
+
+    def draw_bboxes(self, video_frames, ball_detections):
+        # Kareler akış halinde gelir; her kare çizildikten sonra hemen yield edilir
+        for frame_idx, frame in enumerate(video_frames):
+            if frame_idx >= len(ball_detections):
+                break
+            track_ids, boxes, _ = ball_detections.frame(frame_idx)
+            yield self.draw_frame(frame, track_ids, boxes)
+
+    def draw_frame(self, frame, track_ids, boxes):
+        """Bir karenin kutularını kare üzerine yerinde çizer."""
+        # frame üzerine kutuları çiz
+        for track_id, bbox in zip(track_ids, boxes):
+            x1, y1, x2, y2 =  bbox
+            cv2.putText(frame, f"Top ID: {track_id}", (int(bbox[0]) , int(bbox[1] -10)), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0,255,255), 2)
+            cv2.rectangle(frame, (int(x1), int(y1)), (int(x2), int(y2)), (0,255,255), 2)
+        return frame
                 
\ No newline at end of file
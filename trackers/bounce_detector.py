@@ -0,0 +1,219 @@
+from collections import deque
+import numpy as np
+
+# Top yüksekliği (mid_y) bu kadar karelik hareketli ortalama ile yumuşatılır
+ROLLING_WINDOW = 5
+# İki sekme arasındaki en az kare sayısı
+MIN_BOUNCE_DISTANCE = 30
+
+
+def _window_means(windows):
+    """(N, window) dizisindeki her satırın NaN olmayan değerlerinin ortalaması (hepsi NaN ise NaN)."""
+    valid = ~np.isnan(windows)
+    counts = valid.sum(axis=1)
+    sums = np.where(valid, windows, 0.0).sum(axis=1)
+    return np.divide(sums, counts, out=np.full(len(windows), np.nan), where=counts > 0)
+
+
+def rolling_mean(values, window=ROLLING_WINDOW):
+    """pandas `rolling(window, min_periods=1).mean()` ile aynı sonucu veren vektörel hareketli ortalama."""
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) == 0:
+        return values
+    padded = np.concatenate((np.full(window - 1, np.nan), values))
+    return _window_means(np.lib.stride_tricks.sliding_window_view(padded, window))
+
+
+def _local_maxima(values):
+    """
+    scipy.signal.find_peaks ile aynı yerel maksimumları bulur.
+
+    Eşit değerli ardışık kareler (düzlük) tek bir tepe sayılır ve düzlüğün
+    ortasındaki (aşağı yuvarlanmış) indeks döndürülür. İlk ve son kare tepe olamaz.
+    """
+    if len(values) < 3:
+        return np.empty(0, dtype=np.intp)
+
+    run_starts = np.concatenate(([0], np.flatnonzero(np.diff(values) != 0) + 1))
+    run_ends = np.concatenate((run_starts[1:], [len(values)])) - 1
+    run_values = values[run_starts]
+
+    is_peak = (run_values[1:-1] > run_values[:-2]) & (run_values[1:-1] > run_values[2:])
+    return (run_starts[1:-1][is_peak] + run_ends[1:-1][is_peak]) // 2
+
+
+def _select_by_distance(peaks, priority, distance):
+    """
+    find_peaks(distance=...) seçimi: tepeler yüksekten alçağa dolaşılır ve tutulan
+    her tepenin `distance` karelik komşuluğundaki diğer tepeler elenir.
+    """
+    keep = np.ones(len(peaks), dtype=bool)
+    for j in np.argsort(priority)[::-1]:
+        if not keep[j]:
+            continue
+
+        k = j - 1
+        while k >= 0 and peaks[j] - peaks[k] < distance:
+            keep[k] = False
+            k -= 1
+
+        k = j + 1
+        while k < len(peaks) and peaks[k] - peaks[j] < distance:
+            keep[k] = False
+            k += 1
+    return keep
+
+
+def find_bounce_frames(mid_y, distance=MIN_BOUNCE_DISTANCE, window=ROLLING_WINDOW):
+    """
+    Topun dikey konumundaki (mid_y, NaN = tespit yok) tepelerden sekme karelerini bulur.
+
+    Eski pandas + `find_peaks(distance=30)` akışının NumPy karşılığıdır: mid_y
+    hareketli ortalama ile yumuşatılır, NaN kalan kareler 0 sayılır ve
+    birbirine `distance` kareden yakın tepelerden sadece en yükseği tutulur.
+
+    Returns:
+        np.ndarray: Sekme karelerinin indeksleri (artan sırada).
+    """
+    y_values = np.nan_to_num(rolling_mean(mid_y, window), nan=0.0)
+    peaks = _local_maxima(y_values)
+    return peaks[_select_by_distance(peaks, y_values[peaks], distance)]
+
+
+def find_rally_bounce_frames(mid_y, measured=None, distance=MIN_BOUNCE_DISTANCE, window=ROLLING_WINDOW):
+    """
+    Sekmeleri top konumunun kesintisiz her bölümünde (NaN olmayan ardışık kareler) ayrı ayrı bulur.
+
+    find_bounce_frames tüm diziyi tek sinyal sayar ve NaN kareleri 0 yapar; bu
+    yüzden bir boşluktan hemen önceki kare sahte bir tepe olur. Burada her
+    bölüm ayrı işlendiği için bölüm sonu tepe olamaz. measured verilirse
+    (kare başına bool, ör. tahminci çıktısında skor > 0) her bölüm son ölçülen
+    karede kesilir: boşluk öncesi sadece tahminle uzatılan kareler atılır,
+    iki tespit arasını köprüleyen tahminler korunur.
+
+    Returns:
+        np.ndarray: Sekme karelerinin indeksleri (artan sırada).
+    """
+    mid_y = np.asarray(mid_y, dtype=np.float64)
+    valid = ~np.isnan(mid_y)
+    # Bölüm sınırları: valid'in 0->1 ve 1->0 geçişleri
+    edges = np.flatnonzero(np.diff(np.concatenate(([False], valid, [False])).astype(np.int8)))
+    bounces = []
+    for start, end in zip(edges[::2], edges[1::2]):
+        if measured is not None:
+            measured_frames = np.flatnonzero(measured[start:end])
+            if len(measured_frames) == 0:
+                continue
+            end = start + measured_frames[-1] + 1
+        bounces.append(find_bounce_frames(mid_y[start:end], distance, window) + start)
+    return np.concatenate(bounces) if bounces else np.empty(0, dtype=np.intp)
+
+
+class OnlineBounceDetector:
+    """
+    Top konumları kare kare geldikçe sekmeleri bulan akış (online) dedektörü.
+
+    Kayıtlı veride find_bounce_frames ile aynı kareleri üretir (sadece aynı
+    yükseklikte ve birbirine `distance` kareden yakın iki tepe arasındaki seçim
+    farklı olabilir; find_peaks bu durumda sıralama algoritmasına bağlıdır).
+
+    Bekleyen tepelerin en yükseği, `distance` kare boyunca ondan daha yakın yeni
+    bir tepe çıkmadığında kesin olarak tutulur; ondan önceki tepelerin kararı da
+    artık değişemez ve hepsi birlikte yayınlanır. Gecikme tipik olarak `distance`
+    + yumuşatma penceresi kadardır; sadece sürekli yükselen ve aralarında
+    `distance` kareden az olan tepe zincirlerinde zincir bitene kadar uzar.
+    max_latency verilirse bu zincirler de en geç o kadar karede kesilir (bu
+    durumda sonuç find_peaks'ten farklı olabilir).
+
+    Args:
+        distance (int): İki sekme arasındaki en az kare sayısı.
+        window (int): mid_y hareketli ortalama pencere boyu.
+        max_latency (int, optional): Bir tepenin kararının bekleyebileceği en fazla kare sayısı.
+    """
+
+    def __init__(self, distance=MIN_BOUNCE_DISTANCE, window=ROLLING_WINDOW, max_latency=None):
+        self.distance = distance
+        self.max_latency = max_latency
+        self.frame_count = 0
+        self._recent = deque([np.nan] * window, maxlen=window)
+        # Son düzlük (eşit değerli ardışık kareler) ve ondan önceki düzlüğün değeri
+        self._run_start = 0
+        self._run_value = None
+        self._prev_run_value = None
+        # Henüz kesinleşmemiş tepeler: (kare, yükseklik)
+        self._pending = []
+        self._last_bounce = None
+
+    def update(self, box):
+        """
+        Sıradaki karenin top kutusunu (x1, y1, x2, y2) ya da tespit yoksa None ekler.
+
+        Returns:
+            list: Bu karede kesinleşen sekme kareleri (genellikle boş).
+        """
+        if box is None:
+            mid_y = np.nan
+        else:
+            # find_bounce_frames'e verilen float32 kutularla aynı sonucu almak için
+            mid_y = (np.float32(box[1]) + np.float32(box[3])) / np.float32(2)
+        self._recent.append(float(mid_y))
+
+        value = _window_means(np.array(self._recent)[None])[0]
+        if np.isnan(value):
+            value = 0.0
+
+        frame_idx = self.frame_count
+        self.frame_count += 1
+
+        bounces = []
+        if self._run_value is None:
+            self._run_value = value
+        elif value != self._run_value:
+            # Bir önceki düzlük [run_start, frame_idx - 1] bitti; iki yanı da alçaksa tepedir
+            if self._prev_run_value is not None and self._prev_run_value < self._run_value > value:
+                peak = (self._run_start + frame_idx - 1) // 2
+                bounces.extend(self._release(peak))
+                # Zorla kesinleşen bir sekmeye yakın tepeler zaten elenmiş sayılır
+                if self._last_bounce is None or peak - self._last_bounce >= self.distance:
+                    self._pending.append((peak, self._run_value))
+            self._prev_run_value = self._run_value
+            self._run_start = frame_idx
+            self._run_value = value
+
+        # Gelecekte bulunabilecek en erken tepe: açık düzlük tepe adayıysa onun ortası
+        if self._prev_run_value is not None and self._prev_run_value < self._run_value:
+            earliest_peak = (self._run_start + frame_idx) // 2
+        else:
+            earliest_peak = frame_idx + 1
+
+        bounces.extend(self._release(earliest_peak))
+        if self.max_latency is not None and self._pending and \
+                frame_idx - self._pending[0][0] >= self.max_latency:
+            bounces.extend(self._release(np.inf))
+        return bounces
+
+    def flush(self):
+        """Akış bittiğinde bekleyen tepeleri kesinleştirir (son düzlük tepe olamaz)."""
+        return self._release(np.inf)
+
+    def _release(self, earliest_peak):
+        """Bundan sonraki tepeler en erken `earliest_peak` karesinde olabilecekse kesinleşenleri döndürür."""
+        bounces = []
+        while self._pending:
+            peaks = np.array([peak for peak, _ in self._pending])
+            priority = np.array([value for _, value in self._pending])
+
+            # En yüksek tepe ilk işlenir; yeni tepeler ona ulaşamıyorsa kesin tutulur
+            top = int(np.argsort(priority)[-1])
+            if earliest_peak - peaks[top] < self.distance:
+                break
+
+            # Soldakiler sadece kendi aralarında ve en yüksek tepeyle elenir; sağdakilerden
+            # en yüksek tepeye `distance`'tan yakın olanlar zaten onun tarafından elenir
+            keep = _select_by_distance(peaks[:top + 1], priority[:top + 1], self.distance)
+            bounces.extend(peaks[:top + 1][keep].tolist())
+            self._pending = [(peak, value) for peak, value in self._pending[top + 1:]
+                             if peak - peaks[top] >= self.distance]
+        if bounces:
+            self._last_bounce = bounces[-1]
+        return bounces
@@ -1,58 +1,237 @@
-from ultralytics import YOLO
 import cv2
-import pickle
+import numpy as np
+from utils import iter_batches
+from utils.detection_store import DetectionStoreBuilder
+from .yolo_backend import load_yolo, DEFAULT_IMGSZ
 
 class PlayerTracker:
-    def __init__(self, model_path):
-        self.model = YOLO(model_path)
+    # Optik akış (Lucas-Kanade) ayarları
+    LK_PARAMS = dict(winSize=(21, 21), maxLevel=3,
+                     criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 20, 0.03))
 
+    def __init__(self, model_path, batch_size=1, keyframe_interval=1, min_flow_confidence=0.5, frame_gate=None,
+                 backend='pt', imgsz=DEFAULT_IMGSZ, int8=False):
+        self.model_path = model_path
+        # backend: 'pt', 'onnx', 'openvino' ya da 'torchscript' (başarısız olursa .pt'ye dönülür)
+        self.model, self.backend = load_yolo(model_path, backend, imgsz, int8)
+        self.imgsz = imgsz
+        # batch_size > 1 ise kareler gruplar halinde tek bir track çağrısıyla işlenir
+        self.batch_size = batch_size
 
-    def detect_frames(self, frames, read_from_stub=False, stub_path=None):
-        player_detections = []
+        # Anahtar kare modu: keyframe_interval > 1 ise YOLO sadece her N karede bir
+        # (veya optik akış güveni min_flow_confidence altına düştüğünde) çalışır; aradaki
+        # karelerde kutular optik akışla taşınır. ID'leri YOLO tracker'ı anahtar karelerde
+        # verir, taşınan kutular son anahtar karenin ID'lerini korur.
+        self.keyframe_interval = keyframe_interval
+        self.min_flow_confidence = min_flow_confidence
+        self.keyframes = 0
+        self._reset_propagation()
 
-        if read_from_stub and stub_path is not None:
-            with open(stub_path, 'rb') as f:
-                player_detections = pickle.load(f)
-            return player_detections
+        # frame_gate (DuplicateFrameGate) verilirse öncekinin neredeyse aynısı olan
+        # karelerde model çalıştırılmaz, son tespitler yeniden kullanılır
+        self.frame_gate = frame_gate
+        self._last_result = None
 
-        for frame in frames:
-            players_dict = self.detect_frame(frame)
-            player_detections.append(players_dict)
-        
-        if stub_path is not None:
-            with open(stub_path, 'wb') as f:
-                pickle.dump(player_detections, f)
+    def _reset_propagation(self):
+        self._prev_gray = None
+        self._last_detections = None
+        self._frames_since_keyframe = 0
+
+
+    def detect_frames(self, frames, cache=None, video_path=None, segments=None):
+        """
+        Karelerdeki tespitleri DetectionStore olarak döndürür.
+
+        cache (DetectionCache) ve video_path verilirse sonuçlar video, model ve
+        çıkarım parametrelerine göre önbellekten okunur/önbelleğe yazılır. Kareler
+        videonun sadece bazı aralıklarından okunuyorsa bu aralıklar segments ile verilir.
+        """
+        cache_key = None
+        if cache is not None and video_path is not None:
+            cache_key = cache.make_key(video_path, self.model_path, self.inference_params(), segments)
+            cached = cache.load(cache_key)
+            if cached is not None:
+                print(f"{self.__class__.__name__}: tespitler önbellekten yüklendi")
+                return cached
+
+        builder = DetectionStoreBuilder()
+        # Yeni bir kare dizisi: kutular önceki çağrının son karesinden taşınmasın
+        self._reset_propagation()
+        self._last_result = None
+        if self.frame_gate is not None:
+            self.frame_gate.reset()
+
+        # frames bir liste ya da VideoFrameSource gibi bir akış olabilir
+        if self.batch_size > 1 and self.keyframe_interval <= 1:
+            for batch in iter_batches(frames, self.batch_size):
+                for frame_detections in self.detect_batch(batch):
+                    builder.append_frame(*frame_detections)
+        else:
+            for frame in frames:
+                builder.append_frame(*self.detect_frame(frame))
+
+        player_detections = builder.build()
+        if self.frame_gate is not None:
+            print(f"{self.__class__.__name__}: {self.frame_gate.summary()}")
+
+        if cache_key is not None:
+            cache.save(cache_key, player_detections)
 
         return player_detections
 
 
 
+    def inference_params(self):
+        # Önbellek anahtarına giren ve tespit sonucunu etkileyen parametreler
+        params = {'method': 'track', 'persist': True, 'classes': ['person']}
+        if self.backend != 'pt':
+            params['backend'] = self.backend
+        if self.imgsz != DEFAULT_IMGSZ:
+            params['imgsz'] = self.imgsz
+        if self.keyframe_interval > 1:
+            params.update(keyframe_interval=self.keyframe_interval,
+                          min_flow_confidence=self.min_flow_confidence)
+        if self.frame_gate is not None:
+            params['duplicate_gate'] = self.frame_gate.params()
+        return params
+
     def detect_frame(self, frame):
-        results = self.model.track(frame, persist=True)[0] # sadece tespit değil takip de yapıyoruz ve id lerin özel olmasını sağlıyoruz
-        id_name_dict = results.names
-
-        player_dict = {}
-        for box in results.boxes:
-            if box.id is None:
-                continue
-            track_id = int(box.id.tolist()[0])
-            result = box.xyxy.tolist()[0]
-            object_cls_id = box.cls.tolist()[0]
-            object_clc_name = id_name_dict[object_cls_id]
-            if object_clc_name == 'person':
-                player_dict[track_id] = result
-        
-        return player_dict
-    
+        if self.frame_gate is not None and self.frame_gate.is_duplicate(frame):
+            return self._last_result
+        self._last_result = self._detect_frame(frame)
+        return self._last_result
+
+    def _detect_frame(self, frame):
+        if self.keyframe_interval > 1:
+            return self._detect_or_propagate(frame)
+        results = self.model.track(frame, persist=True, imgsz=self.imgsz)[0] # sadece tespit değil takip de yapıyoruz ve id lerin özel olmasını sağlıyoruz
+        return self._results_to_arrays(results)
+
+    def detect_batch(self, frames):
+        """
+        Bir kare grubunu tek bir track çağrısıyla işler ve her kare için ayrı
+        (track_ids, boxes, scores) dizileri döndürür.
+
+        Video akışı olmayan (liste) kaynaklarda ultralytics tek bir tracker'ı gruptaki
+        kareler üzerinde sırayla günceller; persist=True sayesinde tracker gruplar
+        arasında da korunur ve ID'ler tutarlı kalır.
+        """
+        if self.keyframe_interval > 1:
+            # Taşınan kutular bir önceki kareye bağlı olduğu için kareler sırayla işlenir
+            return [self.detect_frame(frame) for frame in frames]
+        if self.frame_gate is not None:
+            detections = self.frame_gate.run_batch(frames, lambda fresh: self.model.track(fresh, persist=True, imgsz=self.imgsz),
+                                                   self._results_to_arrays, self._last_result)
+            if detections:
+                self._last_result = detections[-1]
+            return detections
+        results = self.model.track(list(frames), persist=True, imgsz=self.imgsz)
+        return [self._results_to_arrays(result) for result in results]
+
+    def _detect_or_propagate(self, frame):
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+        if self._last_detections is not None and self._frames_since_keyframe < self.keyframe_interval - 1:
+            propagated = self._propagate(self._prev_gray, gray, *self._last_detections)
+            if propagated is not None:
+                self._prev_gray = gray
+                self._last_detections = propagated
+                self._frames_since_keyframe += 1
+                return propagated
+
+        # Anahtar kare: tam tespit ve takip (ID'ler YOLO tracker'ından gelir)
+        detections = self._results_to_arrays(self.model.track(frame, persist=True, imgsz=self.imgsz)[0])
+        self.keyframes += 1
+        self._prev_gray = gray
+        self._last_detections = detections
+        self._frames_since_keyframe = 0
+        return detections
+
+    def _propagate(self, prev_gray, gray, track_ids, boxes, scores):
+        """
+        Kutuları önceki kareden bu kareye seyrek optik akışla taşır.
+
+        Her kutunun içindeki köşe noktaları ileri ve geri izlenir; tutarlı noktaların
+        medyan kayması ve ölçek değişimi kutuya uygulanır. Herhangi bir kutuda
+        tutarlı nokta oranı min_flow_confidence altındaysa None döner (anahtar kare gerekir).
+        """
+        if len(track_ids) == 0:
+            return track_ids, boxes, scores
+
+        height, width = gray.shape
+        points, owners = [], []
+        for i, (x1, y1, x2, y2) in enumerate(boxes.astype(int)):
+            x1, y1 = max(x1, 0), max(y1, 0)
+            x2, y2 = min(x2, width), min(y2, height)
+            if x2 - x1 < 4 or y2 - y1 < 4:
+                return None
+            corners = cv2.goodFeaturesToTrack(prev_gray[y1:y2, x1:x2], maxCorners=30,
+                                              qualityLevel=0.01, minDistance=3)
+            if corners is None:
+                return None
+            points.append(corners.reshape(-1, 2) + (x1, y1))
+            owners.append(np.full(len(corners), i))
+
+        p0 = np.concatenate(points).astype(np.float32).reshape(-1, 1, 2)
+        owners = np.concatenate(owners)
+        p1, status, _ = cv2.calcOpticalFlowPyrLK(prev_gray, gray, p0, None, **self.LK_PARAMS)
+        p0_back, status_back, _ = cv2.calcOpticalFlowPyrLK(gray, prev_gray, p1, None, **self.LK_PARAMS)
+
+        # İleri-geri hatası 1 pikselden küçük noktalar tutarlı sayılır
+        forward_backward = np.linalg.norm((p0 - p0_back).reshape(-1, 2), axis=1)
+        good = (status.ravel() == 1) & (status_back.ravel() == 1) & (forward_backward < 1.0)
+        p0, p1 = p0.reshape(-1, 2), p1.reshape(-1, 2)
+
+        new_boxes = np.empty_like(boxes)
+        for i, box in enumerate(boxes):
+            own = owners == i
+            tracked = own & good
+            if tracked.sum() < 3 or tracked.sum() / own.sum() < self.min_flow_confidence:
+                return None
+
+            start, end = p0[tracked], p1[tracked]
+            shift = np.median(end - start, axis=0)
+
+            # Ölçek: noktaların kendi medyanlarına uzaklıklarının oranı
+            start_spread = np.linalg.norm(start - np.median(start, axis=0), axis=1)
+            end_spread = np.linalg.norm(end - np.median(end, axis=0), axis=1)
+            valid = start_spread > 1
+            scale = np.clip(np.median(end_spread[valid] / start_spread[valid]), 0.8, 1.25) if valid.any() else 1.0
+
+            center = (box[:2] + box[2:]) / 2 + shift
+            half_size = (box[2:] - box[:2]) / 2 * scale
+            new_boxes[i] = np.concatenate((center - half_size, center + half_size))
+
+        return track_ids, new_boxes, scores
+
+    def _results_to_arrays(self, results):
+        """YOLO sonucundan sadece takip ID'si olan 'person' kutularını diziler halinde alır."""
+        boxes = results.boxes
+        if boxes.id is None or len(boxes) == 0:
+            return np.empty(0, dtype=np.int32), np.empty((0, 4), dtype=np.float32), np.empty(0, dtype=np.float32)
+
+        person_cls_ids = [cls_id for cls_id, name in results.names.items() if name == 'person']
+        cls_ids = boxes.cls.cpu().numpy().astype(int)
+        mask = np.isin(cls_ids, person_cls_ids)
+
+        return (boxes.id.cpu().numpy().astype(np.int32)[mask],
+                boxes.xyxy.cpu().numpy().astype(np.float32)[mask],
+                boxes.conf.cpu().numpy().astype(np.float32)[mask])
+
     def draw_bboxes(self, video_frames, player_detections):
-        output_video_frames = []
-        for frame,player_dict in zip(video_frames, player_detections):
-            # frame üzerine kutuları çiz
-            for track_id, bbox in player_dict.items():
-                x1, y1, x2, y2 =  bbox
-                cv2.putText(frame, f"Oyuncu ID: {track_id}", (int(bbox[0]) , int(bbox[1] -10)), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0,255,0), 2)
-                frame = cv2.rectangle(frame, (int(x1), int(y1)), (int(x2), int(y2)), (0,0,255), 2)
-            output_video_frames.append(frame)
-        
-        return output_video_frames
+        # Kareler akış halinde gelir; her kare çizildikten sonra hemen yield edilir
+        for frame_idx, frame in enumerate(video_frames):
+            if frame_idx >= len(player_detections):
+                break
+            track_ids, boxes, _ = player_detections.frame(frame_idx)
+            yield self.draw_frame(frame, track_ids, boxes)
+
+    def draw_frame(self, frame, track_ids, boxes):
+        """Bir karenin kutularını kare üzerine yerinde çizer."""
+        # frame üzerine kutuları çiz
+        for track_id, bbox in zip(track_ids, boxes):
+            x1, y1, x2, y2 =  bbox
+            cv2.putText(frame, f"Oyuncu ID: {track_id}", (int(bbox[0]) , int(bbox[1] -10)), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0,255,0), 2)
+            cv2.rectangle(frame, (int(x1), int(y1)), (int(x2), int(y2)), (0,0,255), 2)
+        return frame
                 
\ No newline at end of file
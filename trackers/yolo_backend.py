@@ -0,0 +1,126 @@
+import os
+import shutil
+import numpy as np
+
+# pt: ultralytics ağırlıkları (eager PyTorch); diğerleri CPU için dışa aktarılmış modeller
+BACKENDS = ('pt', 'onnx', 'openvino', 'torchscript')
+# int8 quantize edilmiş sürümü üretilebilen backend'ler
+INT8_BACKENDS = ('onnx', 'openvino')
+# Sabit giriş boyutuyla dışa aktarılan backend'ler: her giriş boyutu için ayrı model gerekir
+FIXED_SHAPE_BACKENDS = ('torchscript',)
+# ultralytics'in varsayılan giriş boyutu
+DEFAULT_IMGSZ = 640
+
+
+def _weights_file(model_path):
+    """'yolov8x' gibi isimleri diskteki ağırlık dosyasına çözer (bulunamazsa None)."""
+    for candidate in (model_path, f"{model_path}.pt"):
+        if os.path.isfile(candidate):
+            return candidate
+    return None
+
+
+def export_path(model_path, backend, imgsz=DEFAULT_IMGSZ, int8=False):
+    """Dışa aktarılan modelin yolu; giriş boyutu ve int8 ayarı isme eklenir."""
+    stem = os.path.splitext(model_path)[0] + f"_{imgsz}" + ('_int8' if int8 else '')
+    # ultralytics backend'i uzantıdan tanır
+    suffixes = {'onnx': '.onnx', 'openvino': '_openvino_model', 'torchscript': '.torchscript'}
+    return stem + suffixes[backend]
+
+
+def _is_stale(path, model_path):
+    # Dışa aktarılan model yoksa ya da ağırlıklar ondan sonra değiştiyse yeniden üretilir
+    if not os.path.exists(path):
+        return True
+    weights = _weights_file(model_path)
+    return weights is not None and os.path.getmtime(path) < os.path.getmtime(weights)
+
+
+def _replace(source, target):
+    if os.path.isdir(target):
+        shutil.rmtree(target)
+    elif os.path.exists(target):
+        os.remove(target)
+    shutil.move(source, target)
+
+
+def _quantize_onnx(source, target):
+    """ONNX modelinin ağırlıklarını int8'e çevirir; sınıf isimleri gibi metadata korunur."""
+    import onnx
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantize_dynamic(source, target, weight_type=QuantType.QUInt8)
+    # ultralytics sınıf isimlerini ve giriş boyutunu ONNX metadata'sından okur
+    original, quantized = onnx.load(source), onnx.load(target)
+    del quantized.metadata_props[:]
+    quantized.metadata_props.extend(original.metadata_props)
+    onnx.save(quantized, target)
+
+
+def export_yolo(model_path, backend, imgsz=DEFAULT_IMGSZ, int8=False):
+    """
+    YOLO ağırlıklarını verilen backend'e dışa aktarır (güncel bir kayıt varsa tekrar etmez).
+
+    ONNX ve OpenVINO modelleri dinamik giriş boyutuyla aktarılır; böylece aynı
+    model farklı grup boyutları ve top arama penceresi (search_imgsz) ile de
+    çalışır. OpenVINO int8 ultralytics'in kalibrasyonuyla, ONNX int8 ise
+    onnxruntime'ın ağırlık quantization'ı ile üretilir. TorchScript modeli sabit
+    `imgsz` ile aktarılır (FIXED_SHAPE_BACKENDS); farklı bir giriş boyutu gereken
+    yerde (ör. top arama penceresi) o boyut için ayrıca dışa aktarılmalıdır.
+
+    Returns:
+        str: Dışa aktarılan modelin yolu.
+    """
+    from ultralytics import YOLO
+
+    path = export_path(model_path, backend, imgsz, int8)
+    if not _is_stale(path, model_path):
+        return path
+
+    model = YOLO(model_path)
+    if backend == 'onnx':
+        exported = model.export(format='onnx', imgsz=imgsz, dynamic=True)
+        if int8:
+            _quantize_onnx(exported, path)
+            os.remove(exported)
+        else:
+            _replace(exported, path)
+    elif backend == 'openvino':
+        _replace(model.export(format='openvino', imgsz=imgsz, dynamic=True, int8=int8), path)
+    else:
+        _replace(model.export(format='torchscript', imgsz=imgsz), path)
+    return path
+
+
+def load_yolo(model_path, backend='pt', imgsz=DEFAULT_IMGSZ, int8=False):
+    """
+    Tracker'lar için YOLO modelini seçilen backend ile yükler.
+
+    Dışa aktarma ya da ilk çıkarım başarısız olursa (ör. onnxruntime/openvino
+    yüklü değil) uyarı verilip .pt ağırlıklarına dönülür. int8 desteklemeyen
+    backend'lerde int8 yok sayılır.
+
+    Returns:
+        tuple: (YOLO modeli, gerçekten kullanılan backend etiketi; ör. 'onnx-int8' ya da 'pt')
+    """
+    # ultralytics (ve torch) sadece model yüklenirken gerekir; trackers paketi onsuz da içe aktarılabilir
+    from ultralytics import YOLO
+
+    if backend not in BACKENDS:
+        raise ValueError(f"Bilinmeyen backend: {backend} (seçenekler: {', '.join(BACKENDS)})")
+    if backend == 'pt':
+        return YOLO(model_path), 'pt'
+    if int8 and backend not in INT8_BACKENDS:
+        print(f"{backend} için int8 desteklenmiyor, float model kullanılacak")
+        int8 = False
+
+    try:
+        model = YOLO(export_yolo(model_path, backend, imgsz, int8), task='detect')
+        # ultralytics backend'i ilk çıkarımda yükler; hatayı burada yakalamak için ısınma çağrısı
+        model.predict(np.zeros((imgsz, imgsz, 3), dtype=np.uint8), imgsz=imgsz, verbose=False)
+        # Isınma tahmincisi takip (track) çağrılarına taşınmasın
+        model.predictor = None
+    except Exception as error:
+        print(f"{backend} backend'i kullanılamadı ({error}), .pt ağırlıklarına dönülüyor")
+        return YOLO(model_path), 'pt'
+    return model, backend + ('-int8' if int8 else '')
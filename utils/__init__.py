@@ -1 +1 @@
-from .video_utils import read_video, save_video
\ No newline at end of file
+from .video_utils import read_video, save_video, VideoFrameSource, VideoSaver, indices_to_segments, segments_to_indices, iter_batches
@@ -2,13 +2,111 @@ import cv2
 import numpy as np
 import matplotlib.pyplot as plt
 
+# Bu mesafeden (piksel) yakın köşe adayları tek köşe sayılır
+CORNER_MERGE_RADIUS = 20
+
+# Hücre kenarı radius/√2 olduğunda radius'tan yakın nokta içerebilecek komşu hücreler:
+# 5x5 komşuluk (köşeler hariç). Her hücre çifti bir kez denensin diye yarısı alınır.
+_NEIGHBOR_OFFSETS = np.array([(dx, dy) for dx in range(3) for dy in range(-2, 3)
+                              if (dx > 0 or dy > 0) and not (dx == 2 and abs(dy) == 2)])
+
+
+def _connected_labels(num_nodes, edges):
+    """Kenar listesinin (E, 2) bağlı bileşenleri: her düğüme bileşenindeki en küçük indeks."""
+    labels = np.arange(num_nodes)
+    while len(edges):
+        merged = np.minimum(labels[edges[:, 0]], labels[edges[:, 1]])
+        new_labels = labels.copy()
+        np.minimum.at(new_labels, edges[:, 0], merged)
+        np.minimum.at(new_labels, edges[:, 1], merged)
+        new_labels = new_labels[new_labels] # Etiket zincirlerini kısalt
+        if np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+    return labels
+
+
+def merge_close_points(points, radius=CORNER_MERGE_RADIUS):
+    """
+    Birbirine `radius`'tan yakın noktaları ızgara karması (grid hash) ile kümeler.
+
+    Aralarındaki uzaklık `radius`'tan küçük olan iki nokta aynı kümeye girer
+    (tek bağlantılı kümeleme). Noktalar kenarı radius/√2 olan hücrelere atanır:
+    aynı hücredeki noktalar zaten birbirine radius'tan yakındır, farklı
+    hücrelerdeki noktalar ise sadece birbirine yetişebilecek komşu hücreler
+    arasında gerçek uzaklıklarıyla karşılaştırılır. Aynı konumdaki adaylar
+    (kırpılmış kesişimler çok tekrarlanır) bir kez işlenir. Sıralama dışında
+    her adım vektöreldir, toplam maliyet O(n log n)'dir.
+
+    Returns:
+        tuple: (küme merkezleri (K, 2), destek (K,)) - merkezler üye noktaların
+               ortalamasıdır (çok adayı olan konumlar daha ağır basar), destek
+               kümedeki aday sayısıdır. Kümeler ilk üyelerinin sırasıyla döner.
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    if len(points) == 0:
+        return points, np.empty(0, dtype=np.int64)
+
+    unique_points, first_index, weights = np.unique(points, axis=0, return_index=True, return_counts=True)
+
+    cells = np.floor(unique_points / (radius / np.sqrt(2))).astype(np.int64)
+    cells -= cells.min(axis=0)
+    # Hücreleri tek bir tam sayı anahtarla kodla (komşular ±2 taşabilir diye pay bırakılır)
+    span = cells[:, 1].max() + 5
+    keys = (cells[:, 0] + 2) * span + (cells[:, 1] + 2)
+    order = np.argsort(keys, kind='stable')
+    cell_keys, cell_start, cell_count = np.unique(keys[order], return_index=True, return_counts=True)
+
+    # Aynı hücredeki noktalar hücrenin ilk noktasına bağlanır
+    cell_of_sorted = np.repeat(np.arange(len(cell_keys)), cell_count)
+    edges = [np.stack((order[cell_start[cell_of_sorted]], order), axis=1)]
+
+    cell_x, cell_y = cell_keys // span, cell_keys % span
+    for dx, dy in _NEIGHBOR_OFFSETS:
+        neighbor_keys = (cell_x + dx) * span + (cell_y + dy)
+        pos = np.minimum(np.searchsorted(cell_keys, neighbor_keys), len(cell_keys) - 1)
+        cell_a = np.flatnonzero(cell_keys[pos] == neighbor_keys)
+        cell_b = pos[cell_a]
+
+        # İki hücre arasındaki tüm nokta çiftleri (hücre çifti başına count_a * count_b)
+        pair_counts = cell_count[cell_a] * cell_count[cell_b]
+        pair_cell = np.repeat(np.arange(len(cell_a)), pair_counts)
+        local = np.arange(pair_counts.sum()) - np.repeat(np.cumsum(pair_counts) - pair_counts, pair_counts)
+        count_b = cell_count[cell_b][pair_cell]
+        a = order[cell_start[cell_a][pair_cell] + local // count_b]
+        b = order[cell_start[cell_b][pair_cell] + local % count_b]
+
+        close = np.hypot(*(unique_points[a] - unique_points[b]).T) < radius
+        edges.append(np.stack((a[close], b[close]), axis=1))
+    labels = _connected_labels(len(unique_points), np.concatenate(edges))
+
+    # Kümeleri ilk üyelerinin orijinal sıradaki yerine göre numaralandır
+    cluster_first = np.full(len(unique_points), len(points))
+    np.minimum.at(cluster_first, labels, first_index)
+    roots = np.flatnonzero(cluster_first < len(points))
+    roots = roots[np.argsort(cluster_first[roots])]
+    cluster_of_root = np.empty(len(unique_points), dtype=np.int64)
+    cluster_of_root[roots] = np.arange(len(roots))
+    clusters = cluster_of_root[labels]
+
+    support = np.bincount(clusters, weights, minlength=len(roots)).astype(np.int64)
+    cluster_sums = np.stack((np.bincount(clusters, unique_points[:, 0] * weights, minlength=len(roots)),
+                             np.bincount(clusters, unique_points[:, 1] * weights, minlength=len(roots))), axis=1)
+    return cluster_sums / support[:, None], support
+
+
 class TennisCourtDetector:
-    def __init__(self):
+    def __init__(self, analysis_size=(274, 594)):
         # Gerçek kort ölçüleri (metre cinsinden)
         self.court_length = 23.77  # Uzunluk
         self.court_width_doubles = 10.97  # Çiftler için genişlik
         self.court_width_singles = 8.23  # Tekler için genişlik
         self.net_height = 0.914  # File yüksekliği (metre)
+
+        # Aksiyon filtresi için kuş bakışı görüntünün boyutu (1097x2377'nin ~1/4'ü)
+        self.analysis_size = analysis_size
+        # Köşe seti -> perspektif matrisi önbelleği (sabit kamera için bir kez hesaplanır)
+        self._homography_cache = {}
         
     def preprocess_image(self, image):
         """Görüntüyü ön işleme tabi tutar"""
@@ -35,10 +133,11 @@ class TennisCourtDetector:
         
         return blurred
     
-    def detect_court_lines(self, image):
-        """Kort çizgilerini tespit eder"""
+    def detect_court_lines(self, image, processed=None):
+        """Kort çizgilerini tespit eder (processed: önceden hesaplanmış preprocess_image çıktısı)"""
         # Ön işleme (UMat döner)
-        processed = self.preprocess_image(image)
+        if processed is None:
+            processed = self.preprocess_image(image)
         
         # Canny kenar tespiti (UMat destekler)
         edges = cv2.Canny(processed, 50, 150, apertureSize=3)
@@ -90,33 +189,18 @@ class TennisCourtDetector:
     def detect_corners_advanced(self, lines, width, height):
         """Gelişmiş köşe tespiti"""
         # Çizgileri yatay ve dikey olarak sınıflandır
-        horizontal_lines = []
-        vertical_lines = []
-        
-        for line in lines:
-            x1, y1, x2, y2 = line[0]
-            angle = np.abs(np.arctan2(y2 - y1, x2 - x1) * 180 / np.pi)
-            
-            if angle < 45 or angle > 135:  # Yatay çizgiler (toleransı artırdık)
-                horizontal_lines.append(line[0])
-            elif 45 <= angle <= 135:  # Dikey çizgiler
-                vertical_lines.append(line[0])
-        
-        # Kesişim noktalarını bul
-        corners = []
-        # Daha fazla çizgi dene
-        for h_line in horizontal_lines:
-            for v_line in vertical_lines:
-                intersection = self.line_intersection(h_line, v_line)
-                if intersection is not None:
-                    x, y = intersection
-                    # Görüntü sınırları içinde mi (biraz toleransla)
-                    if -50 <= x < width + 50 and -50 <= y < height + 50:
-                        corners.append([x, y])
-        
+        horizontal_lines, vertical_lines = self.split_lines(lines)
+
+        # Tüm yatay-dikey çiftlerinin kesişimleri tek vektörel işlemle (yatay çizgi sırasıyla)
+        intersections = self.line_intersections(horizontal_lines, vertical_lines).reshape(-1, 2)
+        intersections = intersections[~np.isnan(intersections[:, 0])]
+        # line_intersection gibi tam sayıya kırp; görüntü sınırları içinde mi (biraz toleransla)
+        corners = np.trunc(intersections).astype(int)
+        inside = (corners[:, 0] >= -50) & (corners[:, 0] < width + 50) & \
+                 (corners[:, 1] >= -50) & (corners[:, 1] < height + 50)
+        corners = corners[inside]
+
         if len(corners) >= 4:
-            corners = np.array(corners)
-            
             # Kümeleme (birbirine yakın köşeleri birleştir)
             # Basit bir yöntem: K-Means veya sadece mesafe kontrolü
             # Burada basitçe en dıştaki mantıklı 4 köşeyi seçeceğiz
@@ -131,10 +215,199 @@ class TennisCourtDetector:
             # Basitçe ilk 4'ü döndür (sıralanmış olduğu için)
             # Ancak bu her zaman doğru olmayabilir. 
             # İyileştirme: Köşelerin oluşturduğu alanın büyüklüğüne bakılabilir.
+            # (detect_corners_auto kort modelini çizgi maskesine oturtarak seçer)
             
             return corners[[0, 1, 2, 3]] # En basit hali
         
         return None
+
+    def split_lines(self, lines):
+        """HoughLinesP çıktısını (N, 1, 4) yatay ve dikey (K, 4) float dizilere ayırır."""
+        segments = np.asarray(lines, dtype=np.float64).reshape(-1, 4)
+        angles = np.abs(np.degrees(np.arctan2(segments[:, 3] - segments[:, 1],
+                                              segments[:, 2] - segments[:, 0])))
+        horizontal = (angles < 45) | (angles > 135) # Yatay çizgiler (toleransı artırdık)
+        return segments[horizontal], segments[~horizontal]
+
+    def line_intersections(self, lines1, lines2):
+        """
+        (A, 4) ve (B, 4) çizgi dizilerinin tüm çiftleri için (A, B, 2) kesişim noktaları.
+        line_intersection ile aynı formül (sonsuz doğrular); paralel çiftler NaN'dir.
+        """
+        x1, y1, x2, y2 = (c[:, None] for c in np.asarray(lines1, dtype=np.float64).reshape(-1, 4).T)
+        x3, y3, x4, y4 = (c[None, :] for c in np.asarray(lines2, dtype=np.float64).reshape(-1, 4).T)
+
+        denom = (x1-x2)*(y3-y4) - (y1-y2)*(x3-x4)
+        valid = np.abs(denom) >= 1e-10
+        t = np.divide((x1-x3)*(y3-y4) - (y1-y3)*(x3-x4), denom,
+                      out=np.full(denom.shape, np.nan), where=valid)
+        return np.stack((x1 + t * (x2-x1), y1 + t * (y2-y1)), axis=-1)
+
+    def court_model_points(self, step=0.25):
+        """
+        Kortun boyalı çizgileri üzerinde `step` metre aralıklı örnek noktalar (metre).
+        Orijin çiftler kortunun sol-üst köşesidir (apply_perspective_transform ile aynı).
+
+        Returns:
+            tuple: (noktalar (M, 2), dış sınıra (dip ve çiftler yan çizgileri) ait olanlar (M,) bool)
+        """
+        width, length = self.court_width_doubles, self.court_length
+        alley = (width - self.court_width_singles) / 2
+        service = length / 2 - 6.40 # Servis çizgisi fileden 6.40 m uzakta
+        lines = [
+            (0, 0, width, 0), (0, length, width, length), # Dip çizgileri
+            (0, 0, 0, length), (width, 0, width, length), # Çiftler yan çizgileri
+            (alley, 0, alley, length), (width - alley, 0, width - alley, length), # Tekler yan çizgileri
+            (alley, service, width - alley, service), # Servis çizgileri
+            (alley, length - service, width - alley, length - service),
+            (width / 2, service, width / 2, length - service), # Orta servis çizgisi
+        ]
+        points, boundary = [], []
+        for line_idx, (x1, y1, x2, y2) in enumerate(lines):
+            count = max(int(np.hypot(x2 - x1, y2 - y1) / step), 1) + 1
+            t = np.linspace(0, 1, count)[:, None]
+            points.append(np.array([x1, y1]) + t * np.array([x2 - x1, y2 - y1]))
+            boundary.append(np.full(count, line_idx < 4))
+        return np.concatenate(points), np.concatenate(boundary)
+
+    @staticmethod
+    def _batch_homographies(src, dst):
+        """Sabit 4 kaynak noktadan (4, 2) K hedef dörtgene (K, 4, 2) K adet homografi (K, 3, 3)."""
+        x, y = src[:, 0], src[:, 1]
+        u, v = dst[..., 0], dst[..., 1]
+        A = np.zeros((len(dst), 8, 8))
+        A[:, 0::2, 0], A[:, 0::2, 1], A[:, 0::2, 2] = x, y, 1
+        A[:, 0::2, 6], A[:, 0::2, 7] = -x * u, -y * u
+        A[:, 1::2, 3], A[:, 1::2, 4], A[:, 1::2, 5] = x, y, 1
+        A[:, 1::2, 6], A[:, 1::2, 7] = -x * v, -y * v
+        b = np.empty((len(dst), 8))
+        b[:, 0::2], b[:, 1::2] = u, v
+        h = np.linalg.solve(A, b[..., None])[..., 0]
+        return np.concatenate((h, np.ones((len(dst), 1))), axis=1).reshape(-1, 3, 3)
+
+    def fit_court_model(self, horizontal_lines, vertical_lines, line_mask, iterations=2000,
+                        min_area_ratio=0.05, seed=0):
+        """
+        Çizgi maskesine en iyi oturan kort dörtgenini RANSAC ile bulur.
+
+        Her aday iki yatay ve iki dikey çizgiden oluşur; köşeleri önceden tek
+        seferde hesaplanan kesişim tablosundan alınır. Uzun çizgiler daha sık
+        örneklenir; olası tüm adaylar `iterations`'dan azsa hepsi denenir.
+        Dışbükey olmayan, çok küçük, çok ince ya da görüntüden çok taşan adaylar elenir.
+        Kalan her adayın homografisiyle kort modelinin çizgi noktaları görüntüye
+        yansıtılır ve maskeye düşen noktaların oranı adayın puanı olur.
+
+        Dış sınır adayı oluşturan çizgilerin üzerinde olduğu için rastgele
+        çizgilerde de kısmen tutar; güven bu yüzden sadece iç çizgilerin (tekler
+        yan çizgileri, servis çizgileri) maskeye düşme oranıdır.
+
+        Returns:
+            tuple: (köşeler (4, 2) sol-üst, sağ-üst, sağ-alt, sol-alt; güven 0-1).
+                   Aday yoksa (None, 0.0).
+        """
+        num_h, num_v = len(horizontal_lines), len(vertical_lines)
+        if num_h < 2 or num_v < 2:
+            return None, 0.0
+        height, width = line_mask.shape[:2]
+        table = self.line_intersections(horizontal_lines, vertical_lines)
+
+        h_pairs = np.array(np.triu_indices(num_h, 1)).T
+        v_pairs = np.array(np.triu_indices(num_v, 1)).T
+        if len(h_pairs) * len(v_pairs) <= iterations:
+            h_idx = np.repeat(h_pairs, len(v_pairs), axis=0)
+            v_idx = np.tile(v_pairs, (len(h_pairs), 1))
+        else:
+            rng = np.random.default_rng(seed)
+            def sample(lines):
+                lengths = np.hypot(lines[:, 2] - lines[:, 0], lines[:, 3] - lines[:, 1])
+                return rng.choice(len(lines), size=(iterations, 2), p=lengths / lengths.sum())
+            h_idx, v_idx = sample(horizontal_lines), sample(vertical_lines)
+            distinct = (h_idx[:, 0] != h_idx[:, 1]) & (v_idx[:, 0] != v_idx[:, 1])
+            h_idx, v_idx = h_idx[distinct], v_idx[distinct]
+
+        # Üst çizgi ilk, sol çizgi ilk olacak şekilde çiftleri sırala (orta noktalara göre)
+        h_mid = (horizontal_lines[:, 1] + horizontal_lines[:, 3]) / 2
+        v_mid = (vertical_lines[:, 0] + vertical_lines[:, 2]) / 2
+        h_idx = np.where((h_mid[h_idx[:, 0]] > h_mid[h_idx[:, 1]])[:, None], h_idx[:, ::-1], h_idx)
+        v_idx = np.where((v_mid[v_idx[:, 0]] > v_mid[v_idx[:, 1]])[:, None], v_idx[:, ::-1], v_idx)
+
+        top, bottom, left, right = h_idx[:, 0], h_idx[:, 1], v_idx[:, 0], v_idx[:, 1]
+        quads = np.stack((table[top, left], table[top, right],
+                          table[bottom, right], table[bottom, left]), axis=1) # (K, 4, 2)
+
+        # Geçerlilik: kesişimler var, dışbükey ve saat yönünde, yeterince büyük (ince şerit
+        # değil), köşeler görüntüye yakın
+        edges = np.roll(quads, -1, axis=1) - quads
+        cross = edges[:, :, 0] * np.roll(edges, -1, axis=1)[:, :, 1] - \
+                edges[:, :, 1] * np.roll(edges, -1, axis=1)[:, :, 0]
+        area = 0.5 * np.abs(np.sum(quads[:, :, 0] * np.roll(quads[:, :, 1], -1, axis=1) -
+                                   np.roll(quads[:, :, 0], -1, axis=1) * quads[:, :, 1], axis=1))
+        edge_lengths = np.hypot(edges[..., 0], edges[..., 1])
+        margin = 0.1 * max(width, height)
+        with np.errstate(invalid='ignore'):
+            valid = ~np.isnan(quads).any(axis=(1, 2)) & (cross > 0).all(axis=1) & \
+                    (area >= min_area_ratio * width * height) & \
+                    (edge_lengths >= 0.1 * min(width, height)).all(axis=1) & \
+                    (quads[..., 0] > -margin).all(axis=1) & (quads[..., 0] < width + margin).all(axis=1) & \
+                    (quads[..., 1] > -margin).all(axis=1) & (quads[..., 1] < height + margin).all(axis=1)
+        quads = quads[valid]
+        if len(quads) == 0:
+            return None, 0.0
+
+        # Kort modelini tüm adaylar için tek seferde görüntüye yansıt ve maskede say
+        court_corners = np.array([[0, 0], [self.court_width_doubles, 0],
+                                  [self.court_width_doubles, self.court_length], [0, self.court_length]])
+        model_points, boundary = self.court_model_points()
+        model_points = np.hstack((model_points, np.ones((len(model_points), 1))))
+        homographies = self._batch_homographies(court_corners, quads)
+        projected = np.einsum('mj,kij->kmi', model_points, homographies)
+        px = np.rint(projected[..., 0] / projected[..., 2]).astype(np.int64)
+        py = np.rint(projected[..., 1] / projected[..., 2]).astype(np.int64)
+        inside = (px >= 0) & (px < width) & (py >= 0) & (py < height)
+        hits = inside & (line_mask[np.clip(py, 0, height - 1), np.clip(px, 0, width - 1)] > 0)
+        scores = hits.mean(axis=1)
+
+        best = int(np.argmax(scores))
+        return quads[best].astype(np.float32), float(hits[best, ~boundary].mean())
+
+    def detect_corners_auto(self, image, iterations=2000, working_width=1000, seed=0):
+        """
+        Arayüz gerektirmeden (headless) kortun 4 köşesini ve güven değerini bulur.
+
+        Beyaz çizgi maskesinden Hough çizgileri çıkarılır, kort modeli
+        fit_court_model ile maskeye oturtulur. Güven, kort modelinin çizgi
+        noktalarından (iç çizgiler) maskeye düşenlerin oranıdır (0-1).
+
+        Returns:
+            tuple: (köşeler (4, 2) float32 ya da None, güven)
+        """
+        if isinstance(image, cv2.UMat):
+            image = image.get()
+        orig_h, orig_w = image.shape[:2]
+
+        # İşleme için boyutu küçült (Performans ve gürültü azaltma için)
+        scale = 1.0
+        working_frame = image
+        if orig_w > working_width:
+            scale = orig_w / working_width
+            working_frame = cv2.resize(image, (working_width, int(orig_h / scale)))
+
+        # Beyaz çizgi maskesi hem Hough çizgileri hem de modelin doğrulaması için bir kez hesaplanır
+        processed = self.preprocess_image(working_frame)
+        _, lines = self.detect_court_lines(working_frame, processed)
+        if lines is None:
+            return None, 0.0
+        if isinstance(processed, cv2.UMat):
+            processed = processed.get()
+        # Çizgi kalınlığı ve küçük hizalama hataları için maskeyi biraz genişlet
+        line_mask = cv2.dilate((processed > 127).astype(np.uint8), np.ones((5, 5), np.uint8))
+
+        horizontal_lines, vertical_lines = self.split_lines(lines)
+        corners, confidence = self.fit_court_model(horizontal_lines, vertical_lines, line_mask,
+                                                   iterations=iterations, seed=seed)
+        if corners is None:
+            return None, 0.0
+        return corners * scale, confidence
     
     def line_intersection(self, line1, line2):
         """İki çizginin kesişim noktasını bulur"""
@@ -154,18 +427,8 @@ class TennisCourtDetector:
     
     def sort_corners(self, corners):
         """Köşeleri saat yönünde sıralar: sol üst, sağ üst, sağ alt, sol alt"""
-        # Tekrarlayan noktaları temizle (basitçe)
-        unique_corners = []
-        for c in corners:
-            is_close = False
-            for u in unique_corners:
-                if np.linalg.norm(c - u) < 20: # 20 piksel yakınlık
-                    is_close = True
-                    break
-            if not is_close:
-                unique_corners.append(c)
-        
-        corners = np.array(unique_corners)
+        # Tekrarlayan noktaları birleştir (20 piksel yakınlık, destek ağırlıklı merkezler)
+        corners, _ = merge_close_points(corners, CORNER_MERGE_RADIUS)
         if len(corners) < 4:
             return corners # Yeterli köşe yok
             
@@ -186,6 +449,34 @@ class TennisCourtDetector:
         
         return sorted_corners
 
+    def get_analysis_homography(self, corners, output_size=None):
+        """Köşe seti ve çıktı boyutu için perspektif matrisini önbellekten döndürür."""
+        output_size = tuple(output_size or self.analysis_size)
+        corners = np.float32(corners)
+        key = (corners.tobytes(), output_size)
+
+        matrix = self._homography_cache.get(key)
+        if matrix is None:
+            dst_corners = np.float32([
+                [0, 0],
+                [output_size[0], 0],
+                [output_size[0], output_size[1]],
+                [0, output_size[1]]
+            ])
+            matrix = cv2.getPerspectiveTransform(corners, dst_corners)
+            self._homography_cache[key] = matrix
+        return matrix
+
+    def warp_for_analysis(self, frame, corners, output_size=None):
+        """
+        Sabit kamera hızlı yolu: kareyi sadece aksiyon analizi için küçük çözünürlükte
+        kuş bakışına çevirir. Matris önbellekten gelir; köşe/ölçü çizimi ve UMat
+        gidiş-dönüşü yapılmaz.
+        """
+        output_size = tuple(output_size or self.analysis_size)
+        matrix = self.get_analysis_homography(corners, output_size)
+        return cv2.warpPerspective(frame, matrix, output_size)
+
     def apply_perspective_transform(self, image, src_corners, output_size=(1097, 2377)):
         """Perspektif dönüşümü uygular"""
         # Hedef köşeler (yukarıdan bakış)
@@ -0,0 +1,87 @@
+import cv2
+import numpy as np
+
+
+class BounceHeatmap:
+    """
+    Sekme noktalarını zamanla biriktiren artımlı yoğunluk ısı haritası.
+
+    Her sekme, gerçekleştiği karede float bir biriktirici ızgaraya Gauss çekirdeği
+    olarak eklenir (splat). `half_life` verilirse eski sekmeler zamanla söner.
+    Sönme ortak bir ölçek katsayısı ile tembel uygulanır; renkli görüntü sadece
+    yeni bir sekme eklendiğinde ya da sönme gözle görülür bir adım attığında
+    yeniden üretilir. Böylece toplam maliyet O(kare + sekme) olur.
+
+    Args:
+        shape (tuple): Izgaranın (yükseklik, genişlik) boyutu (piksel).
+        sigma (float): Gauss çekirdeğinin standart sapması (piksel).
+        saturation (float): Tam renge ulaşmak için üst üste binmesi gereken sekme sayısı.
+        half_life (float, optional): Bir sekmenin yoğunluğunun yarıya indiği kare sayısı.
+        colormap (int): OpenCV renk haritası.
+    """
+
+    # Sönme bu orandan fazla ilerlediyse görüntü yenilenir (8 bit renkte fark edilebilir adım)
+    REFRESH_STEP = 1 / 64
+
+    def __init__(self, shape, sigma=6.0, saturation=3.0, half_life=None, colormap=cv2.COLORMAP_JET):
+        self.accumulator = np.zeros(shape, dtype=np.float32)
+        self.saturation = saturation
+        self.decay = 0.5 ** (1.0 / half_life) if half_life else None
+        self.colormap = colormap
+
+        radius = int(np.ceil(3 * sigma))
+        kernel_1d = cv2.getGaussianKernel(2 * radius + 1, sigma)
+        kernel = kernel_1d @ kernel_1d.T
+        self.kernel = (kernel / kernel.max()).astype(np.float32)
+        self.radius = radius
+
+        # Gerçek yoğunluk = accumulator * scale (sönme tembel uygulanır)
+        self.scale = 1.0
+        self._rendered_scale = None
+        self.version = 0 # Renkli görüntü her yenilendiğinde artar
+        self.colors = np.zeros(shape + (3,), dtype=np.uint8)
+        self.alpha = np.zeros(shape, dtype=np.float32)
+
+    def advance(self, frames=1):
+        """Zamanı `frames` kare ilerletir (sönme varsa uygulanır)."""
+        if self.decay is None:
+            return
+        self.scale *= self.decay ** frames
+        if self.scale < 1e-6:
+            # Küçülen ölçek float hassasiyetini bozmasın
+            self.accumulator *= self.scale
+            if self._rendered_scale is not None:
+                self._rendered_scale /= self.scale
+            self.scale = 1.0
+
+    def add(self, points):
+        """(N, 2) ızgara koordinatlarındaki sekmeleri biriktiriciye ekler."""
+        height, width = self.accumulator.shape
+        r = self.radius
+        for x, y in np.asarray(points, dtype=int).reshape(-1, 2):
+            # Çekirdeğin ızgara içinde kalan kısmı
+            x0, x1 = max(x - r, 0), min(x + r + 1, width)
+            y0, y1 = max(y - r, 0), min(y + r + 1, height)
+            if x0 >= x1 or y0 >= y1:
+                continue
+            self.accumulator[y0:y1, x0:x1] += \
+                self.kernel[y0 - (y - r):y1 - (y - r), x0 - (x - r):x1 - (x - r)] / self.scale
+            self._rendered_scale = None
+
+    def render(self):
+        """
+        Gerekirse renkli görüntüyü ve saydamlık maskesini yeniler.
+
+        Returns:
+            bool: Görüntü yenilendiyse True.
+        """
+        if self._rendered_scale is not None and self._rendered_scale / self.scale < 1 + self.REFRESH_STEP:
+            return False
+
+        intensity = np.clip(self.accumulator * (self.scale / self.saturation), 0, 1)
+        self.colors = cv2.applyColorMap((intensity * 255).astype(np.uint8), self.colormap)
+        # Tek bir sekmenin merkezi bile tam görünür olsun; renk yoğunluğu saturation'a göre artar
+        self.alpha = np.minimum(intensity * self.saturation, 1)
+        self._rendered_scale = self.scale
+        self.version += 1
+        return True
@@ -0,0 +1,44 @@
+import cv2
+import numpy as np
+
+# Çiftler kortunun gerçek boyutları (metre)
+COURT_WIDTH_METERS = 10.97
+COURT_LENGTH_METERS = 23.77
+
+
+class CourtProjector:
+    """
+    Görüntü koordinatlarını kort düzlemine (metre) çeviren homografi projektörü.
+
+    Dönüşüm matrisi her köşe seti için bir kez hesaplanıp saklanır; noktalar
+    (N, 2) diziler halinde tek bir vektörel işlemle dönüştürülür. Köşe sırası:
+    sol-üst, sağ-üst, sağ-alt, sol-alt. Kortun sol-üst köşesi (0, 0) metredir.
+    """
+
+    def __init__(self, court_width=COURT_WIDTH_METERS, court_length=COURT_LENGTH_METERS):
+        self.court_width = court_width
+        self.court_length = court_length
+        self._matrix_cache = {}
+
+    def get_matrix(self, corners):
+        """Köşe setine ait görüntü -> metre homografisini döndürür (önbellekli)."""
+        corners = np.asarray(corners, dtype=np.float32).reshape(4, 2)
+        key = corners.tobytes()
+        if key not in self._matrix_cache:
+            dst_points = np.float32([
+                [0, 0],
+                [self.court_width, 0],
+                [self.court_width, self.court_length],
+                [0, self.court_length],
+            ])
+            self._matrix_cache[key] = cv2.getPerspectiveTransform(corners, dst_points)
+        return self._matrix_cache[key]
+
+    def to_meters(self, points, corners):
+        """(N, 2) görüntü noktalarını (N, 2) metre koordinatlarına çevirir."""
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        matrix = self.get_matrix(corners)
+
+        # Homojen koordinatlarda tek matris çarpımı, ardından perspektif bölmesi
+        projected = points @ matrix[:, :2].T + matrix[:, 2]
+        return projected[:, :2] / projected[:, 2:3]
@@ -0,0 +1,156 @@
+import hashlib
+import json
+import numbers
+import os
+
+from .detection_store import DetectionStore
+
+
+def _resolve_model_file(model_path):
+    """'yolov8x' gibi isimleri diskteki ağırlık dosyasına çözer (bulunamazsa None)."""
+    for candidate in (model_path, f"{model_path}.pt"):
+        if os.path.isfile(candidate):
+            return candidate
+    return None
+
+
+def _canonical_params(value):
+    """Parametreleri hash için normalize eder: 1 ve 1.0 gibi eşit sayılar aynı anahtarı üretir."""
+    if isinstance(value, dict):
+        return {str(key): _canonical_params(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_canonical_params(item) for item in value]
+    # bool da bir sayı tipidir ama True ile 1.0 aynı ayar sayılmamalı
+    if isinstance(value, numbers.Real) and not isinstance(value, bool):
+        return float(value)
+    return value
+
+
+class DetectionCache:
+    """
+    İçerik adresli tespit önbelleği.
+
+    Anahtar; girdi videosunun içeriği, model ağırlık dosyasının içeriği ve
+    çıkarım parametrelerinin hash'inden üretilir. Böylece video, model veya
+    eşik değeri değiştiğinde eski tespitler asla geri dönmez. DetectionStore
+    dizileri sıkıştırılmamış .npz olarak saklanır ve milisaniyeler
+    içinde yüklenir. Klasör boyutu `max_size_mb` değerini aşarsa en uzun süredir
+    kullanılmayan kayıtlar silinir.
+
+    Args:
+        cache_dir (str): Önbellek dosyalarının tutulacağı klasör.
+        max_size_mb (float): Önbelleğin diskte kaplayabileceği en fazla alan.
+    """
+
+    INDEX_FILE = 'file_hashes.json'
+
+    def __init__(self, cache_dir='tracker_stubs', max_size_mb=512):
+        self.cache_dir = cache_dir
+        self.max_size_bytes = int(max_size_mb * 1024 * 1024)
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _load_index(self):
+        index_path = os.path.join(self.cache_dir, self.INDEX_FILE)
+        if not os.path.exists(index_path):
+            return {}
+        try:
+            with open(index_path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_index(self, index):
+        index_path = os.path.join(self.cache_dir, self.INDEX_FILE)
+        tmp_path = index_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(index, f)
+        os.replace(tmp_path, index_path)
+
+    def file_hash(self, path):
+        """
+        Dosya içeriğinin sha256 özetini döndürür.
+
+        Büyük maç videolarını her çalıştırmada baştan okumamak için özet,
+        dosyanın boyutu ve değiştirilme zamanıyla birlikte indekste saklanır.
+        """
+        stat = os.stat(path)
+        abs_path = os.path.abspath(path)
+        index = self._load_index()
+        entry = index.get(abs_path)
+        if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+            return entry['sha256']
+
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        sha = digest.hexdigest()
+
+        index[abs_path] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': sha}
+        self._save_index(index)
+        return sha
+
+    def make_key(self, video_path, model_path, params, segments=None):
+        """
+        Video, model ağırlıkları ve çıkarım parametrelerinden önbellek anahtarı üretir.
+        Tespitler videonun sadece bazı [start, end) aralıklarında yapıldıysa
+        bu aralıklar da anahtara eklenir.
+        """
+        model_file = _resolve_model_file(model_path)
+        key_data = {
+            'video': self.file_hash(video_path),
+            # Ağırlık dosyası yoksa (ör. ultralytics indirecekse) sadece ismi kullanılır
+            'model': self.file_hash(model_file) if model_file else model_path,
+            'params': _canonical_params(params),
+        }
+        if segments is not None:
+            key_data['segments'] = [[int(start), int(end)] for start, end in segments]
+        encoded = json.dumps(key_data, sort_keys=True).encode('utf-8')
+        return hashlib.sha256(encoded).hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.npz")
+
+    def load(self, key):
+        """Anahtara ait DetectionStore'u döndürür; kayıt yoksa None."""
+        path = self._entry_path(key)
+        if not os.path.exists(path):
+            return None
+
+        try:
+            detections = DetectionStore.load(path)
+        except (OSError, ValueError, KeyError):
+            # Bozuk veya eski formatta kayıt: sil ve yeniden hesaplanmasına izin ver
+            os.remove(path)
+            return None
+
+        # LRU tahliyesi için son kullanım zamanını güncelle
+        os.utime(path)
+        return detections
+
+    def save(self, key, detections):
+        """DetectionStore dizilerini kaydeder."""
+        path = self._entry_path(key)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            detections.save(f)
+        os.replace(tmp_path, path)
+
+        self._evict()
+
+    def _evict(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith('.npz'):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total_size = sum(size for _, size, _ in entries)
+        # En eski kullanılanlardan başlayarak sınırın altına inene kadar sil
+        for _, size, path in sorted(entries):
+            if total_size <= self.max_size_bytes:
+                break
+            os.remove(path)
+            total_size -= size
@@ -0,0 +1,107 @@
+import numpy as np
+
+
+class DetectionStore:
+    """
+    Tespitlerin sütun bazlı (columnar) saklandığı yapı.
+
+    Her tespit bir satırdır; tüm satırlar bitişik numpy dizilerinde tutulur:
+    frame_indices (int32), track_ids (int32), boxes (float32, Nx4 - x1,y1,x2,y2)
+    ve scores (float32). frame_offsets (int64, kare_sayısı+1) dizisi i. karenin
+    satırlarının [frame_offsets[i], frame_offsets[i+1]) aralığında olduğunu
+    gösterir; böylece bir karenin tespitlerine kopyalamadan erişilir.
+    """
+
+    def __init__(self, frame_offsets, track_ids, boxes, scores):
+        self.frame_offsets = np.asarray(frame_offsets, dtype=np.int64)
+        self.track_ids = np.asarray(track_ids, dtype=np.int32)
+        self.boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        self.scores = np.asarray(scores, dtype=np.float32)
+
+        counts = np.diff(self.frame_offsets)
+        self.frame_indices = np.repeat(np.arange(len(counts), dtype=np.int32), counts)
+
+    def __len__(self):
+        return len(self.frame_offsets) - 1
+
+    @property
+    def num_detections(self):
+        return len(self.track_ids)
+
+    def frame(self, frame_idx):
+        """Bir karenin (track_ids, boxes, scores) dizilerini görünüm (view) olarak döndürür."""
+        start, end = self.frame_offsets[frame_idx], self.frame_offsets[frame_idx + 1]
+        return self.track_ids[start:end], self.boxes[start:end], self.scores[start:end]
+
+    def track_boxes(self, track_id):
+        """
+        Bir ID'nin kare başına kutularını (kare_sayısı x 4) döndürür.
+        ID'nin görünmediği karelerde satır NaN'dir. Aynı karede birden fazla
+        kutu varsa sonuncusu kullanılır.
+        """
+        dense = np.full((len(self), 4), np.nan, dtype=np.float32)
+        mask = self.track_ids == track_id
+        dense[self.frame_indices[mask]] = self.boxes[mask]
+        return dense
+
+    def track_scores(self, track_id):
+        """Bir ID'nin kare başına skorları (kare_sayısı,); ID'nin görünmediği karelerde 0."""
+        dense = np.zeros(len(self), dtype=np.float32)
+        mask = self.track_ids == track_id
+        dense[self.frame_indices[mask]] = self.scores[mask]
+        return dense
+
+    @classmethod
+    def from_track_boxes(cls, dense_boxes, track_id, scores=None):
+        """track_boxes çıktısı biçimindeki (NaN = tespit yok) diziden store oluşturur."""
+        dense_boxes = np.asarray(dense_boxes, dtype=np.float32)
+        valid = ~np.isnan(dense_boxes).any(axis=1)
+
+        frame_offsets = np.zeros(len(dense_boxes) + 1, dtype=np.int64)
+        frame_offsets[1:] = np.cumsum(valid)
+
+        if scores is None:
+            scores = np.ones(len(dense_boxes), dtype=np.float32)
+        return cls(frame_offsets,
+                   np.full(int(valid.sum()), track_id, dtype=np.int32),
+                   dense_boxes[valid],
+                   np.asarray(scores, dtype=np.float32)[valid])
+
+    def save(self, file):
+        np.savez(file, frame_offsets=self.frame_offsets, track_ids=self.track_ids,
+                 boxes=self.boxes, scores=self.scores)
+
+    @classmethod
+    def load(cls, file):
+        with np.load(file) as data:
+            return cls(data['frame_offsets'], data['track_ids'], data['boxes'], data['scores'])
+
+
+class DetectionStoreBuilder:
+    """Kare kare gelen tespit dizilerini biriktirip tek bir DetectionStore'a çevirir."""
+
+    def __init__(self):
+        self._track_ids = []
+        self._boxes = []
+        self._scores = []
+        self._counts = []
+
+    def __len__(self):
+        return len(self._counts)
+
+    def append_frame(self, track_ids, boxes, scores):
+        self._track_ids.append(np.asarray(track_ids, dtype=np.int32))
+        self._boxes.append(np.asarray(boxes, dtype=np.float32).reshape(-1, 4))
+        self._scores.append(np.asarray(scores, dtype=np.float32))
+        self._counts.append(len(self._track_ids[-1]))
+
+    def build(self):
+        frame_offsets = np.zeros(len(self._counts) + 1, dtype=np.int64)
+        frame_offsets[1:] = np.cumsum(self._counts)
+
+        if not self._counts:
+            return DetectionStore(frame_offsets, np.empty(0), np.empty((0, 4)), np.empty(0))
+        return DetectionStore(frame_offsets,
+                              np.concatenate(self._track_ids),
+                              np.concatenate(self._boxes),
+                              np.concatenate(self._scores))
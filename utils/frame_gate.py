@@ -0,0 +1,81 @@
+import cv2
+import numpy as np
+
+
+class DuplicateFrameGate:
+    """
+    Neredeyse aynı kareleri ucuz bir algısal farkla bulan kapı.
+
+    Her kare küçük bir gri görüntüye (varsayılan 64x36, INTER_AREA) indirilir ve
+    en son modelin çalıştırıldığı (referans) kareyle karşılaştırılır. En büyük
+    hücre farkı `threshold` altındaysa kare kopya sayılır ve önceki tespitler
+    yeniden kullanılabilir. Ortalama yerine en büyük fark kullanıldığı için küçük
+    bir bölgedeki hareket (ör. top) de kareyi yeni sayar. Aynı referans en fazla
+    `max_reuse` kez üst üste kullanılır; sonra model yine çalıştırılır.
+
+    Args:
+        threshold (float): 0-255 ölçeğinde kopya sayılacak en büyük hücre farkı.
+        max_reuse (int): Bir tespitin üst üste yeniden kullanılabileceği kare sayısı.
+        size (tuple): Karşılaştırma görüntüsünün (genişlik, yükseklik) boyutu.
+    """
+
+    def __init__(self, threshold=3.0, max_reuse=10, size=(64, 36)):
+        self.threshold = threshold
+        self.max_reuse = max_reuse
+        self.size = size
+        self.checked = 0
+        self.reused = 0
+        self.reset()
+
+    def reset(self):
+        """Referansı unutur (ör. yeni bir video ya da segment başlarken)."""
+        self._reference = None
+        self._reuse_count = 0
+
+    def params(self):
+        # Önbellek anahtarına girecek ayarlar
+        return {'threshold': self.threshold, 'max_reuse': self.max_reuse, 'size': list(self.size)}
+
+    def is_duplicate(self, frame):
+        """Kare referansa yeterince yakınsa True; değilse kareyi yeni referans yapar ve False döndürür."""
+        small = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        small = small.astype(np.int16)
+        self.checked += 1
+
+        if (self._reference is not None and self._reuse_count < self.max_reuse and
+                np.abs(small - self._reference).max() < self.threshold):
+            self._reuse_count += 1
+            self.reused += 1
+            return True
+
+        self._reference = small
+        self._reuse_count = 0
+        return False
+
+    def run_batch(self, frames, run_model, to_arrays, last_result=None):
+        """
+        Gruptaki kopya kareleri ayıklar, modeli sadece yeni karelerde tek çağrıyla çalıştırır.
+
+        run_model yeni karelerin listesini alıp her biri için bir model sonucu
+        döndürür; sonuçlar to_arrays ile dönüştürülür. Kopya karelere en son
+        yeni karenin sonucu (grubun başındaysa last_result) verilir.
+
+        Returns:
+            list: Her kare için to_arrays çıktısı.
+        """
+        is_duplicate = [self.is_duplicate(frame) for frame in frames]
+        fresh = [frame for frame, duplicate in zip(frames, is_duplicate) if not duplicate]
+        fresh_results = iter([to_arrays(result) for result in run_model(fresh)] if fresh else [])
+
+        detections = []
+        for duplicate in is_duplicate:
+            if not duplicate:
+                last_result = next(fresh_results)
+            detections.append(last_result)
+        return detections
+
+    def summary(self):
+        ratio = self.reused / self.checked if self.checked else 0.0
+        return f"{self.reused}/{self.checked} kare için çıkarım atlandı (%{ratio * 100:.1f})"
@@ -0,0 +1,69 @@
+import cv2
+import numpy as np
+
+
+class HistogramSimilarity:
+    """
+    Referans kareye göre HSV (H-S) histogram korelasyonu hesaplayan durumlu motor.
+
+    compare_frames ile aynı ölçüyü (50x60 bin, HISTCMP_CORREL) kullanır ancak:
+    - Referans histogram yalnızca bir kez hesaplanır.
+    - Kareler `subsample` adımıyla seyreltilerek daha az piksel üzerinden histogram çıkarılır.
+    - score_batch ile çok sayıda kare tek bir vektörel çağrıda puanlanır.
+
+    Korelasyon, histogramların pozitif ölçeklenmesinden etkilenmediği için
+    NORM_MINMAX normalizasyonu gereksizdir; piksel sayısı azalsa da dağılım
+    korunduğundan 0.85 eşiği aynı anlamı taşır (subsample=1 ile birebir aynıdır).
+
+    Args:
+        reference_frame (np.ndarray): Referans BGR görüntü (ör. ilk karenin warp'ı).
+        subsample (int): Her eksende kaç pikselden birinin kullanılacağı.
+    """
+
+    H_BINS = 50
+    S_BINS = 60
+
+    def __init__(self, reference_frame, subsample=2):
+        self.subsample = max(1, int(subsample))
+        self.num_bins = self.H_BINS * self.S_BINS
+        self.ref_hist = self._centered(self._histograms([reference_frame]))[0]
+        self.ref_norm = np.sqrt(np.dot(self.ref_hist, self.ref_hist))
+
+    def _histograms(self, frames):
+        """Kareleri (B adet) tek cvtColor + tek bincount ile (B, 3000) histograma çevirir."""
+        step = self.subsample
+        frames = [np.ascontiguousarray(frame[::step, ::step]) for frame in frames]
+        height, width = frames[0].shape[:2]
+
+        # Aynı boyuttaki kareleri alt alta ekleyip renk dönüşümünü tek seferde yapıyoruz
+        hsv = cv2.cvtColor(np.concatenate(frames, axis=0), cv2.COLOR_BGR2HSV)
+        hsv = hsv.reshape(len(frames), height * width, 3)
+
+        # calcHist ile aynı bin sınırları: H [0,180) -> 50 bin, S [0,256) -> 60 bin
+        h_bins = hsv[..., 0].astype(np.int32) * self.H_BINS // 180
+        s_bins = hsv[..., 1].astype(np.int32) * self.S_BINS // 256
+        bin_idx = h_bins * self.S_BINS + s_bins
+        bin_idx += (np.arange(len(frames), dtype=np.int32) * self.num_bins)[:, None]
+
+        counts = np.bincount(bin_idx.ravel(), minlength=len(frames) * self.num_bins)
+        return counts.reshape(len(frames), self.num_bins).astype(np.float64)
+
+    @staticmethod
+    def _centered(hists):
+        return hists - hists.mean(axis=1, keepdims=True)
+
+    def score_batch(self, frames):
+        """Karelerin referansa benzerliğini (korelasyon) numpy dizisi olarak döndürür."""
+        if len(frames) == 0:
+            return np.empty(0)
+
+        hists = self._centered(self._histograms(frames))
+        norms = np.sqrt(np.einsum('ij,ij->i', hists, hists)) * self.ref_norm
+
+        dots = hists @ self.ref_hist
+        # Sabit histogram (ör. tamamen tek renk kare) için compare_frames gibi 1 döndür
+        return np.divide(dots, norms, out=np.ones_like(dots), where=norms > 0)
+
+    def score(self, frame):
+        """Tek bir karenin referansa benzerliği."""
+        return float(self.score_batch([frame])[0])
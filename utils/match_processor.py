@@ -1,81 +1,123 @@
+import csv
 import cv2
+import itertools
+import json
+import multiprocessing
 import os
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from .action_detector import TennisCourtDetector
+from .frame_similarity import HistogramSimilarity
+from .pipeline import FramePipeline
+from .video_utils import VideoSaver, VideoFrameSource
 
-def process_match(video_path, output_path):
+# Referansa benzerlik bu değerin üzerindeyse kare aksiyon sayılır
+ACTION_THRESHOLD = 0.85
+# Otomatik köşe tespitinin güveni bunun altındaysa köşeler elle seçtirilir
+MIN_CORNER_CONFIDENCE = 0.5
+# Kare kare taramada bu kadar kare tek score_batch çağrısıyla puanlanır
+SCORE_BATCH_SIZE = 16
+
+
+def _find_corners(detector, first_frame, auto_corners=False, min_corner_confidence=MIN_CORNER_CONFIDENCE,
+                  manual_fallback=True):
     """
-    Video içerisindeki aksiyon anlarını tespit eder ve sadece bu anları içeren yeni bir video oluşturur.
-    
-    Args:
-        video_path (str): Girdi video dosyasının yolu.
-        output_path (str): Çıktı video dosyasının kaydedileceği yol.
-        
+    İlk karede kort köşelerini bulur.
+
+    auto_corners=True ise köşeler önce arayüzsüz (headless) tespit edilir; güven
+    min_corner_confidence altındaysa ve manual_fallback açıksa köşeler elle
+    seçtirilir. Köşe bulunamazsa None döndürür.
+    """
+    if auto_corners:
+        corners, confidence = detector.detect_corners_auto(first_frame)
+        if corners is not None and confidence >= min_corner_confidence:
+            print(f"Köşeler otomatik bulundu (güven: {confidence:.2f})")
+            return corners
+        print(f"Otomatik köşe tespitinin güveni düşük ({confidence:.2f})")
+        if not manual_fallback:
+            return None
+
+    print("Lutfen acilan pencerede kortun 4 kosesini secin.")
+    return detector._select_corners_manually(first_frame)
+
+
+def _prepare_action_filter(video_path, analysis_size=(274, 594), subsample=2, auto_corners=False,
+                           min_corner_confidence=MIN_CORNER_CONFIDENCE, manual_fallback=True):
+    """
+    Videoyu açar, ilk karede köşeleri buldurur ve referans histogramı hazırlar.
+    analysis_size, benzerlik analizi için kullanılan kuş bakışı görüntünün boyutudur;
+    subsample, histogram hesaplanırken kullanılan piksel seyreltme adımıdır.
+    Köşe ayarları için bkz. _find_corners.
+
     Returns:
-        str: Oluşturulan videonun yolu.
+        tuple: (cap, detector, corners, similarity_engine) veya hata durumunda None.
     """
-    
     # GPU hızlandırmasını etkinleştir
     cv2.ocl.setUseOpenCL(True)
     print(f"OpenCL Enabled: {cv2.ocl.useOpenCL()}")
 
-    detector = TennisCourtDetector()
+    detector = TennisCourtDetector(analysis_size=analysis_size)
     cap = cv2.VideoCapture(video_path)
-    
+
     if not cap.isOpened():
         print(f"Error: Could not open video {video_path}")
         return None
 
-    # 1. İlk frame'i al ve manuel köşe seçimi yap
+    # 1. İlk frame'i al ve köşeleri bul (otomatik ya da manuel)
     ret, first_frame = cap.read()
     if not ret:
         print("Error: Could not read first frame")
+        cap.release()
         return None
-        
-    print("Lutfen acilan pencerede kortun 4 kosesini secin.")
-    corners = detector._select_corners_manually(first_frame)
-    
+
+    corners = _find_corners(detector, first_frame, auto_corners, min_corner_confidence, manual_fallback)
+
     if corners is None:
         print("Köşe seçimi iptal edildi veya başarısız.")
+        cap.release()
         return None
-        
+
     print("Köşeler seçildi, video işleniyor... (Bu işlem biraz zaman alabilir)")
-    
+
     # Referans görüntü oluştur (Aksiyon anı tespiti için)
-    # corners parametresi ile sabit köşe tespiti yapıyoruz
-    _, ref_warped, _, _ = detector.process_video_frame(first_frame, corners=corners)
-    
-    # Video yazıcı ayarları
-    fps = int(cap.get(cv2.CAP_PROP_FPS))
-    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-    
-    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-    out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
-    
+    # Sabit köşelerle önbellekli matris ve küçük analiz çözünürlüğü kullanıyoruz
+    ref_warped = detector.warp_for_analysis(first_frame, corners)
+    # Referans histogram bir kez hesaplanır, her karede tekrar hesaplanmaz
+    similarity_engine = HistogramSimilarity(ref_warped, subsample=subsample)
+
+    return cap, detector, corners, similarity_engine
+
+
+def _iter_action_frames(cap, detector, corners, similarity_engine):
+    """
+    Videonun kalan karelerini sırayla okur ve aksiyon olarak sınıflandırılanları
+    (frame_idx, frame) olarak üretir. frame_idx videodaki 0 tabanlı kare numarasıdır
+    (0. kare referans olarak kullanıldığı için sınıflandırılmaz).
+    """
     frame_count = 0
     action_frames = 0
     in_action = False
     action_start_frame = 0
-    
+
     while True:
-        ret, frame = cap.read()
-        if not ret:
+        # Kareler gruplar halinde okunur; kuş bakışı görüntüler tek score_batch çağrısıyla puanlanır
+        frames = []
+        while len(frames) < SCORE_BATCH_SIZE:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frames.append(frame)
+        if not frames:
             break
-            
-        frame_count += 1
-        
-        # Sabit köşelerle işle (Sadece benzerlik kontrolü için warped alıyoruz)
-        # corners parametresi burada da verilmeli
-        processed, warped, _, _ = detector.process_video_frame(frame, corners=corners)
-        
-        if warped is not None:
-            # Benzerlik kontrolü
-            similarity = detector.compare_frames(ref_warped, warped)
-            
+        # Sabit köşelerle hızlı yol (Sadece benzerlik kontrolü için küçük warped alıyoruz)
+        similarities = similarity_engine.score_batch([detector.warp_for_analysis(frame, corners) for frame in frames])
+
+        for frame, similarity in zip(frames, similarities.tolist()):
+            frame_count += 1
+
             # Eşik değer - Aksiyon mu?
-            is_current_action = similarity > 0.85
-            
+            is_current_action = similarity > ACTION_THRESHOLD
+
             # Durum değişikliği kontrolü ve loglama
             if is_current_action and not in_action:
                 print(f"[Frame {frame_count}] ACTION STARTED (Sim: {similarity:.2f})")
@@ -84,21 +126,544 @@ def process_match(video_path, output_path):
             elif not is_current_action and in_action:
                 duration = frame_count - action_start_frame
                 # Çok kısa aksiyonları loglamayabiliriz ama şimdilik kalsın
-                if duration > 10: 
+                if duration > 10:
                      print(f"[Frame {frame_count}] ACTION ENDED (Duration: {duration} frames)")
                 in_action = False
-            
+
             # Periyodik ilerleme göstergesi
             if frame_count % 500 == 0:
                 print(f"Processed {frame_count} frames...")
 
             if is_current_action:
-                out.write(frame) # Orijinal frame'i yaz
                 action_frames += 1
-                
+                yield frame_count, frame # Orijinal frame
+
+    print(f"Aksiyon filtreleme tamamlandı. Toplam {frame_count} kareden {action_frames} aksiyon karesi bulundu.")
+
+
+def _classify(similarity, in_action, hysteresis=0.0, threshold=ACTION_THRESHOLD):
+    # Histerezis: aksiyondan çıkmak için benzerliğin eşiğin belirgin şekilde altına inmesi gerekir
+    if in_action:
+        return similarity > threshold - hysteresis
+    return similarity > threshold
+
+
+def _add_run(runs, run_start, run_end, is_action, similarity_sum=0.0, similarity_count=0):
+    """Bölüm listesine [start, end, is_action, similarity_sum, similarity_count] ekler; bitişik aynı etiketlileri birleştirir."""
+    if run_end <= run_start:
+        return
+    if runs and runs[-1][2] == is_action and runs[-1][1] == run_start:
+        runs[-1][1] = run_end
+        runs[-1][3] += similarity_sum
+        runs[-1][4] += similarity_count
+    else:
+        runs.append([run_start, run_end, is_action, similarity_sum, similarity_count])
+
+
+class _SequentialSampler:
+    """Kaba örnekleri videodan ileri yönde okur; aradaki kareleri grab() ile (retrieve etmeden) atlar."""
+
+    def __init__(self, cap, score_frame, position):
+        self.cap = cap
+        self.score_frame = score_frame
+        self.position = position
+        self.end_position = None
+        self._recent = {}
+
+    def sample(self, frame_idx):
+        if frame_idx in self._recent:
+            return self._recent[frame_idx]
+        if self.end_position is not None:
+            return None
+
+        while self.position < frame_idx:
+            if not self.cap.grab():
+                self.end_position = self.position
+                return None
+            self.position += 1
+
+        ret, frame = self.cap.read()
+        if not ret:
+            self.end_position = self.position
+            return None
+        self.position += 1
+
+        similarity = self.score_frame(frame)
+        # Planlayıcı en fazla son okunan örneği tekrar ister
+        self._recent = {frame_idx: similarity}
+        return similarity
+
+
+class _PrecomputedSampler:
+    """Paralel olarak önceden hesaplanmış kaba örnekleri sunar."""
+
+    def __init__(self, similarities, end_position):
+        self.similarities = similarities
+        self.end_position = end_position
+
+    def sample(self, frame_idx):
+        return self.similarities.get(frame_idx)
+
+
+def _plan_action_scan(sampler, start=1, stride=1, hysteresis=0.0, min_segment_length=1):
+    """
+    Kaba örnekler üzerinde aksiyon karar makinesini yürütür.
+
+    Sadece start-1 + k*stride karelerindeki benzerlikler kullanılır. İki örneğin
+    kararı aynıysa aradaki kareler de aynı etiketi alır. Karar değiştiğinde o aralık
+    kare kare taranmak üzere ('refine') işaretlenir. Bir örnekte görülen değişim bir
+    sonraki örnekte geri dönüyorsa ve aradaki bölüm min_segment_length'ten kısaysa
+    (titreme) yoğun tarama yapılmaz.
+
+    Yoğun taramanın sonunda durum her zaman o örneğin kararına eşittir (son kare
+    örneğin kendisidir); bu yüzden plan, yoğun tarama sonuçları beklenmeden
+    çıkarılabilir ve yoğun taramalar birbirinden bağımsız (paralel) yapılabilir.
+
+    Returns:
+        list: ('run', [start, end, is_action, similarity_sum, similarity_count]) veya
+              ('refine', (start, end, initial_action)) elemanları, kare sırasıyla.
+    """
+    plan = []
+    runs = []
+    last_idx = start - 1
+    in_action = False
+    stride = max(1, stride)
+
+    def flush_runs():
+        plan.extend(('run', run) for run in runs)
+        runs.clear()
+
+    while True:
+        sample_idx = last_idx + stride
+        similarity = sampler.sample(sample_idx)
+        if similarity is None:
+            # Video bitti: atlanan kareler son durumla etiketlenir
+            _add_run(runs, last_idx + 1, sampler.end_position, in_action)
+            break
+
+        sample_action = _classify(similarity, in_action, hysteresis)
+        if sample_action == in_action or sample_idx == last_idx + 1:
+            _add_run(runs, last_idx + 1, sample_idx, in_action)
+            _add_run(runs, sample_idx, sample_idx + 1, sample_action, similarity, 1)
+            in_action = sample_action
+            last_idx = sample_idx
+            continue
+
+        # Karar değişti: önce bir sonraki örnekle bunun kısa bir titreme olup olmadığına bak
+        confirm_idx = sample_idx + stride
+        if confirm_idx - last_idx - 1 < min_segment_length:
+            confirm_similarity = sampler.sample(confirm_idx)
+            if confirm_similarity is not None and _classify(confirm_similarity, sample_action, hysteresis) == in_action:
+                _add_run(runs, last_idx + 1, confirm_idx, in_action)
+                _add_run(runs, confirm_idx, confirm_idx + 1, in_action, confirm_similarity, 1)
+                last_idx = confirm_idx
+                continue
+
+        flush_runs()
+        plan.append(('refine', (last_idx + 1, sample_idx + 1, in_action)))
+        in_action = sample_action
+        last_idx = sample_idx
+
+    flush_runs()
+    return plan
+
+
+def _refine_interval(cap, score_frame, interval, hysteresis=0.0):
+    """
+    Bir aralığa seek edip kareleri tek tek sınıflandırır; aralığın bölüm listesini döndürür.
+
+    Benzerlikler karara bağlı olmadığı için aralığın kuş bakışı görüntüleri tek
+    score_batch çağrısıyla puanlanır; sınıflandırma sonra sırayla yapılır.
+    """
+    range_start, range_end, in_action = interval
+    cap.set(cv2.CAP_PROP_POS_FRAMES, range_start)
+
+    warped_frames = []
+    for _ in range(range_start, range_end):
+        ret, frame = cap.read()
+        if not ret:
+            break
+        warped_frames.append(score_frame.warp(frame))
+
+    runs = []
+    for frame_idx, similarity in enumerate(score_frame.score_warped(warped_frames).tolist(), range_start):
+        in_action = _classify(similarity, in_action, hysteresis)
+        _add_run(runs, frame_idx, frame_idx + 1, in_action, similarity, 1)
+    return runs
+
+
+def _expand_plan(plan, refined_runs):
+    """Plandaki 'refine' elemanlarını yoğun tarama sonuçlarıyla değiştirip tek bir bölüm listesi üretir."""
+    runs = []
+    refined_runs = iter(refined_runs)
+    for kind, item in plan:
+        chunk = [item] if kind == 'run' else next(refined_runs)
+        for run in chunk:
+            _add_run(runs, *run)
+    return runs
+
+
+def _merge_short_runs(runs, min_segment_length):
+    """min_segment_length'ten kısa bölümleri bir önceki bölüme katar (kısa titremeleri temizler)."""
+    merged = []
+    for run in runs:
+        if merged and (run[1] - run[0] < min_segment_length or merged[-1][2] == run[2]):
+            merged[-1][1] = run[1]
+            merged[-1][3] += run[3]
+            merged[-1][4] += run[4]
+        else:
+            merged.append(list(run))
+    return merged
+
+
+def _runs_to_segments(runs):
+    """Aksiyon bölümlerini (start, end, mean_similarity) listesine çevirir."""
+    return [(run_start, run_end, run_sum / run_count if run_count else float('nan'))
+            for run_start, run_end, is_action, run_sum, run_count in runs if is_action]
+
+
+class _FrameScorer:
+    """Kareyi kuş bakışına çevirip referansa benzerliğini verir; warp ve toplu puanlama ayrıca kullanılabilir."""
+
+    def __init__(self, detector, corners, similarity_engine):
+        self.detector = detector
+        self.corners = corners
+        self.similarity_engine = similarity_engine
+
+    def warp(self, frame):
+        return self.detector.warp_for_analysis(frame, self.corners)
+
+    def score_warped(self, warped_frames):
+        return self.similarity_engine.score_batch(warped_frames)
+
+    def __call__(self, frame):
+        return float(self.score_warped([self.warp(frame)])[0])
+
+
+def _make_worker_scorer(corners, similarity_engine, analysis_size):
+    # Her süreç tek çekirdek kullansın; paralellik süreç sayısından gelir
+    cv2.setNumThreads(1)
+    cv2.ocl.setUseOpenCL(False)
+    return _FrameScorer(TennisCourtDetector(analysis_size=analysis_size), corners, similarity_engine)
+
+
+def _sample_chunk(video_path, corners, similarity_engine, analysis_size, first_sample, chunk_end, stride):
+    """
+    Worker süreci: parçanın başına seek edip [first_sample, chunk_end) içindeki
+    kaba örneklerin benzerliklerini hesaplar.
+
+    Returns:
+        tuple: ({frame_idx: similarity}, video sonuna gelindi mi, kare sayısı).
+               Kare sayısı sadece video sonu bu parçada en az bir örnek okunduktan
+               sonra görüldüyse kesin olarak bilinir; aksi halde None'dır.
+    """
+    score_frame = _make_worker_scorer(corners, similarity_engine, analysis_size)
+    cap = cv2.VideoCapture(video_path)
+    cap.set(cv2.CAP_PROP_POS_FRAMES, first_sample)
+    sampler = _SequentialSampler(cap, score_frame, first_sample)
+
+    similarities = {}
+    try:
+        for frame_idx in itertools.count(first_sample, stride):
+            if chunk_end is not None and frame_idx >= chunk_end:
+                break
+            similarity = sampler.sample(frame_idx)
+            if similarity is None:
+                break
+            similarities[frame_idx] = similarity
+    finally:
+        cap.release()
+
+    eof_reached = sampler.end_position is not None
+    end_position = sampler.end_position if eof_reached and similarities else None
+    return similarities, eof_reached, end_position
+
+
+def _count_frames_from(video_path, position):
+    """position karesinden video sonuna kadar grab() ile ilerleyip toplam kare sayısını döndürür."""
+    cap = cv2.VideoCapture(video_path)
+    cap.set(cv2.CAP_PROP_POS_FRAMES, position)
+    while cap.grab():
+        position += 1
+    cap.release()
+    return position
+
+
+def _refine_chunk(video_path, corners, similarity_engine, analysis_size, intervals, hysteresis):
+    """Worker süreci: kendisine düşen karar değişim aralıklarını kare kare tarar."""
+    score_frame = _make_worker_scorer(corners, similarity_engine, analysis_size)
+    cap = cv2.VideoCapture(video_path)
+    try:
+        return [_refine_interval(cap, score_frame, interval, hysteresis) for interval in intervals]
+    finally:
+        cap.release()
+
+
+def _split_evenly(items, num_parts):
+    size = max(1, -(-len(items) // num_parts))
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def _scan_parallel(video_path, corners, similarity_engine, analysis_size, frame_count, workers,
+                   stride, hysteresis, min_segment_length):
+    """
+    Videoyu zaman aralıklarına bölüp süreç havuzunda tarar; sonuç sıralı taramayla birebir aynıdır.
+
+    1. Her worker kendi parçasına seek eder ve kaba örnek (k*stride) benzerliklerini hesaplar.
+    2. Karar makinesi bu örnekler üzerinde sıralı ama çok ucuz şekilde yürütülür (_plan_action_scan).
+    3. Karar değişen aralıklar worker'lar arasında paylaştırılıp kare kare taranır.
+    """
+    stride = max(1, stride)
+    # Yük dengesi için çekirdek sayısından fazla parça; sınırlar örnekleme ızgarasına hizalı
+    num_chunks = max(1, workers * 4)
+    chunk_size = max(stride, (frame_count // num_chunks) // stride * stride)
+    chunk_starts = list(range(stride, max(frame_count, stride + 1), chunk_size))
+    chunk_ends = chunk_starts[1:] + [None] # Son parça video sonuna kadar okur
+
+    # fork, OpenCV'nin iç thread havuzlarıyla kilitlenebildiği için spawn kullanıyoruz
+    context = multiprocessing.get_context('spawn')
+    # Kısa videolarda parça sayısı süreç sayısından az olabilir; boşta süreç başlatılmaz
+    with ProcessPoolExecutor(max_workers=min(workers, len(chunk_starts)), mp_context=context) as executor:
+        chunk_results = list(executor.map(
+            _sample_chunk,
+            itertools.repeat(video_path), itertools.repeat(corners), itertools.repeat(similarity_engine),
+            itertools.repeat(analysis_size), chunk_starts, chunk_ends, itertools.repeat(stride)))
+
+        # CAP_PROP_FRAME_COUNT kesin olmayabilir; video sonu ilk EOF gören parçadan alınır
+        similarities = {}
+        end_position = None
+        for chunk_similarities, eof_reached, chunk_end_position in chunk_results:
+            similarities.update(chunk_similarities)
+            if eof_reached:
+                end_position = chunk_end_position
+                break
+        if end_position is None:
+            # EOF parçanın ilk örneğinden önce geldi: son örnekten itibaren kareleri say
+            end_position = _count_frames_from(video_path, max(similarities, default=0) + 1)
+
+        plan = _plan_action_scan(_PrecomputedSampler(similarities, end_position), start=1, stride=stride,
+                                 hysteresis=hysteresis, min_segment_length=min_segment_length)
+
+        intervals = [item for kind, item in plan if kind == 'refine']
+        groups = _split_evenly(intervals, num_chunks)
+        refined_groups = executor.map(
+            _refine_chunk,
+            itertools.repeat(video_path), itertools.repeat(corners), itertools.repeat(similarity_engine),
+            itertools.repeat(analysis_size), groups, itertools.repeat(hysteresis))
+        refined_runs = [runs for group in refined_groups for runs in group]
+
+    return _expand_plan(plan, refined_runs)
+
+
+def _find_action_segments(cap, video_path, detector, corners, similarity_engine, stride=1,
+                          hysteresis=0.0, min_segment_length=1, workers=1):
+    """
+    Aksiyon segmentlerini bulur. stride > 1 ise kaba-ince tarama, workers > 1 ise
+    çok süreçli tarama yapılır; her iki durumda da sonuç sıralı taramayla aynıdır.
+
+    Returns:
+        list: (start, end, mean_similarity) elemanlı aksiyon segmentleri ([start, end) kare aralığı).
+    """
+    if workers > 1:
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        runs = _scan_parallel(video_path, corners, similarity_engine, detector.analysis_size,
+                              frame_count, workers, stride, hysteresis, min_segment_length)
+    else:
+        score_frame = _FrameScorer(detector, corners, similarity_engine)
+
+        # 0. kare referans olarak okunduğu için tarama 1. kareden başlar
+        sampler = _SequentialSampler(cap, score_frame, position=1)
+        plan = _plan_action_scan(sampler, start=1, stride=stride, hysteresis=hysteresis,
+                                 min_segment_length=min_segment_length)
+        refined_runs = [_refine_interval(cap, score_frame, item, hysteresis)
+                        for kind, item in plan if kind == 'refine']
+        runs = _expand_plan(plan, refined_runs)
+
+    runs = _merge_short_runs(runs, min_segment_length)
+    segments = _runs_to_segments(runs)
+
+    for seg_start, seg_end, mean_similarity in segments:
+        print(f"[Frame {seg_start}-{seg_end}] ACTION (Duration: {seg_end - seg_start} frames, Sim: {mean_similarity:.2f})")
+    total_frames = runs[-1][1] if runs else 1
+    action_frames = sum(seg_end - seg_start for seg_start, seg_end, _ in segments)
+    print(f"Aksiyon filtreleme tamamlandı. Toplam {total_frames} kareden {action_frames} aksiyon karesi bulundu.")
+
+    return segments
+
+
+def _iter_segment_frames(video_path, segments):
+    """Segmentlerdeki kareleri orijinal videodan okuyup (frame_idx, frame) olarak üretir."""
+    frame_source = VideoFrameSource(video_path, segments=[(seg_start, seg_end) for seg_start, seg_end, _ in segments])
+    frame_indices = itertools.chain.from_iterable(range(seg_start, seg_end) for seg_start, seg_end, _ in segments)
+    return zip(frame_indices, frame_source)
+
+
+SEGMENT_INDEX_FIELDS = ('start_frame', 'end_frame', 'start_time', 'end_time', 'mean_similarity')
+
+
+def save_segment_index(segments, fps, path, video_path=None, corners=None):
+    """
+    Aksiyon segmentlerini dosyaya yazar; biçim uzantıdan seçilir (.json veya .csv).
+
+    Her segment [start_frame, end_frame) aralığı, saniye cinsinden zaman damgaları
+    ve ortalama benzerlik ile kaydedilir. JSON çıktısı ayrıca fps, kaynak video ve
+    seçilen köşeleri içerir; böylece sonraki aşamalar doğrudan orijinal videoda
+    bu aralıklara atlayabilir.
+    """
+    rows = [{
+        'start_frame': int(seg_start),
+        'end_frame': int(seg_end),
+        'start_time': round(seg_start / fps, 3) if fps else None,
+        'end_time': round(seg_end / fps, 3) if fps else None,
+        'mean_similarity': round(float(mean_similarity), 4),
+    } for seg_start, seg_end, mean_similarity in segments]
+
+    if path.lower().endswith('.csv'):
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=SEGMENT_INDEX_FIELDS)
+            writer.writeheader()
+            writer.writerows(rows)
+    else:
+        index = {
+            'video': video_path,
+            'fps': fps,
+            'corners': [[int(x), int(y)] for x, y in corners] if corners is not None else None,
+            'segments': rows,
+        }
+        with open(path, 'w') as f:
+            json.dump(index, f, indent=2)
+
+    print(f"Segment indeksi: {path} ({len(rows)} segment)")
+    return path
+
+
+def _uses_segment_scan(stride, hysteresis, min_segment_length, workers):
+    return stride > 1 or hysteresis > 0 or min_segment_length > 1 or workers > 1
+
+
+def open_action_stream(video_path, filtered_output_path=None, analysis_size=(274, 594), subsample=2,
+                       stride=1, hysteresis=0.0, min_segment_length=1, workers=1, auto_corners=False,
+                       min_corner_confidence=MIN_CORNER_CONFIDENCE, manual_fallback=True):
+    """
+    Aksiyon filtresini tek geçişli (fused) pipeline için akış olarak açar.
+
+    Aksiyon olarak sınıflandırılan kareler ara bir videoya yazılıp tekrar
+    okunmak yerine doğrudan bellekte çağırana verilir. Ara video yalnızca
+    `filtered_output_path` verilirse yazılır.
+
+    Args:
+        video_path (str): Girdi video dosyasının yolu.
+        filtered_output_path (str, optional): Aksiyon karelerinin ayrıca kaydedileceği yol.
+        analysis_size (tuple): Benzerlik analizi için kuş bakışı görüntünün boyutu.
+        subsample (int): Histogram hesabında piksel seyreltme adımı.
+        stride (int): Kaba taramada kaç karede bir sınıflandırma yapılacağı (1 = her kare).
+        hysteresis (float): Aksiyondan çıkış eşiğinin 0.85'in ne kadar altında olacağı.
+        min_segment_length (int): Bundan kısa aksiyon/boşluk bölümleri komşusuna katılır.
+        workers (int): 1'den büyükse video parçalara bölünüp bu kadar süreçte paralel taranır.
+        auto_corners (bool): Köşeler arayüzsüz otomatik tespit edilsin mi.
+        min_corner_confidence (float): Otomatik köşelerin kabul edileceği en düşük güven.
+        manual_fallback (bool): Güven düşükse köşeler elle seçtirilsin mi (False: işlem iptal).
+
+    Returns:
+        tuple: (corners, fps, frames, segments) - frames, (frame_idx, frame) üreten bir
+               generator'dır. segments, kaba-ince taramada kareler okunmadan önce bulunan
+               (start, end, mean_similarity) aralıklarıdır; tek geçişli filtrede None.
+               Hata durumunda None.
+    """
+    prepared = _prepare_action_filter(video_path, analysis_size, subsample, auto_corners,
+                                      min_corner_confidence, manual_fallback)
+    if prepared is None:
+        return None
+
+    cap, detector, corners, similarity_engine = prepared
+    fps = cap.get(cv2.CAP_PROP_FPS)
+
+    if _uses_segment_scan(stride, hysteresis, min_segment_length, workers):
+        # Kaba-ince tarama önce segmentleri bulur, kareler sonra orijinal videodan okunur
+        segments = _find_action_segments(cap, video_path, detector, corners, similarity_engine,
+                                         stride, hysteresis, min_segment_length, workers)
+        cap.release()
+        action_frames = _iter_segment_frames(video_path, segments)
+    else:
+        segments = None
+        action_frames = _iter_action_frames(cap, detector, corners, similarity_engine)
+
+    def frames():
+        saver = VideoSaver(filtered_output_path, fps) if filtered_output_path else None
+        try:
+            for frame_idx, frame in action_frames:
+                if saver is not None:
+                    saver.write(frame)
+                yield frame_idx, frame
+        finally:
+            cap.release()
+            if saver is not None:
+                saver.release()
+                print(f"Filtrelenmiş video: {filtered_output_path}")
+
+    return corners, fps, frames(), segments
+
+
+def process_match(video_path, output_path=None, analysis_size=(274, 594), subsample=2,
+                  stride=1, hysteresis=0.0, min_segment_length=1, workers=1, segment_index_path=None,
+                  auto_corners=False, min_corner_confidence=MIN_CORNER_CONFIDENCE, manual_fallback=True):
+    """
+    Video içerisindeki aksiyon anlarını tespit eder ve sadece bu anları içeren yeni bir video oluşturur.
+
+    segment_index_path verilirse aksiyon aralıkları ayrıca JSON/CSV indeks olarak
+    yazılır. output_path None ise video hiç kodlanmaz; bulunan aralıklar döndürülür
+    ve sonraki aşamalar bunları orijinal videodan okuyabilir.
+
+    Args:
+        video_path (str): Girdi video dosyasının yolu.
+        output_path (str, optional): Çıktı video dosyasının kaydedileceği yol.
+        analysis_size (tuple): Benzerlik analizi için kuş bakışı görüntünün boyutu.
+        subsample (int): Histogram hesabında piksel seyreltme adımı.
+        stride (int): Kaba taramada kaç karede bir sınıflandırma yapılacağı (1 = her kare).
+        hysteresis (float): Aksiyondan çıkış eşiğinin 0.85'in ne kadar altında olacağı.
+        min_segment_length (int): Bundan kısa aksiyon/boşluk bölümleri komşusuna katılır.
+        workers (int): 1'den büyükse video parçalara bölünüp bu kadar süreçte paralel taranır.
+        segment_index_path (str, optional): Segment indeksinin yazılacağı .json veya .csv yolu.
+        auto_corners (bool): Köşeler arayüzsüz otomatik tespit edilsin mi.
+        min_corner_confidence (float): Otomatik köşelerin kabul edileceği en düşük güven.
+        manual_fallback (bool): Güven düşükse köşeler elle seçtirilsin mi (False: işlem iptal).
+
+    Returns:
+        tuple: (output_path, corners, segments) - video yazılmadıysa output_path None'dır.
+               segments (start, end, mean_similarity) listesidir; aralıklar ayrıca
+               taranmadan tek geçişte filtrelendiyse None'dır. Hata durumunda None.
+    """
+    prepared = _prepare_action_filter(video_path, analysis_size, subsample, auto_corners,
+                                      min_corner_confidence, manual_fallback)
+    if prepared is None:
+        return None
+
+    cap, detector, corners, similarity_engine = prepared
+
+    # Segment zaman damgaları ve video yazıcı için
+    fps = cap.get(cv2.CAP_PROP_FPS)
+
+    if segment_index_path is not None or output_path is None or \
+            _uses_segment_scan(stride, hysteresis, min_segment_length, workers):
+        segments = _find_action_segments(cap, video_path, detector, corners, similarity_engine,
+                                         stride, hysteresis, min_segment_length, workers)
+        cap.release()
+        if segment_index_path is not None:
+            save_segment_index(segments, fps, segment_index_path, video_path, corners)
+        if output_path is None:
+            return None, corners, segments
+        action_frames = _iter_segment_frames(video_path, segments)
+    else:
+        segments = None
+        action_frames = _iter_action_frames(cap, detector, corners, similarity_engine)
+
+    # Okuma/filtreleme ve kodlama ayrı iş parçacıklarında, sınırlı bir kuyrukla çalışır
+    with VideoSaver(output_path, fps) as saver:
+        pipeline = FramePipeline(action_frames, [('encode', lambda item: saver.write(item[1]))]) # Orijinal frame'i yaz
+        pipeline.run()
+    pipeline.print_report()
+
     cap.release()
-    out.release()
-    print(f"Aksiyon filtreleme tamamlandı. Toplam {frame_count} kareden {action_frames} aksiyon karesi kaydedildi.")
     print(f"Filtrelenmiş video: {output_path}")
-    
-    return output_path, corners
+
+    return output_path, corners, segments
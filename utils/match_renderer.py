@@ -0,0 +1,38 @@
+class MatchRenderer:
+    """
+    Tüm katmanları (oyuncu kutuları, top kutusu, mini kort ve ısı haritası) her
+    kareye tek seferde, kare üzerinde yerinde çizen birleşik çizici.
+
+    Kareler akış halinde gelir ve çizildikten hemen sonra kodlayıcıya verilir;
+    ara kare listesi ya da katman başına ayrı bir geçiş yoktur.
+
+    Args:
+        player_tracker: Kutuları çizmek için draw_frame metodu olan oyuncu takipçisi.
+        ball_tracker: Kutuları çizmek için draw_frame metodu olan top takipçisi.
+        player_detections (DetectionStore): Oyuncu tespitleri.
+        ball_detections (DetectionStore): Top tespitleri.
+        mini_court (MiniCourt, optional): set_heatmap ile hazırlanmış mini kort.
+    """
+
+    def __init__(self, player_tracker, ball_tracker, player_detections, ball_detections, mini_court=None):
+        self.player_tracker = player_tracker
+        self.ball_tracker = ball_tracker
+        self.player_detections = player_detections
+        self.ball_detections = ball_detections
+        self.mini_court = mini_court
+
+    def __len__(self):
+        # Tespiti olmayan karelerden sonrası çizilmez (eski draw_bboxes zinciriyle aynı)
+        return min(len(self.player_detections), len(self.ball_detections))
+
+    def render_frame(self, frame, frame_idx):
+        """frame_idx karesinin tüm katmanlarını kare üzerine yerinde çizer."""
+        track_ids, boxes, _ = self.player_detections.frame(frame_idx)
+        self.player_tracker.draw_frame(frame, track_ids, boxes)
+
+        track_ids, boxes, _ = self.ball_detections.frame(frame_idx)
+        self.ball_tracker.draw_frame(frame, track_ids, boxes)
+
+        if self.mini_court is not None:
+            self.mini_court.draw_heatmap_frame(frame, frame_idx)
+        return frame
@@ -1,7 +1,14 @@
 import cv2
 import numpy as np
+from .bounce_heatmap import BounceHeatmap
+from .court_projector import CourtProjector, COURT_WIDTH_METERS, COURT_LENGTH_METERS
 
 class MiniCourt:
+    # Mini kort ROI'sinin kutu dışındaki payı (kenar çizgisi kalınlığı)
+    SPRITE_MARGIN = 2
+    # Isı haritasının en yoğun noktadaki saydamlığı
+    HEATMAP_ALPHA = 0.6
+
     def __init__(self, frame):
         self.drawing_rectangle_width = 250
         self.drawing_rectangle_height = 550
@@ -12,9 +19,12 @@ class MiniCourt:
         self.set_mini_court_position()
         self.set_court_drawing_key_points()
         self.set_court_lines()
+        self.set_court_sprite(frame)
+
+        # Görüntü -> metre homografisi köşe seti başına bir kez hesaplanır
+        self.projector = CourtProjector()
 
     def set_canvas_background_box_position(self, frame):
-        frame = frame.copy()
         self.end_x = frame.shape[1] - self.buffer
         self.end_y = self.buffer + self.drawing_rectangle_height
         self.start_x = self.end_x - self.drawing_rectangle_width
@@ -70,53 +80,111 @@ class MiniCourt:
         
         return (int(x_pixel), int(y_pixel))
 
-    def draw_mini_court(self, frames):
-        output_frames = []
-        for frame in frames:
-            frame = frame.copy()
-            
+    def meters_to_mini_court(self, points_meters):
+        """(N, 2) metre koordinatlarını (N, 2) mini kort piksellerine çevirir (normalize_to_mini_court'un vektörel hali)."""
+        points_meters = np.asarray(points_meters, dtype=np.float64).reshape(-1, 2)
+        scale = np.array([self.court_drawing_width / COURT_WIDTH_METERS,
+                          self.court_drawing_height / COURT_LENGTH_METERS])
+        origin = np.array([self.court_start_x, self.court_start_y])
+        return (origin + points_meters * scale).astype(int)
+
+    def project(self, points, corners):
+        """
+        Görüntüdeki (N, 2) noktaları (ör. tüm top ve oyuncu ayak konumları) tek seferde dönüştürür.
+
+        Returns:
+            tuple: (metre koordinatları (N, 2), mini kort pikselleri (N, 2) int)
+        """
+        points_meters = self.projector.to_meters(points, corners)
+        return points_meters, self.meters_to_mini_court(points_meters)
+
+    def court_primitives(self):
+        """
+        Mini kortun statik çizim adımlarını sırayla döndürür:
+        ('rectangle' | 'line', pt1, pt2, color, thickness).
+        """
+        primitives = [
             # Draw background
-            cv2.rectangle(frame, (self.start_x, self.start_y), (self.end_x, self.end_y), (255, 255, 255), -1)
-            cv2.rectangle(frame, (self.start_x, self.start_y), (self.end_x, self.end_y), (0, 0, 0), 2)
-            
+            ('rectangle', (self.start_x, self.start_y), (self.end_x, self.end_y), (255, 255, 255), -1),
+            ('rectangle', (self.start_x, self.start_y), (self.end_x, self.end_y), (0, 0, 0), 2),
             # Draw Court Lines
             # Outer boundary
-            cv2.rectangle(frame, (self.court_start_x, self.court_start_y), (self.court_end_x, self.court_end_y), (0, 0, 0), 2)
-            
-            # Net (Center)
-            net_y = int(self.court_start_y + self.court_drawing_height / 2)
-            cv2.line(frame, (self.court_start_x, net_y), (self.court_end_x, net_y), (255, 0, 0), 2)
-            
-            # Half Court Line (Vertical Center) - only between service lines
-            center_x = int(self.court_start_x + self.court_drawing_width / 2)
-            service_line_top_y = int(self.court_start_y + self.court_drawing_height * (5.5/23.77)) # Approx 5.5m from end
-            service_line_bottom_y = int(self.court_end_y - self.court_drawing_height * (5.5/23.77))
-            
-            # Service Lines
-            # Top Service Line
-            # Service boxes are 6.4m from the net
-            # So 11.885 - 6.4 = 5.485m from baseline
-            
-            dist_from_baseline_param = 5.485 / 23.77
-            service_y_top = int(self.court_start_y + self.court_drawing_height * dist_from_baseline_param)
-            service_y_bottom = int(self.court_end_y - self.court_drawing_height * dist_from_baseline_param)
-            
-            cv2.line(frame, (self.court_start_x, service_y_top), (self.court_end_x, service_y_top), (0, 0, 0), 2)
-            cv2.line(frame, (self.court_start_x, service_y_bottom), (self.court_end_x, service_y_bottom), (0, 0, 0), 2)
-            
-            # Center Service Line
-            cv2.line(frame, (center_x, service_y_top), (center_x, service_y_bottom), (0, 0, 0), 2)
-            
-            # Singles Sidelines
-            # 1.37m from doubles sideline
-            single_margin_param = 1.37 / 10.97
-            single_x_left = int(self.court_start_x + self.court_drawing_width * single_margin_param)
-            single_x_right = int(self.court_end_x - self.court_drawing_width * single_margin_param)
-            
-            cv2.line(frame, (single_x_left, self.court_start_y), (single_x_left, self.court_end_y), (0, 0, 0), 2)
-            cv2.line(frame, (single_x_right, self.court_start_y), (single_x_right, self.court_end_y), (0, 0, 0), 2)
-            
-            output_frames.append(frame)
+            ('rectangle', (self.court_start_x, self.court_start_y), (self.court_end_x, self.court_end_y), (0, 0, 0), 2),
+        ]
+
+        # Net (Center)
+        net_y = int(self.court_start_y + self.court_drawing_height / 2)
+        primitives.append(('line', (self.court_start_x, net_y), (self.court_end_x, net_y), (255, 0, 0), 2))
+
+        # Half Court Line (Vertical Center) - only between service lines
+        center_x = int(self.court_start_x + self.court_drawing_width / 2)
+
+        # Service Lines
+        # Service boxes are 6.4m from the net
+        # So 11.885 - 6.4 = 5.485m from baseline
+        dist_from_baseline_param = 5.485 / 23.77
+        service_y_top = int(self.court_start_y + self.court_drawing_height * dist_from_baseline_param)
+        service_y_bottom = int(self.court_end_y - self.court_drawing_height * dist_from_baseline_param)
+
+        primitives.append(('line', (self.court_start_x, service_y_top), (self.court_end_x, service_y_top), (0, 0, 0), 2))
+        primitives.append(('line', (self.court_start_x, service_y_bottom), (self.court_end_x, service_y_bottom), (0, 0, 0), 2))
+
+        # Center Service Line
+        primitives.append(('line', (center_x, service_y_top), (center_x, service_y_bottom), (0, 0, 0), 2))
+
+        # Singles Sidelines
+        # 1.37m from doubles sideline
+        single_margin_param = 1.37 / 10.97
+        single_x_left = int(self.court_start_x + self.court_drawing_width * single_margin_param)
+        single_x_right = int(self.court_end_x - self.court_drawing_width * single_margin_param)
+
+        primitives.append(('line', (single_x_left, self.court_start_y), (single_x_left, self.court_end_y), (0, 0, 0), 2))
+        primitives.append(('line', (single_x_right, self.court_start_y), (single_x_right, self.court_end_y), (0, 0, 0), 2))
+        return primitives
+
+    def set_court_sprite(self, frame):
+        """
+        Statik mini kortu bir kez küçük bir görüntüye (sprite) ve maskesine çizer.
+
+        Sprite, mini kort kutusunu ve kenar çizgisinin taşabileceği payı kapsayan
+        ROI kadardır; her karede sadece bu bölge güncellenir.
+        """
+        height, width = frame.shape[:2]
+        margin = self.SPRITE_MARGIN
+        self.roi_x0, self.roi_y0 = max(self.start_x - margin, 0), max(self.start_y - margin, 0)
+        self.roi_x1 = min(self.end_x + margin + 1, width)
+        self.roi_y1 = min(self.end_y + margin + 1, height)
+
+        # Isı haritası mini kort kutusunun kareye sığan kısmını kaplar
+        self.heatmap_x0, self.heatmap_y0 = max(self.start_x, 0), max(self.start_y, 0)
+        self.heatmap_x1, self.heatmap_y1 = min(self.end_x + 1, width), min(self.end_y + 1, height)
+
+        roi_shape = (self.roi_y1 - self.roi_y0, self.roi_x1 - self.roi_x0)
+        self.court_sprite = np.zeros(roi_shape + (3,), dtype=np.uint8)
+        self.court_mask = np.zeros(roi_shape, dtype=np.uint8)
+
+        # Aynı çizimler maskeye de yapılır; maskede 0 kalan pikseller kareden gelir
+        offset = np.array([self.roi_x0, self.roi_y0])
+        for shape, pt1, pt2, color, thickness in self.court_primitives():
+            draw = cv2.rectangle if shape == 'rectangle' else cv2.line
+            pt1, pt2 = tuple(int(v) for v in pt1 - offset), tuple(int(v) for v in pt2 - offset)
+            draw(self.court_sprite, pt1, pt2, color, thickness)
+            draw(self.court_mask, pt1, pt2, 255, thickness)
+        self.court_mask = self.court_mask.astype(bool)
+
+    def court_roi(self, frame):
+        """Karenin mini kort bölgesine ait görünüm (view); üzerine çizim kareyi değiştirir."""
+        return frame[self.roi_y0:self.roi_y1, self.roi_x0:self.roi_x1]
+
+    def paste_court(self, frame):
+        """Önceden çizilmiş mini kortu karenin sadece ROI'sine yerinde kopyalar."""
+        np.copyto(self.court_roi(frame), self.court_sprite, where=self.court_mask[..., None])
+        return frame
+
+    def draw_mini_court(self, frames):
+        output_frames = []
+        for frame in frames:
+            output_frames.append(self.paste_court(frame.copy()))
         return output_frames
 
     def get_start_point_of_mini_court(self):
@@ -140,87 +208,85 @@ class MiniCourt:
     def get_mini_court_coordinates(self, object_position, corners):
         """
         Görüntü üzerindeki pozisyonu mini kort koordinatlarına çevirir.
-        
+        Çok sayıda nokta için project() kullanılmalıdır.
+
         Args:
             object_position (tuple): (x, y) coordinates on the screen.
             corners (np.array): 4 corners of the court in the image (screen coordinates).
                                 Order: top-left, top-right, bottom-right, bottom-left
         """
-        corners = corners.astype(np.float32)
-        
-        # Real world dimensions (meters)
-        # Using the standard tennis court dimensions
-        # Width: 10.97m
-        # Length: 23.77m
-        court_width = 10.97
-        court_length = 23.77
-        
-        # Destination points in real world (meters)
-        # We map image to (0,0) -> (width, length) space
-        dst_points = np.float32([
-            [0, 0],              # Top-Left
-            [court_width, 0],    # Top-Right
-            [court_width, court_length], # Bottom-Right
-            [0, court_length]    # Bottom-Left
-        ])
-        
-        # Get Homography Matrix using the detected corners
-        matrix = cv2.getPerspectiveTransform(corners, dst_points)
-        
-        # Transform the object position
-        point = np.array([object_position], dtype=np.float32)
-        point = np.array([point]) # Needs shape (1, 1, 2)
-        
-        transformed_point = cv2.perspectiveTransform(point, matrix)[0][0]
-        
-        # Transformed point is in meters relative to top-left court corner
-        
-        # Now convert meters to mini-court pixels
-        mini_court_point = self.normalize_to_mini_court(transformed_point)
-        
-        return mini_court_point
+        _, mini_court_points = self.project([object_position], corners)
+        return tuple(int(v) for v in mini_court_points[0])
+
+    def _composite_heatmap(self, heatmap):
+        """Isı haritasını statik kort sprite'ının kutu bölgesine karıştırır (sadece harita değişince)."""
+        composite = self.court_sprite.copy()
+        box = composite[self.heatmap_y0 - self.roi_y0:self.heatmap_y1 - self.roi_y0,
+                        self.heatmap_x0 - self.roi_x0:self.heatmap_x1 - self.roi_x0]
+        alpha = (heatmap.alpha * self.HEATMAP_ALPHA)[..., None]
+        box[:] = (box * (1 - alpha) + heatmap.colors * alpha).astype(np.uint8)
+        return composite
 
-    def draw_heatmap(self, frames, bounce_points, corners):
+    def set_heatmap(self, bounce_points, corners, bounce_frames=None, half_life=None):
         """
-        Her karede mini kortu ve tüm sekme noktalarını içeren ısı haritası benzeri noktaları çizer.
+        Isı haritası çizimini hazırlar; kareler daha sonra sırayla draw_heatmap_frame ile çizilir.
+
+        Args:
+            bounce_points (np.ndarray): Görüntüdeki (N, 2) sekme noktaları.
+            corners (np.ndarray): Kortun görüntüdeki 4 köşesi.
+            bounce_frames (list, optional): Her sekmenin gerçekleştiği kare (frames içindeki sıra).
+            half_life (float, optional): Sekmelerin yoğunluğunun yarıya indiği kare sayısı.
         """
-        output_frames = []
-        
-        # Convert all bounce points to mini court coordinates first
-        mini_court_bounces = []
-        for point in bounce_points:
-            mc_point = self.get_mini_court_coordinates(point, corners)
-            mini_court_bounces.append(mc_point)
-            
-        for frame in frames:
-            # First draw the mini court board
-            # In draw_mini_court logic, the background is redrawn every time
-            # We can reuse draw_mini_court but it processes list
-            # Let's simplify and draw directly here since we usually want to overlay tracking AND heatmap
-            
-            # Assuming 'draw_mini_court' was already called or we call it per frame
-            # Let's assume we modify the frame directly
-            
-            # Background
-            cv2.rectangle(frame, (self.start_x, self.start_y), (self.end_x, self.end_y), (255, 255, 255), -1)
-            cv2.rectangle(frame, (self.start_x, self.start_y), (self.end_x, self.end_y), (0, 0, 0), 2)
-            
-            # Draw empty court first
-            dummy_frames = self.draw_mini_court([frame])
-            frame = dummy_frames[0]
-            
-            # Draw Bounce Points (Heatmap style)
-            # We will draw semi-transparent circles
-            overlay = frame.copy()
-            for point in mini_court_bounces:
-                # Check if point is inside drawing area (roughly)
-                if (self.start_x < point[0] < self.end_x) and (self.start_y < point[1] < self.end_y):
-                    cv2.circle(overlay, point, 10, (0, 0, 255), -1) # Red dots for bounces
-            
-            # Apply transparency
-            alpha = 0.6
-            frame = cv2.addWeighted(overlay, alpha, frame, 1 - alpha, 0)
-            
-            output_frames.append(frame)
-            
-        return output_frames
+        # Convert all bounce points to mini court coordinates first (tek vektörel çağrı)
+        _, mini_court_bounces = self.project(bounce_points, corners)
+        # Isı haritası ızgarası mini kort kutusunun kareye sığan kısmını kaplar
+        grid_bounces = mini_court_bounces - (self.heatmap_x0, self.heatmap_y0)
+
+        if bounce_frames is None:
+            bounce_frames = np.zeros(len(grid_bounces), dtype=int)
+        bounce_frames = np.asarray(bounce_frames, dtype=int)
+        order = np.argsort(bounce_frames, kind='stable')
+        self._grid_bounces, self._bounce_frames = grid_bounces[order], bounce_frames[order]
+
+        self.heatmap = BounceHeatmap((self.heatmap_y1 - self.heatmap_y0, self.heatmap_x1 - self.heatmap_x0),
+                                     half_life=half_life)
+        self._heatmap_composite = None
+        self._next_bounce = 0
+        self._heatmap_frame = -1
+
+    def draw_heatmap_frame(self, frame, frame_idx):
+        """
+        Mini kortu ve frame_idx karesine kadar gerçekleşen sekmelerin ısı haritasını
+        karenin mini kort ROI'sine yerinde çizer. Kareler artan sırada verilmelidir.
+        """
+        if frame_idx > self._heatmap_frame >= 0:
+            self.heatmap.advance(frame_idx - self._heatmap_frame)
+        self._heatmap_frame = frame_idx
+
+        # Bu kareye kadar gerçekleşen yeni sekmeleri ekle
+        first_bounce = self._next_bounce
+        while self._next_bounce < len(self._bounce_frames) and self._bounce_frames[self._next_bounce] <= frame_idx:
+            self._next_bounce += 1
+        if self._next_bounce > first_bounce:
+            self.heatmap.add(self._grid_bounces[first_bounce:self._next_bounce])
+
+        if self.heatmap.render() or self._heatmap_composite is None:
+            self._heatmap_composite = self._composite_heatmap(self.heatmap)
+
+        np.copyto(self.court_roi(frame), self._heatmap_composite, where=self.court_mask[..., None])
+        return frame
+
+    def draw_heatmap(self, frames, bounce_points, corners, bounce_frames=None, half_life=None):
+        """
+        Her karede mini kortu ve o kareye kadar gerçekleşen sekmelerin yoğunluk ısı haritasını çizer.
+        Kareler akış halinde işlenir ve çizilen her kare yield edilir.
+
+        Sekmeler BounceHeatmap biriktiricisine gerçekleştikleri karede eklenir
+        (bounce_frames verilmezse hepsi ilk karede). Harita sadece değiştiğinde
+        kort sprite'ı ile birleştirilir; her karede bu hazır görüntü mini kort
+        ROI'sine yerinde kopyalanır. Böylece çizim maliyeti kare çözünürlüğünden
+        ve sekme sayısından bağımsızdır.
+        """
+        self.set_heatmap(bounce_points, corners, bounce_frames, half_life)
+        for frame_idx, frame in enumerate(frames):
+            yield self.draw_heatmap_frame(frame, frame_idx)
@@ -0,0 +1,197 @@
+import queue
+import threading
+import time
+
+_END = object()
+
+
+class _Stage:
+    def __init__(self, name, fn, workers=1):
+        self.name = name
+        self.fn = fn
+        self.workers = workers
+        self.busy_time = 0.0
+        self.items = 0
+        self._lock = threading.Lock()
+
+    def account(self, busy_time):
+        with self._lock:
+            self.busy_time += busy_time
+            self.items += 1
+
+
+class _OrderedReader:
+    """Kuyruktan (sıra_no, öğe) çiftlerini sıra numarasına göre, sırayla okur."""
+
+    def __init__(self, source_queue, stop_event):
+        self.queue = source_queue
+        self.stop_event = stop_event
+        self.pending = {}
+        self.next_seq = 0
+        self.ended = False
+        self._lock = threading.Lock()
+
+    def get(self):
+        """Sıradaki (sıra_no, öğe) çiftini döndürür; akış bittiyse ya da durdurulduysa _END."""
+        with self._lock:
+            while True:
+                if self.next_seq in self.pending:
+                    item = self.pending.pop(self.next_seq)
+                    self.next_seq += 1
+                    return self.next_seq - 1, item
+                if self.ended or self.stop_event.is_set():
+                    return _END
+
+                try:
+                    seq, item = self.queue.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                if item is _END:
+                    self.ended = True
+                else:
+                    self.pending[seq] = item
+
+
+class FramePipeline:
+    """
+    Kare akışını birbirine sınırlı kuyruklarla bağlı iş parçacıklarında işleyen boru hattı.
+
+    Kaynak (ör. VideoFrameSource, decode) kendi iş parçacığında okunur, her aşama
+    (ör. çıkarım, çizim, kodlama) kendi iş parçacığında / iş parçacıklarında
+    çalışır. OpenCV'nin decode/encode çağrıları ve PyTorch çıkarımı GIL'i
+    bıraktığı için aşamalar gerçekten eş zamanlı ilerler. Kuyruklar `queue_size`
+    ile sınırlıdır: yavaş bir aşama öncekileri bekletir (backpressure), bellek
+    kullanımı sabit kalır. Birden fazla işçili aşamalarda bile çıktılar kaynak
+    sırasıyla iletilir.
+
+    Son aşamanın çıktıları pipeline üzerinde dolaşılarak sırayla alınır. Akış
+    bitince report() her aşamanın meşgul kalma oranını verir; oranı en yüksek
+    aşama darboğazdır.
+
+    Args:
+        source: Öğeleri üreten iterable.
+        stages (list): (isim, fonksiyon) ya da (isim, fonksiyon, işçi_sayısı) demetleri.
+            Durum tutan aşamalar (ör. takip yapan modeller) tek işçiyle çalışmalıdır.
+        queue_size (int): Aşamalar arası her kuyruğun kapasitesi.
+        source_name (str): Raporda kaynak aşamasının adı.
+    """
+
+    def __init__(self, source, stages, queue_size=8, source_name='decode'):
+        self.source = source
+        self.source_stage = _Stage(source_name, None)
+        self.stages = [_Stage(*stage) for stage in stages]
+        self.queue_size = queue_size
+        self.elapsed = 0.0
+
+    def _put(self, target_queue, item, stop_event):
+        while not stop_event.is_set():
+            try:
+                target_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _read_source(self, output_queue, stop_event, errors):
+        seq = 0
+        try:
+            iterator = iter(self.source)
+            while not stop_event.is_set():
+                start = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+                self.source_stage.account(time.perf_counter() - start)
+                if not self._put(output_queue, (seq, item), stop_event):
+                    return
+                seq += 1
+        except BaseException as error:
+            errors.append(error)
+            stop_event.set()
+        finally:
+            self._put(output_queue, (seq, _END), stop_event)
+
+    def _run_stage(self, stage, reader, output_queue, stop_event, errors, remaining):
+        try:
+            while True:
+                entry = reader.get()
+                if entry is _END:
+                    break
+                seq, item = entry
+
+                start = time.perf_counter()
+                result = stage.fn(item)
+                stage.account(time.perf_counter() - start)
+
+                if not self._put(output_queue, (seq, result), stop_event):
+                    return
+        except BaseException as error:
+            errors.append(error)
+            stop_event.set()
+        finally:
+            # Aşamanın son işçisi akışın bittiğini bir sonraki aşamaya bildirir
+            with remaining['lock']:
+                remaining['count'] -= 1
+                is_last = remaining['count'] == 0
+            if is_last:
+                self._put(output_queue, (None, _END), stop_event)
+
+    def __iter__(self):
+        stop_event = threading.Event()
+        errors = []
+        queues = [queue.Queue(self.queue_size) for _ in range(len(self.stages) + 1)]
+
+        threads = [threading.Thread(target=self._read_source, args=(queues[0], stop_event, errors),
+                                    daemon=True)]
+        for stage, input_queue, output_queue in zip(self.stages, queues, queues[1:]):
+            reader = _OrderedReader(input_queue, stop_event)
+            remaining = {'count': stage.workers, 'lock': threading.Lock()}
+            for _ in range(stage.workers):
+                threads.append(threading.Thread(target=self._run_stage,
+                                                args=(stage, reader, output_queue, stop_event, errors, remaining),
+                                                daemon=True))
+
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+
+        output = _OrderedReader(queues[-1], stop_event)
+        try:
+            while True:
+                entry = output.get()
+                if entry is _END:
+                    break
+                yield entry[1]
+        finally:
+            # Tüketici erken çıktıysa ya da hata olduysa tüm iş parçacıklarını durdur
+            stop_event.set()
+            for thread in threads:
+                thread.join()
+            self.elapsed = time.perf_counter() - start
+
+        if errors:
+            raise errors[0]
+
+    def run(self):
+        """Pipeline'ı sonuna kadar çalıştırır (son aşamanın çıktıları atılır)."""
+        for _ in self:
+            pass
+        return self
+
+    def report(self):
+        """Her aşama için (isim, işlenen öğe, meşgul süre, kullanım oranı) listesi."""
+        rows = []
+        for stage in [self.source_stage] + self.stages:
+            capacity = self.elapsed * stage.workers
+            utilization = stage.busy_time / capacity if capacity > 0 else 0.0
+            rows.append((stage.name, stage.items, stage.busy_time, utilization))
+        return rows
+
+    def print_report(self):
+        rows = self.report()
+        print(f"Pipeline süresi: {self.elapsed:.2f} s")
+        for name, items, busy_time, utilization in rows:
+            print(f"  {name:<12} öğe={items:<7} meşgul={busy_time:8.2f} s  kullanım={utilization:6.1%}")
+        bottleneck = max(rows, key=lambda row: row[3])
+        print(f"  Darboğaz: {bottleneck[0]}")
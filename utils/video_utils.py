@@ -1,11 +1,201 @@
 import cv2
+import queue
+import threading
+
+
+class VideoFrameSource:
+    """
+    Video karelerini tek tek (akış halinde) okuyan kaynak.
+
+    Karelerin tamamı belleğe alınmaz; arka planda çalışan bir okuyucu thread
+    en fazla `prefetch` kadar kareyi önceden çözer. Her iterasyonda video
+    baştan açıldığı için aynı kaynak birden fazla aşamada (tespit, çizim)
+    tekrar tekrar dolaşılabilir ve bellek kullanımı video uzunluğundan
+    bağımsız kalır.
+
+    Args:
+        video_path (str): Okunacak video dosyasının yolu.
+        prefetch (int): Önceden okunacak en fazla kare sayısı. 0 verilirse
+                        thread kullanılmadan senkron okunur.
+        segments (list, optional): Sadece okunacak [start, end) kare aralıkları.
+                        Verilmezse videonun tamamı okunur.
+        seek_threshold (int): Aralıklar arasındaki boşluk bu değerden küçükse
+                        kareler grab() ile atlanır, büyükse doğrudan seek yapılır.
+    """
+
+    def __init__(self, video_path, prefetch=16, segments=None, seek_threshold=250):
+        self.video_path = video_path
+        self.prefetch = prefetch
+        self.segments = segments
+        self.seek_threshold = seek_threshold
+
+        cap = cv2.VideoCapture(video_path)
+        if not cap.isOpened():
+            raise IOError(f"Video açılamadı: {video_path}")
+        self.fps = cap.get(cv2.CAP_PROP_FPS)
+        self.frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        cap.release()
+
+    def first_frame(self):
+        """Kaynağın ilk karesini döndürür (video boşsa None)."""
+        frames = self._read_frames()
+        frame = next(frames, None)
+        frames.close()
+        return frame
+
+    def _read_frames(self):
+        cap = cv2.VideoCapture(self.video_path)
+        try:
+            if self.segments is None:
+                while True:
+                    ret, frame = cap.read()
+                    if not ret:
+                        break
+                    yield frame
+                return
+
+            position = 0
+            for start, end in self.segments:
+                if start - position > self.seek_threshold:
+                    cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+                    position = start
+                # Kısa boşlukları decode/kopyalama yapmadan atla
+                while position < start:
+                    if not cap.grab():
+                        return
+                    position += 1
+                while position < end:
+                    ret, frame = cap.read()
+                    if not ret:
+                        return
+                    position += 1
+                    yield frame
+        finally:
+            cap.release()
+
+    def __iter__(self):
+        if self.prefetch <= 0:
+            yield from self._read_frames()
+            return
+
+        frame_queue = queue.Queue(maxsize=self.prefetch)
+        stop_event = threading.Event()
+        end_of_stream = object()
+        errors = []
+
+        def put(item):
+            # Tüketici erken çıkarsa thread'in kuyrukta takılı kalmaması için
+            # put işlemini zaman aşımıyla tekrar deniyoruz
+            while not stop_event.is_set():
+                try:
+                    frame_queue.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def producer():
+            try:
+                for frame in self._read_frames():
+                    if not put(frame):
+                        return
+            except BaseException as error:
+                # Okuma hatası tüketici tarafında yeniden fırlatılır
+                errors.append(error)
+            finally:
+                # Hata olsa da tüketici get() içinde sonsuza kadar beklemesin
+                put(end_of_stream)
+
+        reader = threading.Thread(target=producer, daemon=True)
+        reader.start()
+        try:
+            while True:
+                frame = frame_queue.get()
+                if frame is end_of_stream:
+                    if errors:
+                        raise errors[0]
+                    break
+                yield frame
+        finally:
+            stop_event.set()
+            # Bekleyen kareleri boşalt ki producer put'tan çıkabilsin
+            while reader.is_alive():
+                try:
+                    frame_queue.get_nowait()
+                except queue.Empty:
+                    reader.join(timeout=0.1)
+
+
+class VideoSaver:
+    """
+    Kareleri geldikçe diske yazan artımlı video yazıcı.
+
+    Çıktı boyutu ilk yazılan kareden alınır, böylece kareleri önceden
+    bir listede toplamaya gerek kalmaz.
+    """
+
+    def __init__(self, output_video_path, fps, fourcc='mp4v'):
+        self.output_video_path = output_video_path
+        self.fps = fps
+        self.fourcc = cv2.VideoWriter_fourcc(*fourcc)
+        self.writer = None
+        self.frames_written = 0
+
+    def write(self, frame):
+        if self.writer is None:
+            self.writer = cv2.VideoWriter(self.output_video_path, self.fourcc, self.fps,
+                                          (frame.shape[1], frame.shape[0]))
+        self.writer.write(frame)
+        self.frames_written += 1
+
+    def release(self):
+        if self.writer is not None:
+            self.writer.release()
+            self.writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+
+def iter_batches(frames, batch_size):
+    """Kare akışını en fazla `batch_size` elemanlı listeler halinde gruplar."""
+    batch = []
+    for frame in frames:
+        batch.append(frame)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def indices_to_segments(frame_indices):
+    """Artan sıralı kare numaralarını ardışık [start, end) aralıklarına çevirir."""
+    segments = []
+    for idx in frame_indices:
+        if segments and segments[-1][1] == idx:
+            segments[-1][1] = idx + 1
+        else:
+            segments.append([idx, idx + 1])
+    return [tuple(segment) for segment in segments]
+
+
+def segments_to_indices(segments):
+    """[start, end) aralıklarını sıralı kare numaralarına açar (indices_to_segments'in tersi)."""
+    return [idx for start, end in segments for idx in range(start, end)]
+
 
 def read_video(video_path):
     cap = cv2.VideoCapture(video_path)
-    
+
     # YENİ: Videonun orijinal FPS değerini öğreniyoruz
     fps = cap.get(cv2.CAP_PROP_FPS)
-    
+
     frames = []
     while True:
         ret, frame = cap.read()
@@ -14,18 +204,14 @@ def read_video(video_path):
         frames.append(frame)
     cap.release()
     print(f"Video okundu. Kare: {len(frames)}, FPS: {fps}")
-    
+
     # ARTIK İKİ ŞEY DÖNDÜRÜYORUZ: Kareler ve FPS
     return frames, fps
 
 def save_video(output_video_frames, output_video_path, fps):
-    # YENİ: Artık dışarıdan gelen 'fps' değerini kullanıyoruz (24 yerine)
-    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-    
-    out = cv2.VideoWriter(output_video_path, fourcc, fps, 
-                          (output_video_frames[0].shape[1], output_video_frames[0].shape[0]))
-    
-    for frame in output_video_frames:
-        out.write(frame)
-    out.release()
-    print(f"Video kaydedildi: {output_video_path}")
\ No newline at end of file
+    # Kareler liste veya generator olabilir; geldikçe yazıyoruz
+    with VideoSaver(output_video_path, fps) as saver:
+        for frame in output_video_frames:
+            saver.write(frame)
+
+    print(f"Video kaydedildi: {output_video_path} ({saver.frames_written} kare)")